@@ -0,0 +1,19 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``. Django 2.1 has no native ASGI handler, so the WSGI
+application is adapted with asgiref and its sync views run in a thread
+pool. Serve it with an ASGI server, for example:
+
+    gunicorn app.asgi:application -k uvicorn.workers.UvicornWorker
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+application = WsgiToAsgi(get_wsgi_application())
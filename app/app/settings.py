@@ -19,12 +19,17 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # See https://docs.djangoproject.com/en/2.1/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'ekhn6x9y_0!c&%j7yiyps)k5v(8evqp=)9i6q&j2)(7^1-#)bu'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY',
+    'ekhn6x9y_0!c&%j7yiyps)k5v(8evqp=)9i6q&j2)(7^1-#)bu'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host
+]
 
 # Application definition
 
@@ -40,10 +45,14 @@ INSTALLED_APPS = [
     'core',
     'user',
     'recipe',
+    'benchmark',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -75,16 +84,139 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+# DB_CONN_MAX_AGE is the number of seconds a connection is reused across
+# requests, 0 closes it after every request. When DB_HOST points at a
+# transaction pooling pgbouncer set DB_POOLER=pgbouncer, which disables
+# server side cursors as they don't survive across pooled transactions.
+
+DB_POOLER = os.environ.get('DB_POOLER', '')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOLER == 'pgbouncer',
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
+    }
+}
+
+# Read replicas, DB_REPLICA_HOSTS is a comma separated list of hosts
+# reached with the primary's credentials. Safe requests read from a
+# replica, unless their client sent a write in the last
+# DB_REPLICA_PIN_SECONDS, which must cover the replication lag. The pins
+# are kept per user in DATABASE_REPLICA_PIN_CACHE, which must be shared
+# by all processes for a user to read its writes on every process, as
+# `manage.py check --deploy` verifies.
+
+DATABASE_REPLICAS = []
+
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    alias = 'replica%d' % index
+    DATABASES[alias] = dict(
+        DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+DATABASE_REPLICA_PIN_CACHE = 'default'
+
+DATABASE_REPLICA_PIN_SECONDS = int(
+    os.environ.get('DB_REPLICA_PIN_SECONDS', 5)
+)
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# The default cache holds the list cache versions and replica pins, which
+# every process must agree on. With more than one process it must be a
+# shared backend, e.g.
+# CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache and
+# CACHE_LOCATION=memcached:11211, which `manage.py check --deploy`
+# verifies.
+
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', LOCAL_CACHE_BACKEND),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+if CACHES['default']['BACKEND'] == LOCAL_CACHE_BACKEND:
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+    }
+
+# Number of gunicorn worker processes, read from the same variable with
+# the same default as gunicorn.conf.py
+
+WEB_WORKERS = int(
+    os.environ.get('GUNICORN_WORKERS', (os.cpu_count() or 1) * 2 + 1)
+)
+
+# Request metrics at /metrics, readable with the TOKEN as a bearer token
+# or by staff users. Each process records its own requests, with DIR
+# they write snapshots there, which /metrics adds up across the gunicorn
+# workers. Without DIR only a single process deployment reports every
+# request.
+
+METRICS = {
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
+    'DIR': os.environ.get('METRICS_DIR') or None,
+}
+
+# Per user tag and ingredient list cache, entries are evicted by the
+# cache backend when they time out or the cache is full
+
+RECIPE_LIST_CACHE = 'default'
+
+RECIPE_LIST_CACHE_TIMEOUT = int(
+    os.environ.get('RECIPE_LIST_CACHE_TIMEOUT', 300)
+)
+
+# Password hashing
+# PASSWORD_HASHER selects the hasher used for new hashes, the others are
+# kept to verify existing hashes, which are upgraded on the next login.
+# argon2 and bcrypt require the argon2-cffi and bcrypt packages.
+
+PASSWORD_HASHER_CHOICES = {
+    'pbkdf2': 'core.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+}
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+
+PASSWORD_HASHERS = [PASSWORD_HASHER_CHOICES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in sorted(PASSWORD_HASHER_CHOICES.items())
+    if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASH_ITERATIONS', 120000)
+)
+
+# Number of threads computing password hashes, 0 hashes in the request
+# thread. PASSWORD_HASH_QUEUE more hashes may wait for a thread, further
+# logins and signups get a 503 response until one finishes.
+
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+)
+
+PASSWORD_HASH_QUEUE = int(
+    os.environ.get('PASSWORD_HASH_QUEUE', PASSWORD_HASH_WORKERS * 2)
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -121,4 +253,117 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+STATICFILES_STORAGE = \
+    'whitenoise.storage.CompressedStaticFilesStorage'
+
+# Uploaded files, shared by the web and task worker processes
+
+MEDIA_URL = '/media/'
+
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+# Storage of uploaded files, any Django storage class
+DEFAULT_FILE_STORAGE = os.environ.get(
+    'FILE_STORAGE', 'django.core.files.storage.FileSystemStorage'
+)
+
+# Uploads are written to a temporary file in chunks as they are received
+# instead of being kept in memory, and moved into the storage when saved
+
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Recipe images, see recipe.images.DEFAULTS for the other options
+
+RECIPE_IMAGES = {
+    'MAX_UPLOAD_SIZE': int(
+        os.environ.get('RECIPE_IMAGE_MAX_SIZE', 50 * 1024 * 1024)
+    ),
+}
+
+# Sync of offline clients, see recipe.sync.DEFAULTS for the other options
+
+RECIPE_SYNC = {
+    'RETENTION_DAYS': int(os.environ.get('SYNC_RETENTION_DAYS', 90)),
+}
+
 AUTH_USER_MODEL = 'core.User'
+
+# Token authentication cache, SHARED_CACHE names an entry of CACHES shared
+# by all processes, which replaces the per process LRU. Without it other
+# processes accept a deleted token for up to TTL seconds.
+
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 5)),
+    'SHARED_CACHE': os.environ.get('TOKEN_AUTH_SHARED_CACHE') or None,
+}
+
+# JSON encoder of API responses and request bodies, 'orjson' requires the
+# orjson package and renders the same bytes faster, except floats in
+# exponent notation and NaN or infinities, rendered as null instead of
+# raising ValueError (see core.renderers.ORJSONRenderer)
+
+JSON_BACKEND_CHOICES = {
+    'stdlib': ('rest_framework.renderers.JSONRenderer',
+               'rest_framework.parsers.JSONParser'),
+    'orjson': ('core.renderers.ORJSONRenderer',
+               'core.parsers.ORJSONParser'),
+}
+
+JSON_RENDERER, JSON_PARSER = JSON_BACKEND_CHOICES[
+    os.environ.get('JSON_BACKEND', 'stdlib')
+]
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        JSON_RENDERER,
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        JSON_PARSER,
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # Token bucket size per period of core.throttling.TokenBucketThrottle
+    # scopes, an empty rate disables the scope
+    'DEFAULT_THROTTLE_RATES': {
+        'auth': os.environ.get('THROTTLE_AUTH_RATE', '20/min'),
+        'recipes': os.environ.get('THROTTLE_RECIPES_RATE', '1200/min'),
+    },
+    # Number of reverse proxies in front of the server, anonymous requests
+    # are throttled per address taken that many entries from the end of
+    # X-Forwarded-For. 0 uses the peer address, as the header is sent by
+    # the client when nothing in front of the server replaces it.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Throttle buckets live in each process, bounded to MAX_KEYS clients,
+# unless SHARED_CACHE names an entry of CACHES shared by all processes
+
+THROTTLE_BUCKETS = {
+    'MAX_KEYS': int(os.environ.get('THROTTLE_MAX_KEYS', 100000)),
+    'SHARED_CACHE': os.environ.get('THROTTLE_SHARED_CACHE') or None,
+}
+
+# Background tasks
+# 'database' queues tasks in the database for the worker processes
+# started with the run_worker command, 'memory' keeps them in the process
+# for tests and single process deployments. LOCAL_WORKERS threads of
+# each web process run tasks too, which the memory broker requires.
+
+TASK_BROKER_CHOICES = {
+    'database': 'core.taskqueue.DatabaseBroker',
+    'memory': 'core.taskqueue.MemoryBroker',
+}
+
+TASK_QUEUE = {
+    'BROKER': TASK_BROKER_CHOICES[os.environ.get('TASK_BROKER', 'database')],
+    'LOCAL_WORKERS': int(os.environ.get('TASK_LOCAL_WORKERS', 0)),
+    'CONCURRENCY': int(os.environ.get('TASK_CONCURRENCY', 4)),
+    'MAX_RETRIES': int(os.environ.get('TASK_MAX_RETRIES', 3)),
+    'RETRY_DELAY': int(os.environ.get('TASK_RETRY_DELAY', 10)),
+}
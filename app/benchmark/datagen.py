@@ -0,0 +1,171 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from core.bulk import BATCH_SIZE, bulk_insert, insert_with_ids
+from core.counters import rebuild_recipe_counts, rebuild_link_counts
+from core.models import Tag, Ingredient, Recipe
+
+BENCH_PASSWORD = 'benchpass123'
+
+WORDS = (
+    'chicken', 'beef', 'tofu', 'salmon', 'lentil', 'mushroom', 'spinach',
+    'tomato', 'garlic', 'ginger', 'lemon', 'chili', 'coconut', 'curry',
+    'pasta', 'rice', 'noodle', 'salad', 'soup', 'stew', 'roast', 'pie',
+    'tart', 'cake', 'bread', 'pancake', 'risotto', 'taco', 'burger',
+    'smoky', 'spicy', 'creamy', 'crispy', 'zesty', 'herby', 'sweet',
+)
+
+
+def create_bench_user(email):
+    """
+    Creates a fresh user for a benchmark run, removing any leftovers
+    of a previous run with the same email
+    :param email: email of the benchmark user
+    :return: User object
+    """
+    get_user_model().objects.filter(email=email).delete()
+    return get_user_model().objects.create_user(email, BENCH_PASSWORD)
+
+
+def create_bench_users(prefix, count, use_copy=True):
+    """
+    Creates fresh users for a benchmark run, removing any leftovers of a
+    previous run with the same prefix. The password is hashed once and
+    shared, as hashing dominates creating users one by one.
+    :param prefix: prefix of the emails
+    :param count: number of users to create
+    :param use_copy: insert with COPY on PostgreSQL
+    :return: list of User objects
+    """
+    model = get_user_model()
+    model.objects.filter(email__startswith=prefix).delete()
+    password = make_password(BENCH_PASSWORD)
+    users = [
+        model(email='%s%06d@example.com' % (prefix, i),
+              name='Bench user %d' % i, password=password)
+        for i in range(count)
+    ]
+    with transaction.atomic():
+        insert_with_ids(model, users, use_copy=use_copy)
+    return users
+
+
+def create_tokens(users, use_copy=True):
+    """
+    Creates an auth token for each user
+    :param users: list of saved users
+    :param use_copy: insert with COPY on PostgreSQL
+    :return: dictionary of user id to token key
+    """
+    tokens = [Token(user=user) for user in users]
+    for token in tokens:
+        token.key = token.generate_key()
+    bulk_insert(Token, tokens, ['key', 'user', 'created'], use_copy)
+    return {token.user_id: token.key for token in tokens}
+
+
+def create_attrs(model, user, count, prefix='item', use_copy=True):
+    """
+    Bulk creates recipe attributes (tags or ingredients) for a user
+    :param model: Tag or Ingredient
+    :param user: owner of the objects
+    :param count: number of objects to create
+    :param prefix: prefix of the generated names
+    :param use_copy: insert with COPY on PostgreSQL
+    :return: None
+    """
+    create_users_attrs(model, [user], count, prefix, use_copy)
+
+
+def create_users_attrs(model, users, count, prefix='item', use_copy=True):
+    """
+    Bulk creates the same number of recipe attributes for several users
+    :param model: Tag or Ingredient
+    :param users: owners of the objects
+    :param count: number of objects per user
+    :param prefix: prefix of the generated names
+    :param use_copy: insert with COPY on PostgreSQL
+    :return: None
+    """
+    objs = [
+        model(user=user, name='%s-%08d' % (prefix, i))
+        for user in users
+        for i in range(count)
+    ]
+    for start in range(0, len(objs), BATCH_SIZE * 10):
+        bulk_insert(model, objs[start:start + BATCH_SIZE * 10],
+                    ['user', 'name', 'recipe_count', 'updated_at'], use_copy)
+
+
+def create_tags(user, count, use_copy=True):
+    create_attrs(Tag, user, count, prefix='tag', use_copy=use_copy)
+
+
+def create_ingredients(user, count, use_copy=True):
+    create_attrs(Ingredient, user, count, prefix='ingredient',
+                 use_copy=use_copy)
+
+
+def create_recipes(user, count, tags, ingredients, per_recipe=3,
+                   chunk_size=10000, seed=0, use_copy=True):
+    """
+    Bulk creates recipes with random titles, each linked to random tags
+    and ingredients, a chunk at a time to keep memory bounded. The bulk
+    inserts bypass the signals, so the link counts of the recipes, tags
+    and ingredients are rebuilt at the end.
+    :param user: owner of the recipes
+    :param count: number of recipes to create
+    :param tags: list of the user's tags
+    :param ingredients: list of the user's ingredients
+    :param per_recipe: number of tags and of ingredients per recipe
+    :param chunk_size: number of recipes inserted per transaction
+    :param seed: seed of the random generator
+    :param use_copy: insert with COPY on PostgreSQL
+    :return: None
+    """
+    rng = random.Random(seed)
+    tag_ids = [tag.id for tag in tags]
+    ingredient_ids = [ingredient.id for ingredient in ingredients]
+    tag_links = Recipe.tags.through
+    ingredient_links = Recipe.ingredients.through
+
+    for start in range(0, count, chunk_size):
+        recipes = [
+            Recipe(
+                user=user,
+                title='%s %s %s' % (rng.choice(WORDS), rng.choice(WORDS), i),
+                time_minutes=rng.randint(5, 240),
+                price=Decimal(rng.randint(100, 9999)) / 100,
+            )
+            for i in range(start, min(start + chunk_size, count))
+        ]
+        with transaction.atomic():
+            insert_with_ids(Recipe, recipes, use_copy=use_copy)
+            tag_rows = [
+                tag_links(recipe_id=recipe.id, tag_id=pk)
+                for recipe in recipes
+                for pk in rng.sample(tag_ids, min(per_recipe, len(tag_ids)))
+            ]
+            bulk_insert(tag_links, tag_rows, ['recipe', 'tag'], use_copy)
+            ingredient_rows = [
+                ingredient_links(recipe_id=recipe.id, ingredient_id=pk)
+                for recipe in recipes
+                for pk in rng.sample(
+                    ingredient_ids, min(per_recipe, len(ingredient_ids))
+                )
+            ]
+            bulk_insert(ingredient_links, ingredient_rows,
+                        ['recipe', 'ingredient'], use_copy)
+
+    for model in (Tag, Ingredient):
+        rebuild_recipe_counts(
+            model, model.objects.filter(user=user).values('id')
+        )
+        rebuild_link_counts(
+            model, Recipe.objects.filter(user=user).values('id')
+        )
@@ -0,0 +1,230 @@
+import json
+import platform
+import time
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from benchmark.datagen import BENCH_PASSWORD, create_bench_users, \
+    create_tokens, create_users_attrs, create_recipes
+from benchmark.management.commands.loadtest import percentile
+from core.models import Tag, Ingredient
+
+BENCH_PREFIX = 'bench-api-'
+
+
+def summarize(timings):
+    """
+    Returns latency statistics in milliseconds
+    :param timings: list of seconds
+    :return: dictionary
+    """
+    values = sorted(timings)
+    if not values:
+        return {'requests': 0}
+    return {
+        'requests': len(values),
+        'mean_ms': sum(values) / len(values) * 1000,
+        'min_ms': values[0] * 1000,
+        'p50_ms': percentile(values, 0.5) * 1000,
+        'p90_ms': percentile(values, 0.9) * 1000,
+        'p99_ms': percentile(values, 0.99) * 1000,
+        'max_ms': values[-1] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the throughput of the recipe and user APIs
+    on synthetic data
+    """
+    help = 'Generates users with tags, ingredients and recipes, times the ' \
+           'main endpoints through the test client and writes the ' \
+           'results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=50,
+                            help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=100,
+                            help='Ingredients per user')
+        parser.add_argument('--recipes', type=int, default=200,
+                            help='Recipes per user')
+        parser.add_argument('--per-recipe', type=int, default=3)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Requests per endpoint')
+        parser.add_argument('--output', help='Write the JSON results to '
+                                             'this file instead of stdout')
+        parser.add_argument('--no-copy', action='store_false',
+                            dest='use_copy',
+                            help='Insert with bulk_create on PostgreSQL')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('At least one user is needed')
+        generate = {}
+        users = []
+        try:
+            users, tokens = self.generate(options, generate)
+            # Unthrottled, the benchmark sends bursts from one address
+            rest_framework = dict(settings.REST_FRAMEWORK,
+                                  DEFAULT_THROTTLE_RATES={})
+            with override_settings(ALLOWED_HOSTS=['*'],
+                                   REST_FRAMEWORK=rest_framework):
+                endpoints = self.run_endpoints(users, tokens, options)
+        finally:
+            if users and not options['keep']:
+                for user in users:
+                    user.delete()
+
+        results = {
+            'meta': {
+                'timestamp': datetime.utcnow().isoformat() + 'Z',
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'options': {
+                    key: options[key] for key in (
+                        'users', 'tags', 'ingredients', 'recipes',
+                        'per_recipe', 'page_size', 'repeat', 'use_copy',
+                    )
+                },
+            },
+            'generate': generate,
+            'endpoints': endpoints,
+        }
+        data = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(data + '\n')
+            for name, stats in sorted(endpoints.items()):
+                self.stdout.write('%-16s p50 %8.2f ms  p99 %8.2f ms' % (
+                    name, stats['p50_ms'], stats['p99_ms']
+                ))
+        else:
+            self.stdout.write(data)
+
+    def generate(self, options, generate):
+        """
+        Creates the benchmark users and their data
+        :param options: command options
+        :param generate: dictionary receiving rows and seconds per step
+        :return: tuple of users and dictionary of user id to token key
+        """
+        use_copy = options['use_copy']
+
+        def timed(name, rows, func, *args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            generate[name] = {
+                'rows': rows,
+                'seconds': elapsed,
+                'rows_per_second': rows / elapsed if elapsed else None,
+            }
+            return result
+
+        count = options['users']
+        users = timed('users', count, create_bench_users, BENCH_PREFIX,
+                      count, use_copy=use_copy)
+        tokens = timed('tokens', count, create_tokens, users,
+                       use_copy=use_copy)
+        timed('tags', count * options['tags'], create_users_attrs, Tag,
+              users, options['tags'], 'tag', use_copy)
+        timed('ingredients', count * options['ingredients'],
+              create_users_attrs, Ingredient, users, options['ingredients'],
+              'ingredient', use_copy)
+
+        def recipes():
+            for seed, user in enumerate(users):
+                create_recipes(
+                    user, options['recipes'],
+                    list(Tag.objects.filter(user=user).order_by('id')),
+                    list(Ingredient.objects.filter(user=user).order_by('id')),
+                    per_recipe=options['per_recipe'], seed=seed,
+                    use_copy=use_copy
+                )
+
+        timed('recipes', count * options['recipes'], recipes)
+        return users, tokens
+
+    def run_endpoints(self, users, tokens, options):
+        """
+        Times every endpoint, rotating through the users
+        :param users: benchmark users
+        :param tokens: dictionary of user id to token key
+        :param options: command options
+        :return: dictionary of endpoint name to latency statistics
+        """
+        client = APIClient()
+        attrs = {
+            user.id: (
+                list(Tag.objects.filter(user=user).values_list(
+                    'id', flat=True
+                )[:options['per_recipe']]),
+                list(Ingredient.objects.filter(user=user).values_list(
+                    'id', flat=True
+                )[:options['per_recipe']]),
+            )
+            for user in users
+        }
+        page = {'page_size': options['page_size']}
+
+        def create_payload(user, i):
+            tags, ingredients = attrs[user.id]
+            return {
+                'title': 'Bench recipe %d' % i,
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': tags,
+                'ingredients': ingredients,
+            }
+
+        endpoints = (
+            ('tag-list', 'get', reverse('recipe:tag-list'),
+             lambda user, i: page, status.HTTP_200_OK),
+            ('ingredient-list', 'get', reverse('recipe:ingredient-list'),
+             lambda user, i: page, status.HTTP_200_OK),
+            ('recipe-list', 'get', reverse('recipe:recipe-list'),
+             lambda user, i: page, status.HTTP_200_OK),
+            ('recipe-create', 'post', reverse('recipe:recipe-list'),
+             create_payload, status.HTTP_201_CREATED),
+            ('token', 'post', reverse('user:token'),
+             lambda user, i: {'email': user.email,
+                              'password': BENCH_PASSWORD},
+             status.HTTP_200_OK),
+            ('me', 'get', reverse('user:me'),
+             lambda user, i: None, status.HTTP_200_OK),
+        )
+
+        results = {}
+        for name, method, url, payload, expected in endpoints:
+            timings = []
+            for i in range(options['repeat']):
+                user = users[i % len(users)]
+                client.credentials(
+                    HTTP_AUTHORIZATION='Token ' + tokens[user.id]
+                )
+                data = payload(user, i)
+                start = time.perf_counter()
+                if method == 'post':
+                    res = client.post(url, data, format='json')
+                else:
+                    res = client.get(url, data)
+                timings.append(time.perf_counter() - start)
+                if res.status_code != expected:
+                    raise CommandError('%s returned %d: %s' % (
+                        name, res.status_code, res.content[:200]
+                    ))
+            results[name] = summarize(timings)
+        return results
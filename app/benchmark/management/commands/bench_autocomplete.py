@@ -0,0 +1,110 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from benchmark.datagen import WORDS, create_bench_user
+from benchmark.management.commands.loadtest import percentile
+from core.bulk import bulk_insert
+from core.models import Ingredient
+from recipe import cache
+from recipe.views import IngredientViewSet
+
+BENCH_EMAIL = 'bench-autocomplete@example.com'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the ingredient autocomplete latency
+    """
+    help = 'Generates a large ingredient list and reports latency ' \
+           'percentiles of autocompleting 1 to 4 letter prefixes right ' \
+           'after a change, from the prefix index and from the list cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=20000)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data')
+
+    def handle(self, *args, **options):
+        user = create_bench_user(BENCH_EMAIL)
+        try:
+            rng = random.Random(0)
+            names = [
+                '%s %s %d' % (rng.choice(WORDS), rng.choice(WORDS), i)
+                for i in range(options['ingredients'])
+            ]
+            bulk_insert(Ingredient, [
+                Ingredient(user=user, name=name, recipe_count=rng.randint(
+                    0, 100
+                )) for name in names
+            ], ['user', 'name', 'recipe_count', 'updated_at'])
+            prefixes = [
+                name[:rng.randint(1, 4)]
+                for name in rng.sample(names, min(options['requests'],
+                                                  len(names)))
+            ]
+            self.stdout.write('Ingredients: %d, %d prefixes' % (
+                len(names), len(prefixes)
+            ))
+
+            dummy = dict(settings.CACHES, bench={
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            })
+            with override_settings(ALLOWED_HOSTS=['*']):
+                self.report('index build', self.time_requests(
+                    user, prefixes[:20], options['limit'],
+                    lambda: cache.bump_version(Ingredient, user.pk)
+                ))
+                with override_settings(CACHES=dummy,
+                                       RECIPE_LIST_CACHE='bench'):
+                    self.report('search', self.time_requests(
+                        user, prefixes, options['limit']
+                    ))
+                self.report('cached', self.time_requests(
+                    user, prefixes * 2, options['limit']
+                )[len(prefixes):])
+        finally:
+            if not options['keep']:
+                user.delete()
+
+    def report(self, label, timings):
+        """
+        Writes the median and 99th percentile latency of a scenario
+        :param label: name of the scenario
+        :param timings: list of latencies in seconds
+        :return: None
+        """
+        timings = sorted(timings)
+        self.stdout.write('%-12s p50 %.2f ms  p99 %.2f ms' % (
+            label, percentile(timings, 0.5) * 1000,
+            percentile(timings, 0.99) * 1000
+        ))
+
+    def time_requests(self, user, prefixes, limit, before=None):
+        """
+        Requests the autocomplete of each prefix
+        :param user: owner of the ingredients
+        :param prefixes: typed prefixes
+        :param limit: number of matches requested
+        :param before: function called untimed before each request
+        :return: list of latencies in seconds
+        """
+        factory = APIRequestFactory()
+        view = IngredientViewSet.as_view({'get': 'autocomplete'})
+        timings = []
+        for prefix in prefixes:
+            if before is not None:
+                before()
+            request = factory.get('/api/recipe/ingredients/autocomplete/',
+                                  {'q': prefix, 'limit': limit})
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            view(request).render()
+            timings.append(time.perf_counter() - start)
+        return timings
@@ -0,0 +1,79 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from benchmark.datagen import create_bench_user, create_tags, \
+    create_ingredients, create_recipes
+from core.models import Tag, Ingredient
+from recipe.views import RecipeViewSet
+
+BENCH_EMAIL = 'bench-export@example.com'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the recipe export
+    """
+    help = 'Generates a large recipe book and reports time to first byte, ' \
+           'total time and peak memory of each export format'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument('--ingredients', type=int, default=200)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data')
+
+    def handle(self, *args, **options):
+        user = create_bench_user(BENCH_EMAIL)
+        try:
+            self.stdout.write('Creating %d recipes...' % options['recipes'])
+            create_tags(user, options['tags'])
+            create_ingredients(user, options['ingredients'])
+            create_recipes(
+                user, options['recipes'],
+                list(Tag.objects.filter(user=user)),
+                list(Ingredient.objects.filter(user=user))
+            )
+            with override_settings(ALLOWED_HOSTS=['*']):
+                for export_type in ('ndjson', 'csv'):
+                    self.export(user, export_type)
+        finally:
+            if not options['keep']:
+                user.delete()
+
+    def export(self, user, export_type):
+        """
+        Streams a whole export, tracing memory allocations
+        :param user: owner of the recipes
+        :param export_type: ndjson or csv
+        :return: None
+        """
+        request = APIRequestFactory().get(
+            '/api/recipe/recipes/export/', {'type': export_type}
+        )
+        force_authenticate(request, user=user)
+        view = RecipeViewSet.as_view({'get': 'export'})
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        first_byte = None
+        size = 0
+        for chunk in view(request).streaming_content:
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+        total = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            '%-7s first byte %7.2f ms  total %8.2f s  %6.1f MB  '
+            'peak memory %6.2f MB' % (
+                export_type, (first_byte or 0) * 1000, total, size / 1e6,
+                peak / 1e6
+            )
+        )
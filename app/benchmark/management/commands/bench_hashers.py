@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, check_password
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+PASSWORD = 'bench-password-123'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure signup and login throughput per hasher
+    """
+    help = 'Reports password hashes (signups) and verifications (logins) ' \
+           'per second for each hasher setting'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher', action='append', dest='hashers',
+            help='Hasher names from PASSWORD_HASHER_CHOICES, '
+                 'defaults to all of them'
+        )
+        parser.add_argument(
+            '--iterations', type=int, action='append',
+            help='PBKDF2 iteration counts to compare'
+        )
+        parser.add_argument('--seconds', type=float, default=2.0,
+                            help='Duration of each measurement')
+        parser.add_argument('--threads', type=int, default=1,
+                            help='Concurrent hashing threads, 1 gives the '
+                                 'throughput of a single core')
+
+    def handle(self, *args, **options):
+        hashers = options['hashers'] or \
+            sorted(settings.PASSWORD_HASHER_CHOICES)
+        iterations = options['iterations'] or [
+            settings.PASSWORD_HASH_ITERATIONS
+        ]
+
+        self.stdout.write(
+            '%-24s %12s %12s' % ('hasher', 'signup/s', 'login/s')
+        )
+        for name in hashers:
+            hasher = settings.PASSWORD_HASHER_CHOICES[name]
+            for count in (iterations if name == 'pbkdf2' else [None]):
+                overrides = {'PASSWORD_HASHERS': [hasher]}
+                label = name
+                if count is not None:
+                    overrides['PASSWORD_HASH_ITERATIONS'] = count
+                    label = '%s(%d)' % (name, count)
+                with override_settings(**overrides):
+                    try:
+                        encoded = make_password(PASSWORD)
+                    except ValueError as exc:
+                        self.stdout.write('%-24s skipped: %s' % (label, exc))
+                        continue
+                    signups = self.measure(options, make_password, PASSWORD)
+                    logins = self.measure(
+                        options, check_password, PASSWORD, encoded
+                    )
+                self.stdout.write('%-24s %12.1f %12.1f' % (
+                    label, signups, logins
+                ))
+
+    def measure(self, options, func, *args):
+        """
+        Calls func repeatedly from the configured number of threads
+        :param options: command options
+        :param func: hashing function
+        :param args: arguments of func
+        :return: calls per second
+        """
+        threads = options['threads']
+        deadline = time.perf_counter() + options['seconds']
+
+        def run():
+            calls = 0
+            while time.perf_counter() < deadline:
+                func(*args)
+                calls += 1
+            return calls
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            calls = sum(pool.map(lambda _: run(), range(threads)))
+        return calls / (time.perf_counter() - start)
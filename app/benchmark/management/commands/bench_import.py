@@ -0,0 +1,77 @@
+import csv
+import io
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from benchmark.datagen import create_bench_user
+from core.models import ImportJob
+from recipe.importer import BATCH_SIZE, RecipeImporter
+
+BENCH_EMAIL = 'bench-import@example.com'
+
+
+def generate_csv(count, tags, ingredients):
+    """
+    Generates a CSV file of recipes naming random tags and ingredients
+    :param count: number of recipes
+    :param tags: number of distinct tag names
+    :param ingredients: number of distinct ingredient names
+    :return: str
+    """
+    rng = random.Random(0)
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(('title', 'time_minutes', 'price', 'link', 'tags',
+                     'ingredients'))
+    for i in range(count):
+        writer.writerow((
+            'Recipe %d' % i, rng.randint(1, 240),
+            '%d.%02d' % (rng.randint(0, 99), rng.randint(0, 99)), '',
+            ';'.join('Tag %d' % n
+                     for n in rng.sample(range(tags), min(2, tags))),
+            ';'.join('Ingredient %d' % n
+                     for n in rng.sample(range(ingredients),
+                                         min(5, ingredients))),
+        ))
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the recipe import
+    """
+    help = 'Imports a generated CSV file and reports recipes per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=100)
+        parser.add_argument('--ingredients', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Insert with bulk_create on PostgreSQL')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the imported data')
+
+    def handle(self, *args, **options):
+        data = generate_csv(options['recipes'], options['tags'],
+                            options['ingredients'])
+        user = create_bench_user(BENCH_EMAIL)
+        try:
+            job = ImportJob.objects.create(user=user, format='csv')
+            importer = RecipeImporter(job, options['batch_size'],
+                                      not options['no_copy'])
+            start = time.perf_counter()
+            importer.run(io.StringIO(data))
+            total = time.perf_counter() - start
+
+            self.stdout.write(
+                'Imported %d recipes in %.2f s (%d recipes/s)' % (
+                    importer.job.imported, total,
+                    importer.job.imported / total
+                )
+            )
+        finally:
+            if not options['keep']:
+                user.delete()
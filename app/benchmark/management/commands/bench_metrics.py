@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+
+from core.metrics import MetricsRegistry
+from core.middleware import MetricsMiddleware
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the per request cost of the metrics
+    middleware
+    """
+    help = 'Reports the microseconds the metrics middleware adds to a ' \
+           'request that runs no queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000)
+        parser.add_argument('--path', default='/api/recipe/tags/')
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get(options['path'])
+        request.resolver_match = resolve(options['path'])
+        response = HttpResponse()
+
+        def view(request):
+            return response
+
+        middleware = MetricsMiddleware(view)
+        middleware.registry = MetricsRegistry()
+
+        baseline = self.measure(view, request, options['requests'])
+        measured = self.measure(middleware, request, options['requests'])
+        self.stdout.write('Requests:  %d' % options['requests'])
+        self.stdout.write('Overhead:  %.2f us/request' % (
+            (measured - baseline) * 1e6 / options['requests']
+        ))
+
+    def measure(self, handler, request, count):
+        """
+        Calls handler count times
+        :param handler: view or middleware
+        :param request: request object
+        :param count: number of calls
+        :return: seconds
+        """
+        start = time.perf_counter()
+        for _ in range(count):
+            handler(request)
+        return time.perf_counter() - start
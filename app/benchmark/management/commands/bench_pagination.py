@@ -0,0 +1,72 @@
+import time
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from benchmark.datagen import create_bench_user, create_tags
+from recipe.views import TagViewSet
+
+BENCH_EMAIL = 'bench-pagination@example.com'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure tag list page latency against page depth
+    """
+    help = 'Walks every page of a large tag list and reports latency ' \
+           'per depth decile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data')
+
+    def handle(self, *args, **options):
+        user = create_bench_user(BENCH_EMAIL)
+        try:
+            self.stdout.write('Creating %d tags...' % options['rows'])
+            create_tags(user, options['rows'])
+            with override_settings(ALLOWED_HOSTS=['*']):
+                timings = self.walk_pages(user, options['page_size'])
+            self.report(timings)
+        finally:
+            if not options['keep']:
+                user.delete()
+
+    def walk_pages(self, user, page_size):
+        """
+        Requests every page in order, following the next links
+        :param user: owner of the tags
+        :param page_size: number of rows per page
+        :return: list of page latencies in seconds
+        """
+        factory = APIRequestFactory()
+        view = TagViewSet.as_view({'get': 'list'})
+        url = '/api/recipe/tags/?page_size=%d' % page_size
+        timings = []
+        while url:
+            request = factory.get(url)
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append(time.perf_counter() - start)
+            url = response.data['next']
+        return timings
+
+    def report(self, timings):
+        """
+        Writes the median latency of each depth decile
+        :param timings: list of page latencies in seconds
+        :return: None
+        """
+        self.stdout.write('Pages: %d' % len(timings))
+        step = max(len(timings) // 10, 1)
+        for start in range(0, len(timings), step):
+            chunk = timings[start:start + step]
+            self.stdout.write('pages %6d-%-6d median %.2f ms' % (
+                start + 1, start + len(chunk), median(chunk) * 1000
+            ))
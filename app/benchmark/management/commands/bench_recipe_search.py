@@ -0,0 +1,85 @@
+import time
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from benchmark.datagen import create_bench_user, create_tags, \
+    create_ingredients, create_recipes
+from core.models import Tag, Ingredient
+from recipe.views import RecipeViewSet
+
+BENCH_EMAIL = 'bench-recipe-search@example.com'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure filtered and searched recipe list latency
+    """
+    help = 'Generates a large recipe book and times the first page of ' \
+           'tag, ingredient and title filtered recipe lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--tags', type=int, default=500)
+        parser.add_argument('--ingredients', type=int, default=1000)
+        parser.add_argument('--per-recipe', type=int, default=3)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data')
+
+    def handle(self, *args, **options):
+        user = create_bench_user(BENCH_EMAIL)
+        try:
+            self.stdout.write('Creating %d recipes...' % options['recipes'])
+            create_tags(user, options['tags'])
+            create_ingredients(user, options['ingredients'])
+            tags = list(Tag.objects.filter(user=user).order_by('id'))
+            ingredients = list(
+                Ingredient.objects.filter(user=user).order_by('id')
+            )
+            create_recipes(user, options['recipes'], tags, ingredients,
+                           per_recipe=options['per_recipe'])
+
+            scenarios = [
+                ('1 tag', {'tags': tags[0].id}),
+                ('2 tags', {'tags': '%d,%d' % (tags[0].id, tags[1].id)}),
+                ('tag + ingredient', {
+                    'tags': tags[0].id,
+                    'ingredients': ingredients[0].id,
+                }),
+                ('title search', {'search': 'curry'}),
+                ('rare title search', {'search': 'ginger tart 4'}),
+            ]
+            with override_settings(ALLOWED_HOSTS=['*']):
+                for label, params in scenarios:
+                    params['page_size'] = options['page_size']
+                    elapsed = self.time_request(user, params,
+                                                options['repeat'])
+                    self.stdout.write('%-20s median %.2f ms' % (
+                        label, elapsed * 1000
+                    ))
+        finally:
+            if not options['keep']:
+                user.delete()
+
+    def time_request(self, user, params, repeat):
+        """
+        Requests the first page of the recipe list several times
+        :param user: owner of the recipes
+        :param params: query parameters
+        :param repeat: number of requests
+        :return: median latency in seconds
+        """
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({'get': 'list'})
+        timings = []
+        for _ in range(repeat):
+            request = factory.get('/api/recipe/recipes/', params)
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            view(request).render()
+            timings.append(time.perf_counter() - start)
+        return median(timings)
@@ -0,0 +1,74 @@
+import io
+import time
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from core.renderers import orjson
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the JSON renderers and parsers
+    """
+    help = 'Renders and parses a large tag list with each JSON backend ' \
+           'and checks the rendered bytes are identical'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        backends = [('stdlib', JSONRenderer, JSONParser)]
+        if orjson is not None:
+            from core.parsers import ORJSONParser
+            from core.renderers import ORJSONRenderer
+            backends.append(('orjson', ORJSONRenderer, ORJSONParser))
+
+        data = ReturnList([
+            OrderedDict([
+                ('id', i),
+                ('name', 'tag-%08d crème' % i),
+                ('recipe_count', i % 50),
+            ])
+            for i in range(options['items'])
+        ], serializer=None)
+
+        expected = None
+        self.stdout.write('%-8s %12s %12s' % ('backend', 'render ms',
+                                              'parse ms'))
+        for name, renderer_class, parser_class in backends:
+            renderer = renderer_class()
+            body = renderer.render(data)
+            if expected is None:
+                expected = body
+            elif body != expected:
+                raise CommandError('%s rendered different bytes' % name)
+            render = self.measure(options['repeat'], renderer.render, data)
+            parser = parser_class()
+            parse = self.measure(
+                options['repeat'],
+                lambda: parser.parse(io.BytesIO(body), None, {})
+            )
+            self.stdout.write('%-8s %12.2f %12.2f' % (
+                name, render * 1000, parse * 1000
+            ))
+
+    def measure(self, repeat, func, *args):
+        """
+        Returns the best time of several calls
+        :param repeat: number of calls
+        :param func: function to time
+        :param args: arguments of func
+        :return: seconds
+        """
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(*args)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,112 @@
+import random
+import time
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from benchmark.datagen import create_bench_user, create_tags, \
+    create_ingredients, create_recipes
+from core.models import Tag, Ingredient, Recipe
+from recipe.views import RecipeViewSet
+
+BENCH_EMAIL = 'bench-shopping-list@example.com'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the shopping list of recipe selections
+    """
+    help = 'Generates a recipe book and times the shopping list endpoint ' \
+           'against merging the ingredients of each recipe in Python'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=1000)
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument('--selections', default='20,50,500',
+                            help='Comma separated numbers of recipes')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data')
+
+    def handle(self, *args, **options):
+        user = create_bench_user(BENCH_EMAIL)
+        try:
+            self.stdout.write('Creating %d recipes...' % options['recipes'])
+            create_tags(user, options['tags'])
+            create_ingredients(user, options['ingredients'])
+            create_recipes(
+                user, options['recipes'],
+                list(Tag.objects.filter(user=user)),
+                list(Ingredient.objects.filter(user=user)),
+                per_recipe=options['per_recipe']
+            )
+            recipe_ids = list(
+                Recipe.objects.filter(user=user).values_list('id', flat=True)
+            )
+            rng = random.Random(0)
+
+            with override_settings(ALLOWED_HOSTS=['*']):
+                for size in options['selections'].split(','):
+                    ids = rng.sample(recipe_ids,
+                                     min(int(size), len(recipe_ids)))
+                    endpoint, queries = self.time_endpoint(
+                        user, ids, options['repeat']
+                    )
+                    merge = self.time_merge(user, ids, options['repeat'])
+                    self.stdout.write(
+                        '%4d recipes  endpoint median %8.2f ms '
+                        '(%d queries)  per recipe merge median %8.2f ms' % (
+                            len(ids), endpoint * 1000, queries, merge * 1000
+                        )
+                    )
+        finally:
+            if not options['keep']:
+                user.delete()
+
+    def time_endpoint(self, user, ids, repeat):
+        """
+        Requests the shopping list of the selected recipes several times
+        :param user: owner of the recipes
+        :param ids: ids of the selected recipes
+        :param repeat: number of requests
+        :return: median latency in seconds and queries per request
+        """
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({'get': 'shopping_list'})
+        params = {'recipes': ','.join(str(pk) for pk in ids)}
+        timings = []
+        for _ in range(repeat):
+            request = factory.get('/api/recipe/recipes/shopping-list/',
+                                  params)
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                view(request).render()
+                timings.append(time.perf_counter() - start)
+        return median(timings), len(queries)
+
+    def time_merge(self, user, ids, repeat):
+        """
+        Merges the ingredients of each selected recipe in Python, one query
+        per recipe, as a client of the recipe detail endpoint would
+        :param user: owner of the recipes
+        :param ids: ids of the selected recipes
+        :param repeat: number of merges
+        :return: median latency in seconds
+        """
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            counts = {}
+            for recipe in Recipe.objects.filter(user=user, id__in=ids):
+                for ingredient in recipe.ingredients.all():
+                    key = (ingredient.id, ingredient.name)
+                    counts[key] = counts.get(key, 0) + 1
+            sorted(counts.items(), key=lambda item: item[0][1])
+            timings.append(time.perf_counter() - start)
+        return median(timings)
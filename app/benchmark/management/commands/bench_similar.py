@@ -0,0 +1,83 @@
+import random
+import time
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from benchmark.datagen import create_bench_user, create_tags, \
+    create_ingredients, create_recipes
+from core.models import Tag, Ingredient, Recipe
+from recipe.views import RecipeViewSet
+
+BENCH_EMAIL = 'bench-similar@example.com'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the similar recipes latency
+    """
+    help = 'Generates a large recipe book and times the similar recipes ' \
+           'of randomly picked recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--ingredients', type=int, default=1000)
+        parser.add_argument('--per-recipe', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data')
+
+    def handle(self, *args, **options):
+        user = create_bench_user(BENCH_EMAIL)
+        try:
+            self.stdout.write('Creating %d recipes...' % options['recipes'])
+            create_tags(user, options['tags'])
+            create_ingredients(user, options['ingredients'])
+            create_recipes(
+                user, options['recipes'],
+                list(Tag.objects.filter(user=user)),
+                list(Ingredient.objects.filter(user=user)),
+                per_recipe=options['per_recipe']
+            )
+            recipe_ids = list(
+                Recipe.objects.filter(user=user).values_list('id', flat=True)
+            )
+            with override_settings(ALLOWED_HOSTS=['*']):
+                timings = self.time_requests(
+                    user, random.Random(0).sample(
+                        recipe_ids, min(options['repeat'], len(recipe_ids))
+                    ), options['limit']
+                )
+            self.stdout.write(
+                'Similar recipes  median %.2f ms  max %.2f ms' % (
+                    median(timings) * 1000, max(timings) * 1000
+                )
+            )
+        finally:
+            if not options['keep']:
+                user.delete()
+
+    def time_requests(self, user, recipe_ids, limit):
+        """
+        Requests the similar recipes of each recipe
+        :param user: owner of the recipes
+        :param recipe_ids: ids of the recipes
+        :param limit: number of similar recipes requested
+        :return: list of latencies in seconds
+        """
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({'get': 'similar'})
+        timings = []
+        for pk in recipe_ids:
+            request = factory.get(
+                '/api/recipe/recipes/%d/similar/' % pk, {'limit': limit}
+            )
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            view(request, pk=pk).render()
+            timings.append(time.perf_counter() - start)
+        return timings
@@ -0,0 +1,110 @@
+import random
+import time
+from datetime import timedelta
+from statistics import median
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from benchmark.datagen import create_bench_user, create_tags, \
+    create_ingredients, create_recipes
+from core.models import Tag, Ingredient, Recipe
+from recipe.sync import encode_cursor
+from recipe.views import SyncViewSet
+
+BENCH_EMAIL = 'bench-sync@example.com'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the sync of offline clients
+    """
+    help = 'Generates a large recipe book and times syncing a growing ' \
+           'number of changed recipes against syncing everything'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--changes', default='0,10,100,1000',
+                            help='Comma separated numbers of changed recipes')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data')
+
+    def handle(self, *args, **options):
+        user = create_bench_user(BENCH_EMAIL)
+        try:
+            self.stdout.write('Creating %d recipes...' % options['recipes'])
+            create_tags(user, options['tags'])
+            create_ingredients(user, options['ingredients'])
+            create_recipes(
+                user, options['recipes'],
+                list(Tag.objects.filter(user=user)),
+                list(Ingredient.objects.filter(user=user)),
+            )
+            recipe_ids = list(
+                Recipe.objects.filter(user=user).values_list('id', flat=True)
+            )
+            rng = random.Random(0)
+
+            with override_settings(ALLOWED_HOSTS=['*']):
+                full, queries = self.time_sync(user, None, options['repeat'])
+                self.stdout.write('Full sync %8.2f ms (%d queries)' % (
+                    full * 1000, queries
+                ))
+                for count in options['changes'].split(','):
+                    ids = rng.sample(recipe_ids,
+                                     min(int(count), len(recipe_ids)))
+                    cursor = self.change(user, ids)
+                    timing, queries = self.time_sync(
+                        user, cursor, options['repeat']
+                    )
+                    self.stdout.write(
+                        '%5d changes  sync median %8.2f ms (%d queries)' % (
+                            len(ids), timing * 1000, queries
+                        )
+                    )
+        finally:
+            if not options['keep']:
+                user.delete()
+
+    def change(self, user, ids):
+        """
+        Marks every object of the user as saved an hour ago, then saves
+        some recipes again
+        :param user: owner of the objects
+        :param ids: ids of the changed recipes
+        :return: cursor taken between the two
+        """
+        for model in (Tag, Ingredient, Recipe):
+            model.objects.filter(user=user).update(
+                updated_at=timezone.now() - timedelta(hours=1)
+            )
+        cursor = encode_cursor(timezone.now() - timedelta(minutes=1))
+        Recipe.objects.filter(id__in=ids).update(updated_at=timezone.now())
+        return cursor
+
+    def time_sync(self, user, cursor, repeat):
+        """
+        Requests a sync several times
+        :param user: owner of the objects
+        :param cursor: cursor of the previous sync, None for a full sync
+        :param repeat: number of requests
+        :return: median latency in seconds and queries per request
+        """
+        factory = APIRequestFactory()
+        view = SyncViewSet.as_view({'get': 'list'})
+        params = {'since': cursor} if cursor else {}
+        timings = []
+        for _ in range(repeat):
+            request = factory.get('/api/recipe/sync/', params)
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                view(request).render()
+                timings.append(time.perf_counter() - start)
+        return median(timings), len(queries)
@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.request import Request
+
+from core.throttling import TokenBucketThrottle
+
+
+class View:
+    throttle_scope = 'bench'
+
+
+class Command(BaseCommand):
+    """
+    Django command to measure the per request cost of the throttle
+    """
+    help = 'Reports the microseconds a token bucket check adds to a ' \
+           'request with local and shared cache buckets, next to the cost ' \
+           'of the password hash it protects'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000)
+        parser.add_argument('--clients', type=int, default=1000,
+                            help='Distinct client addresses')
+        parser.add_argument('--shared-cache', default='default',
+                            help='Entry of CACHES used as shared store')
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        requests = []
+        for i in range(options['clients']):
+            request = Request(factory.post(
+                '/api/user/token/',
+                REMOTE_ADDR='10.%d.%d.%d' % (i >> 16, i >> 8 & 255, i & 255)
+            ))
+            request.user = AnonymousUser()
+            request.auth = None
+            requests.append(request)
+
+        rest_framework = dict(settings.REST_FRAMEWORK,
+                              DEFAULT_THROTTLE_RATES={'bench': '1000000/s'})
+        self.stdout.write('Requests:     %d from %d clients' % (
+            options['requests'], options['clients']
+        ))
+        for name, buckets in (
+                ('local', {}),
+                ('shared', {'SHARED_CACHE': options['shared_cache']})):
+            with override_settings(REST_FRAMEWORK=rest_framework,
+                                   THROTTLE_BUCKETS=buckets):
+                elapsed = self.measure(requests, options['requests'])
+            self.stdout.write('%-7s       %.2f us/request' % (
+                name, elapsed * 1e6 / options['requests']
+            ))
+
+        start = time.perf_counter()
+        make_password('bench-password')
+        self.stdout.write('Password hash %.2f us' % (
+            (time.perf_counter() - start) * 1e6
+        ))
+
+    def measure(self, requests, count):
+        """
+        Checks the throttle count times, cycling through the requests
+        :param requests: DRF requests of different clients
+        :param count: number of checks
+        :return: seconds
+        """
+        view = View()
+        clients = len(requests)
+        start = time.perf_counter()
+        for i in range(count):
+            TokenBucketThrottle().allow_request(requests[i % clients], view)
+        return time.perf_counter() - start
@@ -0,0 +1,126 @@
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns the value below which the given fraction of values fall
+    :param sorted_values: sorted list of numbers
+    :param fraction: number between 0 and 1
+    :return: number
+    """
+    if not sorted_values:
+        return 0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    """
+    Django command to load test a running server over keep-alive
+    connections
+    """
+    help = 'Sends concurrent GET requests to an endpoint of a running ' \
+           'server and reports requests per second and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000',
+                            help='Base url of the server')
+        parser.add_argument('--path', default='/api/recipe/tags/')
+        parser.add_argument('--token', help='Auth token to send')
+        parser.add_argument('--email', help='Obtain a token for this user')
+        parser.add_argument('--password')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Seconds to measure')
+        parser.add_argument('--warmup', type=float, default=2.0,
+                            help='Seconds of unmeasured requests first')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        headers = {'Accept': 'application/json'}
+        token = options['token']
+        if token is None and options['email']:
+            token = self.obtain_token(url, options['email'],
+                                      options['password'])
+        if token:
+            headers['Authorization'] = 'Token ' + token
+
+        start = time.monotonic() + options['warmup']
+        stop = start + options['duration']
+        results = [[] for _ in range(options['concurrency'])]
+        errors = [0] * options['concurrency']
+
+        def worker(index):
+            conn = self.connect(url)
+            while True:
+                sent = time.monotonic()
+                if sent >= stop:
+                    break
+                try:
+                    conn.request('GET', options['path'], headers=headers)
+                    res = conn.getresponse()
+                    res.read()
+                    ok = res.status < 400
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    conn = self.connect(url)
+                    ok = False
+                if sent >= start:
+                    if ok:
+                        results[index].append(time.monotonic() - sent)
+                    else:
+                        errors[index] += 1
+            conn.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(i,))
+            for i in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        latencies = sorted(t for result in results for t in result)
+        self.stdout.write('Requests:  %d (%d errors)' % (
+            len(latencies), sum(errors)
+        ))
+        self.stdout.write('Req/sec:   %.1f' % (
+            len(latencies) / options['duration']
+        ))
+        for label, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            self.stdout.write('%s:       %.2f ms' % (
+                label, percentile(latencies, fraction) * 1000
+            ))
+
+    def connect(self, url):
+        if url.scheme == 'https':
+            return http.client.HTTPSConnection(url.netloc, timeout=30)
+        return http.client.HTTPConnection(url.netloc, timeout=30)
+
+    def obtain_token(self, url, email, password):
+        """
+        Obtains an auth token from the token endpoint
+        :param url: base url of the server
+        :param email: email of the user
+        :param password: password of the user
+        :return: str
+        """
+        conn = self.connect(url)
+        conn.request(
+            'POST', '/api/user/token/',
+            body=json.dumps({'email': email, 'password': password}),
+            headers={'Content-Type': 'application/json'}
+        )
+        res = conn.getresponse()
+        body = res.read()
+        conn.close()
+        if res.status != 200:
+            raise CommandError('Could not obtain a token: %s' % body)
+        return json.loads(body.decode('utf-8'))['token']
@@ -0,0 +1,168 @@
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands.loadtest import percentile
+
+
+class BenchmarkCommandsTests(TestCase):
+    def test_bench_pagination(self):
+        """
+        Test the pagination benchmark walks every page and cleans up
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_pagination', rows=250, page_size=100, stdout=out)
+
+        self.assertIn('Pages: 3', out.getvalue())
+
+    def test_bench_hashers(self):
+        """
+        Test the hasher benchmark reports each PBKDF2 iteration count
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_hashers', hashers=['pbkdf2'], iterations=[100],
+                     seconds=0.01, stdout=out)
+
+        self.assertIn('pbkdf2(100)', out.getvalue())
+
+    def test_loadtest_percentile(self):
+        """
+        Test latency percentiles of the load test
+        :return: None
+        """
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 0.5), 51)
+        self.assertEqual(percentile(values, 0.99), 100)
+        self.assertEqual(percentile([], 0.99), 0)
+
+    def test_bench_recipe_search(self):
+        """
+        Test the recipe search benchmark times every scenario
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_recipe_search', recipes=50, tags=5,
+                     ingredients=5, repeat=1, stdout=out)
+
+        self.assertIn('tag + ingredient', out.getvalue())
+        self.assertIn('rare title search', out.getvalue())
+
+    def test_bench_metrics(self):
+        """
+        Test the metrics benchmark reports the middleware overhead
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_metrics', requests=100, stdout=out)
+
+        self.assertIn('us/request', out.getvalue())
+
+    def test_bench_api(self):
+        """
+        Test the API benchmark times every endpoint and writes JSON
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_api', users=2, tags=3, ingredients=3, recipes=5,
+                     repeat=2, stdout=out)
+
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results['endpoints']), {
+            'tag-list', 'ingredient-list', 'recipe-list', 'recipe-create',
+            'token', 'me',
+        })
+        self.assertEqual(results['endpoints']['me']['requests'], 2)
+        self.assertEqual(results['generate']['recipes']['rows'], 10)
+        self.assertFalse(
+            get_user_model().objects.filter(
+                email__startswith='bench-api-'
+            ).exists()
+        )
+
+    def test_bench_renderers(self):
+        """
+        Test the renderer benchmark times the stdlib backend
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_renderers', items=100, repeat=1, stdout=out)
+
+        self.assertIn('stdlib', out.getvalue())
+
+    def test_bench_export(self):
+        """
+        Test the export benchmark streams both formats
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_export', recipes=20, tags=5, ingredients=5,
+                     stdout=out)
+
+        self.assertIn('ndjson', out.getvalue())
+        self.assertIn('csv', out.getvalue())
+
+    def test_bench_throttle(self):
+        """
+        Test the throttle benchmark reports both bucket stores
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_throttle', requests=100, clients=10, stdout=out)
+
+        self.assertIn('local', out.getvalue())
+        self.assertIn('shared', out.getvalue())
+
+    def test_bench_shopping_list(self):
+        """
+        Test the shopping list benchmark times every selection size
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_shopping_list', recipes=30, tags=5,
+                     ingredients=20, selections='5,30', repeat=1,
+                     stdout=out)
+
+        self.assertIn('  30 recipes', out.getvalue())
+        self.assertIn('(1 queries)', out.getvalue())
+
+    def test_bench_similar(self):
+        """
+        Test the similar recipes benchmark reports its latency
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_similar', recipes=30, tags=5, ingredients=10,
+                     repeat=3, stdout=out)
+
+        self.assertIn('Similar recipes  median', out.getvalue())
+
+    def test_bench_autocomplete(self):
+        """
+        Test the autocomplete benchmark reports every scenario
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_autocomplete', ingredients=50, requests=10,
+                     stdout=out)
+
+        self.assertIn('index build', out.getvalue())
+        self.assertIn('search', out.getvalue())
+        self.assertIn('cached', out.getvalue())
+
+    def test_bench_sync(self):
+        """
+        Test the sync benchmark reports the full and delta syncs
+        :return: None
+        """
+        out = StringIO()
+        call_command('bench_sync', recipes=30, tags=5, ingredients=10,
+                     changes='0,3', repeat=2, stdout=out)
+
+        self.assertIn('Full sync', out.getvalue())
+        self.assertIn('    3 changes  sync median', out.getvalue())
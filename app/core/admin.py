@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Tag, Ingredient, Recipe
+from .models import User, Tag, Ingredient, Recipe, ImportJob, Tombstone, \
+    BackgroundTask
 from django.utils.translation import gettext as _
 
 
@@ -28,3 +29,6 @@ admin.site.register(User, UserAdmin)
 admin.site.register(Tag)
 admin.site.register(Ingredient)
 admin.site.register(Recipe)
+admin.site.register(ImportJob)
+admin.site.register(BackgroundTask)
+admin.site.register(Tombstone)
@@ -0,0 +1,110 @@
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .lru import LRUCache
+from .routers import reading_from_replica, use_primary
+
+DEFAULTS = {
+    'MAX_SIZE': 10000,
+    # Seconds other processes keep accepting a deleted token or a changed
+    # user when there is no shared cache
+    'TTL': 5,
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+}
+
+_token_cache = None
+
+
+class TokenCache:
+    """
+    Token key to (user, token) cache: a shared Django cache backend when
+    one is configured, a bounded in-process LRU otherwise. Entries are
+    only ever read from the shared cache when there is one, so a token
+    deleted or a user saved through any process is seen by all of them
+    on their next request.
+    """
+    key_prefix = 'authtoken:'
+
+    def __init__(self, options):
+        self.local = LRUCache(options['MAX_SIZE'], options['TTL'])
+        self.shared = None
+        if options['SHARED_CACHE']:
+            self.shared = caches[options['SHARED_CACHE']]
+        self.shared_ttl = options['SHARED_TTL']
+
+    def get(self, key):
+        """
+        Returns the cached (user, token) pair of a token key
+        :param key: token key
+        :return: (user, token) tuple or None
+        """
+        if self.shared is not None:
+            return self.shared.get(self.key_prefix + key)
+        return self.local.get(key)
+
+    def set(self, key, entry):
+        if self.shared is not None:
+            self.shared.set(self.key_prefix + key, entry, self.shared_ttl)
+        else:
+            self.local.set(key, entry)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + key)
+
+
+def get_token_cache():
+    """
+    Returns the process wide token cache configured by the
+    TOKEN_AUTH_CACHE setting
+    :return: TokenCache
+    """
+    global _token_cache
+    if _token_cache is None:
+        options = dict(DEFAULTS)
+        options.update(getattr(settings, 'TOKEN_AUTH_CACHE', {}))
+        _token_cache = TokenCache(options)
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    global _token_cache
+    if setting == 'TOKEN_AUTH_CACHE':
+        _token_cache = None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches the token lookup, so requests with a
+    recently seen token skip the token and user query. Entries are
+    invalidated when the token is deleted or its user is saved, other
+    processes see the change right away with a shared cache, within the
+    local TTL without one. Tokens missing from a read replica are looked
+    up on the primary, as they may have just been created.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        entry = cache.get(key)
+        if entry is None:
+            try:
+                entry = super().authenticate_credentials(key)
+            except AuthenticationFailed:
+                if not reading_from_replica():
+                    raise
+                with use_primary():
+                    entry = super().authenticate_credentials(key)
+            cache.set(key, entry)
+
+        user, token = entry
+        # Views may modify request.user, hand out a private copy
+        return copy.deepcopy(user), token
@@ -0,0 +1,199 @@
+import io
+
+from django.db import connection
+from django.db.models import Max
+
+BATCH_SIZE = 1000
+
+
+def batch_size(model, fields):
+    """
+    Returns the number of rows inserted per statement, capped by what
+    the database backend accepts (SQLite limits query variables)
+    :param model: model class of the rows
+    :param fields: names of the inserted fields
+    :return: int
+    """
+    fields = [model._meta.get_field(name) for name in fields]
+    return min(BATCH_SIZE, connection.ops.bulk_batch_size(fields, []))
+
+
+def can_copy():
+    """
+    Returns whether the database accepts COPY FROM STDIN
+    :return: bool
+    """
+    return connection.vendor == 'postgresql'
+
+
+def format_copy_value(value):
+    """
+    Formats a database value in the COPY text format
+    :param value: value prepared for the database
+    :return: str
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(model, fields, rows):
+    """
+    Inserts rows with a single COPY statement, which skips the parsing
+    and planning of INSERT statements on PostgreSQL
+    :param model: model class of the rows
+    :param fields: names of the inserted fields
+    :param rows: iterable of tuples of database values, foreign keys as ids
+    :return: None
+    """
+    fields = [model._meta.get_field(name) for name in fields]
+    data = io.StringIO()
+    for row in rows:
+        data.write('\t'.join(map(format_copy_value, row)))
+        data.write('\n')
+    data.seek(0)
+    quote = connection.ops.quote_name
+    sql = 'COPY %s (%s) FROM STDIN' % (
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields)
+    )
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(sql, data)
+
+
+def copy_insert(model, objs, fields):
+    """
+    Inserts objects with a single COPY statement
+    :param model: model class of the objects
+    :param objs: list of unsaved objects
+    :param fields: names of the inserted fields
+    :return: None
+    """
+    model_fields = [model._meta.get_field(name) for name in fields]
+    copy_rows(model, fields, (
+        tuple(
+            field.get_db_prep_save(field.pre_save(obj, True), connection)
+            for field in model_fields
+        )
+        for obj in objs
+    ))
+
+
+def bulk_insert(model, objs, fields, use_copy=True):
+    """
+    Inserts objects with COPY where supported and bulk_create elsewhere
+    :param model: model class of the objects
+    :param objs: list of unsaved objects
+    :param fields: names of the inserted fields
+    :param use_copy: insert with COPY on PostgreSQL
+    :return: None
+    """
+    if use_copy and can_copy():
+        copy_insert(model, objs, fields)
+    else:
+        model.objects.bulk_create(objs, batch_size=batch_size(model, fields))
+
+
+def execute_insert(model, fields, rows):
+    """
+    Inserts rows with multi row INSERT statements, skipping the model
+    instances and SQL compiler of bulk_create
+    :param model: model class of the rows
+    :param fields: names of the inserted fields
+    :param rows: list of tuples of database values, foreign keys as ids
+    :return: None
+    """
+    model_fields = [model._meta.get_field(name) for name in fields]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO %s (%s) VALUES ' % (
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in model_fields)
+    )
+    placeholder = '(%s)' % ', '.join(['%s'] * len(fields))
+    size = batch_size(model, fields)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), size):
+            batch = rows[start:start + size]
+            cursor.execute(
+                sql + ', '.join([placeholder] * len(batch)),
+                [value for row in batch for value in row]
+            )
+
+
+def insert_rows(model, fields, rows, use_copy=True):
+    """
+    Inserts rows of plain values with COPY where supported and multi
+    row INSERT statements elsewhere
+    :param model: model class of the rows
+    :param fields: names of the inserted fields
+    :param rows: list of tuples of database values, foreign keys as ids
+    :param use_copy: insert with COPY on PostgreSQL
+    :return: None
+    """
+    if use_copy and can_copy():
+        copy_rows(model, fields, rows)
+    elif connection.features.has_bulk_insert:
+        execute_insert(model, fields, rows)
+    else:
+        attnames = [model._meta.get_field(name).attname for name in fields]
+        model.objects.bulk_create(
+            [model(**dict(zip(attnames, row))) for row in rows]
+        )
+
+
+def reserve_ids(model, count):
+    """
+    Draws ids from the id sequence of a PostgreSQL table
+    :param model: model class
+    :param count: number of ids
+    :return: list of ints
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+            "FROM generate_series(1, %s)",
+            [model._meta.db_table, count]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def next_ids(model, count):
+    """
+    Returns ids for rows about to be inserted. They are drawn from the
+    sequence on PostgreSQL; other backends get the ids after the current
+    maximum, so the insert must run in the same transaction.
+    :param model: model class
+    :param count: number of ids
+    :return: list of ints
+    """
+    if can_copy():
+        return reserve_ids(model, count)
+    start = (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    return list(range(start, start + count))
+
+
+def insert_with_ids(model, objs, use_copy=True):
+    """
+    Bulk inserts objects and makes sure their ids are set. Backends that
+    can't return ids from a bulk insert get explicit ids after the
+    current maximum, so this must run inside a transaction on them.
+    With COPY the ids are drawn from the sequence first.
+    :param model: model class of the objects
+    :param objs: list of unsaved objects
+    :param use_copy: insert with COPY on PostgreSQL
+    :return: None
+    """
+    fields = [f.name for f in model._meta.concrete_fields if not f.primary_key]
+    if use_copy and can_copy():
+        for obj, pk in zip(objs, reserve_ids(model, len(objs))):
+            obj.id = pk
+        copy_insert(model, objs, fields + ['id'])
+        return
+    if not connection.features.can_return_ids_from_bulk_insert:
+        for obj, pk in zip(objs, next_ids(model, len(objs))):
+            obj.id = pk
+        fields.append('id')
+    model.objects.bulk_create(objs, batch_size=batch_size(model, fields))
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .routers import get_replicas
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def is_process_local(alias):
+    """
+    Returns whether a cache keeps its entries in each process
+    :param alias: name of an entry of CACHES
+    :return: bool
+    """
+    return settings.CACHES[alias]['BACKEND'] in LOCAL_CACHE_BACKENDS
+
+
+def runs_several_processes():
+    """
+    Returns whether requests and tasks are handled by more than one
+    process: several gunicorn workers, or task workers next to them
+    :return: bool
+    """
+    broker = getattr(settings, 'TASK_QUEUE', {}).get('BROKER', '')
+    return getattr(settings, 'WEB_WORKERS', 1) > 1 or \
+        not broker.endswith('MemoryBroker')
+
+
+@register(Tags.caches, deploy=True)
+def check_list_cache(app_configs, **kwargs):
+    """
+    Fails when the list cache versions are kept in each process while
+    several processes write the lists, as a write would then only
+    invalidate the lists cached by the process handling it
+    """
+    alias = getattr(settings, 'RECIPE_LIST_CACHE', 'default')
+    if is_process_local(alias) and runs_several_processes():
+        return [Error(
+            'RECIPE_LIST_CACHE uses a cache local to each process while '
+            'several processes serve requests or run tasks.',
+            hint='Point the %r cache at a shared backend such as '
+                 'memcached.' % alias,
+            id='core.E001',
+        )]
+    return []
+
+
+@register(Tags.database, deploy=True)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """
+    Fails when read replicas are configured with the replica pins kept in
+    each process while several web workers serve requests, as a client
+    would then only read its writes on the worker that handled them
+    """
+    alias = getattr(settings, 'DATABASE_REPLICA_PIN_CACHE', 'default')
+    if get_replicas() and is_process_local(alias) and \
+            getattr(settings, 'WEB_WORKERS', 1) > 1:
+        return [Error(
+            'DATABASE_REPLICA_PIN_CACHE uses a cache local to each process '
+            'while read replicas are configured and several web workers '
+            'serve requests.',
+            hint='Point the %r cache at a shared backend such as '
+                 'memcached.' % alias,
+            id='core.E002',
+        )]
+    return []
@@ -0,0 +1,158 @@
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Tag, Ingredient, Recipe
+
+# Recipe M2M field counted by the recipe_count of each model
+RECIPE_FIELDS = {
+    Tag: 'tags',
+    Ingredient: 'ingredients',
+}
+
+# Recipe column counting the links of each recipe to the model
+LINK_COUNT_FIELDS = {
+    Tag: 'tag_count',
+    Ingredient: 'ingredient_count',
+}
+
+# Sent by rebuild_recipe_counts() with the tag or ingredient model as the
+# sender and the ids of the users whose counts changed
+recipe_counts_rebuilt = Signal(providing_args=['user_ids'])
+
+
+def get_link_columns(model):
+    """
+    Returns the through model of the recipe M2M field of a model with its
+    recipe and target id columns
+    :param model: Tag or Ingredient
+    :return: (through, recipe column, target column) tuple
+    """
+    field = Recipe._meta.get_field(RECIPE_FIELDS[model])
+    return (
+        field.remote_field.through,
+        field.m2m_column_name(),
+        field.m2m_reverse_name(),
+    )
+
+
+def linked_pairs(model, recipe_ids=None, target_ids=None):
+    """
+    Reads recipe links, locking their rows so concurrent removals of the
+    same link are counted once
+    :param model: Tag or Ingredient
+    :param recipe_ids: only read links of these recipes
+    :param target_ids: only read links of these objects
+    :return: list of (recipe id, object id) tuples
+    """
+    through, recipe_column, target_column = get_link_columns(model)
+    rows = through.objects.select_for_update()
+    if recipe_ids is not None:
+        rows = rows.filter(**{recipe_column + '__in': recipe_ids})
+    if target_ids is not None:
+        rows = rows.filter(**{target_column + '__in': target_ids})
+    return list(rows.values_list(recipe_column, target_column))
+
+
+def linked_counts(model, recipe_ids=None, target_ids=None):
+    """
+    Counts the recipe links of each object, locking the counted rows so
+    concurrent removals of the same link are counted once
+    :param model: Tag or Ingredient
+    :param recipe_ids: only count links of these recipes
+    :param target_ids: only count links of these objects
+    :return: Counter of object id to number of links
+    """
+    return Counter(
+        target for _, target in linked_pairs(model, recipe_ids, target_ids)
+    )
+
+
+def apply_deltas(model, deltas, sign=1, field='recipe_count'):
+    """
+    Adds link count deltas to a count column with atomic increments,
+    marking the rows as updated for the sync of offline clients
+    :param model: Tag, Ingredient or Recipe
+    :param deltas: Counter of object id to number of links
+    :param sign: 1 to add links, -1 to remove them
+    :param field: recipe_count, or a LINK_COUNT_FIELDS column of recipes
+    :return: None
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta * sign].append(pk)
+    max_params = connection.features.max_query_params or 1000
+    now = timezone.now()
+    for delta, ids in by_delta.items():
+        ids.sort()
+        for start in range(0, len(ids), max_params - 1):
+            model.objects.filter(id__in=ids[start:start + max_params - 1]) \
+                .update(updated_at=now, **{field: F(field) + delta})
+
+
+def update_counts(queryset, field, count):
+    """
+    Sets a count column to its recomputed value on the rows where it
+    differs, marking them as updated for the sync of offline clients
+    :param queryset: rows to rebuild
+    :param field: count column
+    :param count: expression computing the count
+    :return: (number of updated rows, set of the ids of their users)
+    """
+    changed = queryset.exclude(**{field: count})
+    user_ids = set(changed.values_list('user_id', flat=True).distinct())
+    updated = changed.update(updated_at=timezone.now(), **{field: count})
+    return updated, user_ids
+
+
+def rebuild_recipe_counts(model, ids=None):
+    """
+    Recomputes recipe_count from the through table in a single UPDATE of
+    the drifted rows, then signals the users whose counts changed so
+    their cached lists are invalidated
+    :param model: Tag or Ingredient
+    :param ids: only rebuild these objects, all of them when None
+    :return: number of updated rows
+    """
+    through, recipe_column, target_column = get_link_columns(model)
+    links = through.objects.filter(
+        **{target_column: OuterRef('pk')}
+    ).order_by().values(target_column).annotate(
+        total=Count('*')
+    ).values('total')
+    queryset = model.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    updated, user_ids = update_counts(
+        queryset, 'recipe_count', Coalesce(Subquery(links), 0)
+    )
+    if user_ids:
+        recipe_counts_rebuilt.send(sender=model, user_ids=user_ids)
+    return updated
+
+
+def rebuild_link_counts(model, ids=None):
+    """
+    Recomputes the recipe column counting the links to a model from the
+    through table in a single UPDATE of the drifted rows
+    :param model: Tag or Ingredient
+    :param ids: only rebuild these recipes, all of them when None
+    :return: number of updated rows
+    """
+    through, recipe_column, target_column = get_link_columns(model)
+    links = through.objects.filter(
+        **{recipe_column: OuterRef('pk')}
+    ).order_by().values(recipe_column).annotate(
+        total=Count('*')
+    ).values('total')
+    queryset = Recipe.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    return update_counts(
+        queryset, LINK_COUNT_FIELDS[model], Coalesce(Subquery(links), 0)
+    )[0]
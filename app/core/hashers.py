@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+class HashPoolBusy(APIException):
+    """
+    Every thread of the hash pool is busy and its queue is full
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many logins in progress, try again later.')
+    default_code = 'hash_pool_busy'
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher whose iteration count comes from the
+    PASSWORD_HASH_ITERATIONS setting. Hashes made with another count are
+    rehashed on the next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(
+            settings,
+            'PASSWORD_HASH_ITERATIONS',
+            PBKDF2PasswordHasher.iterations
+        )
+
+
+def get_hash_pool():
+    """
+    Returns the thread pool running password hashes with the semaphore
+    bounding the hashes running or queued in it, or None when
+    PASSWORD_HASH_WORKERS is 0 and hashes run in the calling thread
+    :return: (ThreadPoolExecutor, BoundedSemaphore) tuple or None
+    """
+    global _pool, _slots
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', os.cpu_count())
+    if not workers:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix='password-hash'
+            )
+            _slots = threading.BoundedSemaphore(
+                workers + getattr(settings, 'PASSWORD_HASH_QUEUE', workers)
+            )
+        return _pool, _slots
+
+
+@receiver(setting_changed)
+def reset_hash_pool(setting, **kwargs):
+    global _pool, _slots
+    if setting in ('PASSWORD_HASH_WORKERS', 'PASSWORD_HASH_QUEUE') and \
+            _pool is not None:
+        _pool.shutdown(wait=False)
+        _pool = _slots = None
+
+
+def run_hasher(func, *args):
+    """
+    Runs a CPU bound hashing function in the hash pool and waits for it.
+    At most PASSWORD_HASH_WORKERS hashes are computed at once and
+    PASSWORD_HASH_QUEUE more wait for a thread. Beyond that the request
+    is refused with 503 right away, rather than queued behind hashes it
+    would time out waiting for.
+    :param func: hashing function
+    :param args: arguments of the function
+    :return: return value of the function
+    """
+    pool = get_hash_pool()
+    if pool is None:
+        return func(*args)
+    pool, slots = pool
+    if not slots.acquire(blocking=False):
+        raise HashPoolBusy()
+    try:
+        return pool.submit(func, *args).result()
+    finally:
+        slots.release()
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded, thread safe in-process mapping that evicts the least recently
+    used entry when full and drops entries older than their time to live
+    """
+
+    def __init__(self, max_size, ttl=None):
+        """
+        :param max_size: maximum number of entries
+        :param ttl: seconds an entry stays valid, None for no expiry
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for key and marks it as recently used
+        :param key: cache key
+        :param default: value returned on a miss
+        :return: stored value or default
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Stores value for key, evicting the least recently used entry if
+        the cache is full
+        :param key: cache key
+        :param value: value to store
+        :return: None
+        """
+        expires = None
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
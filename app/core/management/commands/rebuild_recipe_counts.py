@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.counters import RECIPE_FIELDS, rebuild_recipe_counts, \
+    rebuild_link_counts
+
+
+class Command(BaseCommand):
+    """
+    Django command to recompute recipe_count of tags and ingredients and
+    the tag and ingredient counts of recipes
+    """
+    help = 'Recomputes the recipe count of every tag and ingredient, and ' \
+           'the tag and ingredient counts of every recipe, from the recipe ' \
+           'links in one UPDATE per column'
+
+    def handle(self, *args, **options):
+        for model in RECIPE_FIELDS:
+            with transaction.atomic():
+                updated = rebuild_recipe_counts(model)
+            self.stdout.write('Fixed %d drifted %s counts' % (
+                updated, model._meta.verbose_name
+            ))
+            with transaction.atomic():
+                updated = rebuild_link_counts(model)
+            self.stdout.write('Fixed %d drifted recipe %s counts' % (
+                updated, model._meta.verbose_name
+            ))
+        self.stdout.write(self.style.SUCCESS('Recipe counts rebuilt!'))
@@ -0,0 +1,40 @@
+import signal
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+from core.taskqueue import Worker
+
+
+class Command(BaseCommand):
+    """
+    Django command to run queued background tasks
+    """
+    help = 'Runs queued background tasks in threads until stopped. Start ' \
+           'more processes to use more cores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            help='Worker threads, TASK_QUEUE CONCURRENCY '
+                                 'by default')
+        parser.add_argument('--burst', action='store_true',
+                            help='Run the due tasks and exit')
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        worker = Worker(concurrency=options['concurrency'])
+
+        if options['burst']:
+            count = worker.run_pending()
+            self.stdout.write(self.style.SUCCESS('Ran %d tasks' % count))
+            return
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after the running tasks...')
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write('Running tasks with %d threads' %
+                          worker.concurrency)
+        worker.run()
@@ -1,20 +1,51 @@
 import time
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """
     Django command to pause execution until database is available
     """
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default',
+                            help='Alias of the database to wait for')
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Seconds to wait before giving up')
+        parser.add_argument('--initial-delay', type=float, default=0.1,
+                            help='Seconds to wait after the first failure')
+        parser.add_argument('--max-delay', type=float, default=5,
+                            help='Upper bound of the wait between probes')
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        db_conn = connections[options['database']]
+        deadline = time.monotonic() + options['timeout']
+        delay = options['initial_delay']
+        while True:
             try:
-                db_conn = connections['default']
+                self.probe(db_conn)
+                break
             except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 sec...')
-                time.sleep(1)
+                if time.monotonic() + delay > deadline:
+                    raise CommandError(
+                        'Database unavailable after %s sec' %
+                        options['timeout']
+                    )
+                self.stdout.write(
+                    'Database unavailable, waiting %.1f sec...' % delay
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
         self.stdout.write(self.style.SUCCESS('Database available!'))
+
+    def probe(self, db_conn):
+        """
+        Opens a connection and runs a trivial query on it
+        :param db_conn: database connection
+        :return: None
+        """
+        with db_conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
@@ -0,0 +1,445 @@
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Bearer token of the /metrics endpoint, which only staff users can
+    # read without one
+    'TOKEN': None,
+    # Directory shared by the worker processes, each writes the snapshot
+    # of its histograms there and /metrics adds them up. Without it every
+    # process exposes its own numbers.
+    'DIR': None,
+    # Seconds between two snapshots of a process
+    'FLUSH_SECONDS': 1,
+}
+
+# Values below 2 ** (SUB_BUCKET_BITS + 1) get a bucket each, larger ones
+# share 2 ** SUB_BUCKET_BITS buckets per power of two, which bounds the
+# relative error of a recorded value to 1 / 2 ** SUB_BUCKET_BITS
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+LINEAR_LIMIT = SUB_BUCKETS * 2
+
+
+def power_of_two_bounds(low, high):
+    """
+    Returns the bucket bounds 2 ** bits - 1 for bits from low to high,
+    which fall on bucket edges so their cumulative counts are exact
+    :param low: bits of the first bound
+    :param high: bits of the last bound
+    :return: list of int
+    """
+    return [(1 << bits) - 1 for bits in range(low, high + 1)]
+
+
+# Microseconds from 127us to 33.5s
+DURATION_BOUNDS = power_of_two_bounds(7, 25)
+
+# (name, help, scale from the recorded integer to the exported unit,
+# exported bucket bounds, larger values only count in +Inf)
+REQUEST_METRICS = (
+    ('http_request_duration_seconds',
+     'Total time spent handling the request', 1e-6, DURATION_BOUNDS),
+    ('http_request_db_queries',
+     'Number of SQL queries run by the request', 1,
+     power_of_two_bounds(0, 10)),
+    ('http_request_db_duration_seconds',
+     'Time spent running SQL queries', 1e-6, DURATION_BOUNDS),
+    ('http_request_serialize_duration_seconds',
+     'Time spent rendering the response body', 1e-6, DURATION_BOUNDS),
+)
+
+
+def bucket_index(value):
+    """
+    Returns the HDR style bucket of a non negative integer
+    :param value: int
+    :return: int
+    """
+    if value < LINEAR_LIMIT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_upper_bound(index):
+    """
+    Returns the largest value stored in a bucket
+    :param index: bucket index
+    :return: int
+    """
+    if index < LINEAR_LIMIT:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    top = index % SUB_BUCKETS + SUB_BUCKETS
+    return ((top + 1) << shift) - 1
+
+
+def get_options():
+    """
+    Returns the METRICS setting merged over the defaults
+    :return: dictionary
+    """
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'METRICS', {}))
+    return options
+
+
+class Histogram:
+    """
+    Sparse log-linear histogram of non negative integers. Recording is a
+    couple of integer operations and a dict update, so it is cheap enough
+    to run on every request. Not thread safe on its own, the registry
+    serializes access.
+    """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """
+        Returns the upper bound of the bucket holding the given fraction
+        of the recorded values
+        :param fraction: number between 0 and 1
+        :return: int
+        """
+        if not self.count:
+            return 0
+        rank = max(1, int(round(self.count * fraction)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_upper_bound(index), self.max)
+        return self.max
+
+    def copy(self):
+        histogram = Histogram()
+        histogram.counts = dict(self.counts)
+        histogram.count = self.count
+        histogram.total = self.total
+        histogram.max = self.max
+        return histogram
+
+    def merge(self, other):
+        """
+        Adds the values recorded by another histogram
+        :param other: Histogram
+        :return: None
+        """
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def to_dict(self):
+        return {'counts': self.counts, 'count': self.count,
+                'total': self.total, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {
+            int(index): count for index, count in data['counts'].items()
+        }
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.max = data['max']
+        return histogram
+
+    def cumulative_counts(self, bounds):
+        """
+        Returns the cumulative counts at fixed bucket bounds, the same for
+        every series of a metric so histogram_quantile() can aggregate
+        them. The bounds must fall on bucket edges, e.g. 2 ** n - 1.
+        :param bounds: ascending list of upper bounds
+        :return: list of (upper bound, count) tuples
+        """
+        result = []
+        seen = 0
+        indexes = sorted(self.counts)
+        position = 0
+        for bound in bounds:
+            while position < len(indexes) and \
+                    bucket_upper_bound(indexes[position]) <= bound:
+                seen += self.counts[indexes[position]]
+                position += 1
+            result.append((bound, seen))
+        return result
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_series(metrics, series):
+    """
+    Returns histograms in the Prometheus text exposition format
+    :param metrics: tuple of (name, help, scale, bounds)
+    :param series: dictionary of (view, method) to list of Histogram in
+                   the order of metrics
+    :return: str
+    """
+    snapshot = [
+        (labels, [
+            (h.cumulative_counts(metric[3]), h.total, h.count)
+            for metric, h in zip(metrics, histograms)
+        ])
+        for labels, histograms in sorted(series.items())
+    ]
+
+    lines = []
+    for position, (name, text, scale, _) in enumerate(metrics):
+        lines.append('# HELP %s %s' % (name, text))
+        lines.append('# TYPE %s histogram' % name)
+        for (view, method), histograms in snapshot:
+            buckets, total, count = histograms[position]
+            labels = 'view="%s",method="%s"' % (
+                escape_label(view), escape_label(method)
+            )
+            for bound, seen in buckets:
+                lines.append('%s_bucket{%s,le="%s"} %d' % (
+                    name, labels, format_number(bound * scale), seen
+                ))
+            lines.append('%s_bucket{%s,le="+Inf"} %d' % (
+                name, labels, count
+            ))
+            lines.append('%s_sum{%s} %s' % (
+                name, labels, format_number(total * scale)
+            ))
+            lines.append('%s_count{%s} %d' % (name, labels, count))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsRegistry:
+    """
+    In-process store of the request histograms of every (view, method)
+    pair. Each worker process keeps its own numbers, SnapshotFiles adds
+    them up across processes.
+    """
+
+    def __init__(self, metrics=REQUEST_METRICS):
+        self.metrics = metrics
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def record(self, labels, values):
+        """
+        Records one request
+        :param labels: tuple of (view, method)
+        :param values: integers in the order of self.metrics
+        :return: None
+        """
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [
+                    Histogram() for _ in self.metrics
+                ]
+            for histogram, value in zip(series, values):
+                histogram.record(value)
+
+    def get(self, labels, name):
+        """
+        Returns a copy of the histogram of a metric
+        :param labels: tuple of (view, method)
+        :param name: metric name
+        :return: Histogram or None
+        """
+        position = [metric[0] for metric in self.metrics].index(name)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                return None
+            return series[position].copy()
+
+    def snapshot(self):
+        """
+        Returns a copy of every histogram
+        :return: dictionary of (view, method) to list of Histogram
+        """
+        with self._lock:
+            return {
+                labels: [histogram.copy() for histogram in series]
+                for labels, series in self._series.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """
+        Returns every histogram in the Prometheus text exposition format
+        :return: str
+        """
+        return render_series(self.metrics, self.snapshot())
+
+
+class SnapshotFiles:
+    """
+    Snapshots of the registries of every process in a shared directory,
+    like the multiprocess mode of the Prometheus client. A thread of each
+    process rewrites its own file every FLUSH_SECONDS, so requests only
+    pay for recording; the snapshot holds the registry lock while it
+    copies the histograms. Files of exited processes are kept and still
+    counted, so the totals never go backwards when workers are recycled.
+    The directory is emptied when the server starts.
+    """
+
+    def __init__(self, directory, interval):
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._path = None
+        self._thread_pid = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def get_path(self):
+        """
+        Returns the snapshot file of this process, named after its pid and
+        a random suffix so a reused pid never overwrites another process
+        :return: str
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, 'metrics-%d-%s.json' % (
+                self._pid, uuid.uuid4().hex[:8]
+            ))
+        return self._path
+
+    def start(self, registry):
+        """
+        Starts the thread writing the snapshots of this process, once per
+        process as a forked worker doesn't inherit the thread
+        :param registry: MetricsRegistry of this process
+        :return: None
+        """
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(
+                target=self.loop, args=(registry,),
+                name='metrics-snapshots', daemon=True
+            ).start()
+
+    def loop(self, registry):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.flush(registry)
+            except Exception:
+                logger.exception('Metrics snapshot failed')
+
+    def stop(self):
+        """
+        Stops the snapshot thread of this process
+        :return: None
+        """
+        self._stopping.set()
+
+    def flush(self, registry):
+        """
+        Writes the snapshot of a registry
+        :param registry: MetricsRegistry of this process
+        :return: None
+        """
+        with self._lock:
+            data = [
+                [list(labels), [h.to_dict() for h in series]]
+                for labels, series in registry.snapshot().items()
+            ]
+            path = self.get_path()
+            temporary = path + '.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(data, f)
+            os.replace(temporary, path)
+
+    def collect(self):
+        """
+        Adds up the snapshots of every process
+        :return: dictionary of (view, method) to list of Histogram
+        """
+        series = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for labels, histograms in data:
+                histograms = [Histogram.from_dict(h) for h in histograms]
+                merged = series.get(tuple(labels))
+                if merged is None:
+                    series[tuple(labels)] = histograms
+                else:
+                    for total, histogram in zip(merged, histograms):
+                        total.merge(histogram)
+        return series
+
+
+def clear_snapshots(directory):
+    """
+    Removes the snapshot files of a previous run of the server
+    :param directory: snapshot directory
+    :return: None
+    """
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, 'metrics-*')):
+        os.remove(path)
+
+
+_registry = MetricsRegistry()
+
+
+_snapshot_files = {}
+
+
+def get_registry():
+    return _registry
+
+
+def get_snapshot_files():
+    """
+    Returns the snapshot files of the METRICS DIR setting
+    :return: SnapshotFiles or None without a directory
+    """
+    options = get_options()
+    if not options['DIR']:
+        return None
+    key = (options['DIR'], options['FLUSH_SECONDS'])
+    files = _snapshot_files.get(key)
+    if files is None:
+        files = _snapshot_files.setdefault(
+            key, SnapshotFiles(*key)
+        )
+    return files
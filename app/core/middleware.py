@@ -0,0 +1,160 @@
+import hashlib
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+
+from .metrics import get_registry, get_snapshot_files
+from .routers import get_replicas, use_replicas
+
+UNMATCHED_VIEW = '<unmatched>'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class QueryTimer:
+    """
+    Database execute wrapper counting the queries of a request and the
+    time spent running them
+    """
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - start
+            self.count += 1
+
+
+class RenderTimer:
+    """
+    Measures the time spent rendering a template or API response
+    """
+    __slots__ = ('start', 'duration')
+
+    def __init__(self):
+        self.start = None
+        self.duration = 0.0
+
+    def __call__(self, response):
+        if self.start is not None:
+            self.duration = perf_counter() - self.start
+
+
+class MetricsMiddleware:
+    """
+    Records the total time, SQL query count, SQL time and response
+    rendering time of every request into per view histograms. Streamed
+    response bodies are produced after the middleware returns and are not
+    part of the total.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.registry = get_registry()
+        self.snapshot_files = get_snapshot_files()
+
+    def __call__(self, request):
+        start = perf_counter()
+        queries = QueryTimer()
+        request._render_timer = render = RenderTimer()
+        wrapped = connections.all()
+        for connection in wrapped:
+            connection.execute_wrappers.append(queries)
+        try:
+            response = self.get_response(request)
+        finally:
+            for connection in wrapped:
+                connection.execute_wrappers.remove(queries)
+
+        total = perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNMATCHED_VIEW
+        self.registry.record((view, request.method), (
+            int(total * 1e6 + 0.5),
+            queries.count,
+            int(queries.duration * 1e6 + 0.5),
+            int(render.duration * 1e6 + 0.5),
+        ))
+        if self.snapshot_files is not None:
+            self.snapshot_files.start(self.registry)
+        return response
+
+    def process_template_response(self, request, response):
+        render = getattr(request, '_render_timer', None)
+        if render is not None:
+            render.start = perf_counter()
+            response.add_post_render_callback(render)
+        return response
+
+
+def iter_on_replicas(content):
+    """
+    Produces a streamed response body with the reads on a replica
+    :param content: iterator of the body
+    :return: iterator of the body
+    """
+    with use_replicas():
+        yield from content
+
+
+class ReplicaMiddleware:
+    """
+    Sends the reads of safe requests to a read replica, unless the client
+    sent an unsafe request in the last DATABASE_REPLICA_PIN_SECONDS: its
+    reads stay on the primary until the replicas have caught up with its
+    writes. Token authenticated clients are pinned by user, so all of a
+    user's clients read its writes, anonymous ones by address.
+    """
+    key_prefix = 'replica-pin:'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_replicas():
+            return self.get_response(request)
+
+        pins = caches[settings.DATABASE_REPLICA_PIN_CACHE]
+        key = self.get_pin_key(request)
+        if request.method not in SAFE_METHODS:
+            try:
+                return self.get_response(request)
+            finally:
+                pins.set(key, True, settings.DATABASE_REPLICA_PIN_SECONDS)
+        if pins.get(key):
+            return self.get_response(request)
+
+        with use_replicas():
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = iter_on_replicas(
+                response.streaming_content
+            )
+        return response
+
+    def get_pin_key(self, request):
+        """
+        Returns the cache key pinning the client to the primary
+        :param request: request object
+        :return: str
+        """
+        try:
+            entry = CachedTokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            entry = None
+        if entry is not None:
+            return self.key_prefix + 'user:%d' % entry[0].pk
+        return self.key_prefix + 'ip:' + hashlib.sha1(
+            request.META.get('REMOTE_ADDR', '').encode('utf-8')
+        ).hexdigest()
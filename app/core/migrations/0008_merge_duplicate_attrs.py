@@ -0,0 +1,47 @@
+# Generated by Django 2.1.15 on 2026-10-18 20:41
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Merges tags and ingredients sharing a (user, name) pair into the
+    oldest one, moving their recipe links, so the unique constraint can
+    be added
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tag', 'tags'),
+                                   ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        fk_name = model_name.lower() + '_id'
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep_id=Min('id'), total=Count('id')
+        ).filter(total__gt=1)
+        for dup in duplicates:
+            drop_ids = list(model.objects.filter(
+                user=dup['user'], name=dup['name']
+            ).exclude(id=dup['keep_id']).values_list('id', flat=True))
+            linked = set(through.objects.filter(
+                **{fk_name: dup['keep_id']}
+            ).values_list('recipe_id', flat=True))
+            for row in through.objects.filter(**{fk_name + '__in': drop_ids}):
+                if row.recipe_id in linked:
+                    row.delete()
+                else:
+                    setattr(row, fk_name, dup['keep_id'])
+                    row.save()
+                    linked.add(row.recipe_id)
+            model.objects.filter(id__in=drop_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
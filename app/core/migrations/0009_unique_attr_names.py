@@ -0,0 +1,21 @@
+# Generated by Django 2.1.15 on 2026-10-18 20:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_merge_duplicate_attrs'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='ingredient',
+            unique_together={('user', 'name')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='tag',
+            unique_together={('user', 'name')},
+        ),
+    ]
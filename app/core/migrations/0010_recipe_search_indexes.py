@@ -0,0 +1,38 @@
+# Generated by Django 2.1.15 on 2026-10-18 20:48
+
+from django.db import migrations, models
+
+
+def create_title_trgm_index(apps, schema_editor):
+    """
+    Indexes UPPER(title) with trigrams on PostgreSQL, title__icontains
+    is run as UPPER(title::text) LIKE UPPER(%s) and uses this index
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_title_trgm_idx ON core_recipe '
+        'USING gin ((UPPER("title"::text)) gin_trgm_ops)'
+    )
+
+
+def drop_title_trgm_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS core_recipe_title_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_unique_attr_names'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='core_recipe_user_id_idx'),
+        ),
+        migrations.RunPython(create_title_trgm_index, drop_title_trgm_index),
+    ]
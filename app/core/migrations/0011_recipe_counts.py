@@ -0,0 +1,44 @@
+# Generated by Django 2.1.15 on 2026-10-18 20:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    """
+    Fills recipe_count of existing tags and ingredients
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tag', 'tags'),
+                                   ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        column = model_name.lower() + '_id'
+        links = through.objects.filter(
+            **{column: OuterRef('pk')}
+        ).order_by().values(column).annotate(
+            total=Count('*')
+        ).values('total')
+        model.objects.update(recipe_count=Coalesce(Subquery(links), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+    ]
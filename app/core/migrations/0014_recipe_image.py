@@ -0,0 +1,24 @@
+# Generated by Django 2.1.15 on 2026-10-18 21:25
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_import_job_file_and_background_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.TextField(default='{}'),
+        ),
+    ]
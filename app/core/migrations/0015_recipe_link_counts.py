@@ -0,0 +1,52 @@
+# Generated by Django 2.1.15 on 2026-10-18 21:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_links(apps, schema_editor):
+    """
+    Fills tag_count and ingredient_count of existing recipes
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    for field_name, count_field in (('tags', 'tag_count'),
+                                    ('ingredients', 'ingredient_count')):
+        through = getattr(Recipe, field_name).through
+        links = through.objects.filter(
+            recipe_id=OuterRef('pk')
+        ).order_by().values('recipe_id').annotate(
+            total=Count('*')
+        ).values('total')
+        Recipe.objects.update(**{count_field: Coalesce(Subquery(links), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_links, migrations.RunPython.noop),
+        # Covering indexes of the similar recipes lookup, which reads the
+        # recipes linked to some tags or ingredients from the index only
+        migrations.RunSQL(
+            ['CREATE INDEX core_recipe_tags_tag_recipe_idx '
+             'ON core_recipe_tags (tag_id, recipe_id)',
+             'CREATE INDEX core_recipe_ingredients_ingredient_recipe_idx '
+             'ON core_recipe_ingredients (ingredient_id, recipe_id)'],
+            ['DROP INDEX core_recipe_tags_tag_recipe_idx',
+             'DROP INDEX core_recipe_ingredients_ingredient_recipe_idx'],
+        ),
+    ]
@@ -1,10 +1,65 @@
-from django.db import models
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.db import models, transaction, connections, IntegrityError
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
+from django.contrib.auth.hashers import make_password, check_password
 from django.conf import settings
+from django.utils import timezone
+
+from .hashers import run_hasher
+
+_user_deletes = threading.local()
+
+
+@contextmanager
+def deleting_users():
+    """
+    Collects the ids of the users deleted by the current thread inside the
+    block, whose objects get no tombstones. They are forgotten on exit
+    whether the delete committed or rolled back.
+    """
+    previous = getattr(_user_deletes, 'ids', None)
+    if previous is None:
+        _user_deletes.ids = set()
+    try:
+        yield
+    finally:
+        _user_deletes.ids = previous
+
+
+def mark_user_deleted(user_id):
+    """
+    Records a user deleted inside deleting_users()
+    :param user_id: id of the user
+    :return: None
+    """
+    ids = getattr(_user_deletes, 'ids', None)
+    if ids is not None:
+        ids.add(user_id)
+
+
+def is_user_deleted(user_id):
+    """
+    Checks whether a user is being deleted by the current thread
+    :param user_id: id of the user
+    :return: bool
+    """
+    ids = getattr(_user_deletes, 'ids', None)
+    return ids is not None and user_id in ids
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    def delete(self):
+        with deleting_users():
+            return super().delete()
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, password=None, **extra_fields):
         """
         Creates and saves a new user
@@ -16,6 +71,8 @@ class UserManager(BaseUserManager):
         if not email:
             raise ValueError('Users must have an email address')
         user = self.model(email=self.normalize_email(email), **extra_fields)
+        # Hashed here rather than in a background task: the plain password
+        # must not be stored for a worker and the user logs in right after
         user.set_password(password)
         user.save()
 
@@ -49,6 +106,96 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'
 
+    def delete(self, using=None, keep_parents=False):
+        with deleting_users():
+            return super().delete(using, keep_parents)
+
+    def set_password(self, raw_password):
+        """
+        Hashes the password in the password hash pool
+        :param raw_password: password in plain text
+        :return: None
+        """
+        self.password = run_hasher(make_password, raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Verifies the password in the password hash pool, rehashing it
+        with the preferred hasher settings if they changed
+        :param raw_password: password in plain text
+        :return: bool
+        """
+        outdated = []
+        valid = run_hasher(
+            check_password, raw_password, self.password, outdated.append
+        )
+        if outdated:
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes
+            self._password = None
+            self.save(update_fields=['password'])
+        return valid
+
+
+class RecipeAttrManager(models.Manager):
+    def bulk_get_or_create(self, user, names):
+        """
+        Fetches the objects of a user matching the names and bulk creates
+        the missing ones
+        :param user: owner of the objects
+        :param names: iterable of names, duplicates are ignored
+        :return: tuple of (created, existing) lists of objects
+        """
+        names = list(OrderedDict.fromkeys(names))
+        try:
+            with transaction.atomic(using=self.db):
+                return self._bulk_get_or_create(user, names)
+        except IntegrityError:
+            # A concurrent request inserted some of the names first, they
+            # are found as existing on the second pass
+            with transaction.atomic(using=self.db):
+                return self._bulk_get_or_create(user, names)
+
+    def _bulk_get_or_create(self, user, names):
+        existing = self._filter_names(user, names)
+        found = {obj.name for obj in existing}
+        created = [
+            self.model(user=user, name=name)
+            for name in names if name not in found
+        ]
+        if not created:
+            return [], existing
+
+        connection = connections[self.db]
+        fields = [self.model._meta.get_field('user'),
+                  self.model._meta.get_field('name')]
+        self.bulk_create(
+            created,
+            batch_size=connection.ops.bulk_batch_size(fields, created)
+        )
+        if not connection.features.can_return_ids_from_bulk_insert:
+            created = self._filter_names(
+                user, [obj.name for obj in created]
+            )
+        return created, existing
+
+    def _filter_names(self, user, names):
+        """
+        Fetches objects by name in batches that fit in the query
+        parameter limit of the database
+        :param user: owner of the objects
+        :param names: list of names
+        :return: List of objects
+        """
+        max_params = connections[self.db].features.max_query_params
+        batch_size = max_params - 1 if max_params else max(len(names), 1)
+        objs = []
+        for i in range(0, len(names), batch_size):
+            batch = names[i:i + batch_size]
+            objs.extend(self.filter(user=user, name__in=batch))
+        return objs
+
 
 class Tag(models.Model):
     """
@@ -59,6 +206,24 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Number of recipes using this object, maintained by core.signals
+    recipe_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeAttrManager()
+
+    class Meta:
+        unique_together = ('user', 'name')
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_tag_user_name_id_idx'
+            ),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_tag_user_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -73,11 +238,41 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    # Number of recipes using this object, maintained by core.signals
+    recipe_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeAttrManager()
+
+    class Meta:
+        unique_together = ('user', 'name')
+        indexes = [
+            models.Index(
+                fields=['user', 'name', 'id'],
+                name='core_ingr_user_name_id_idx'
+            ),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_ingr_user_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+def recipe_image_file_path(instance, filename):
+    """
+    Generates a unique path for an uploaded recipe image, so a replaced
+    image never shares the name, and cached copies, of the previous one
+    :param instance: Recipe
+    :param filename: name of the uploaded file
+    :return: path relative to MEDIA_ROOT
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join('recipes', uuid.uuid4().hex + ext)
+
+
 class Recipe(models.Model):
     """
     Recipe model
@@ -92,6 +287,137 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
+    # Number of tags and ingredients linked, kept up to date by
+    # core.signals for the similarity ranking of recipe.similar
+    tag_count = models.PositiveIntegerField(default=0)
+    ingredient_count = models.PositiveIntegerField(default=0)
+    image = models.ImageField(upload_to=recipe_image_file_path, blank=True)
+    # JSON mapping of variant names to the resized copies of the image,
+    # filled by a background task once they are generated
+    image_variants = models.TextField(default='{}')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'id'],
+                name='core_recipe_user_id_idx'
+            ),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_recipe_user_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted tag, ingredient or recipe, so offline clients
+    syncing their changes learn about deletes
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    # Label of the model of the deleted object, e.g. core.recipe
+    model = models.CharField(max_length=100)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'deleted_at'],
+                name='core_tombstone_user_del_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.model, self.object_id)
+
+
+class ImportJob(models.Model):
+    """
+    Progress of a bulk recipe import, committed with every batch so an
+    interrupted import can be resumed from the last imported record
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    source = models.CharField(max_length=255, blank=True)
+    format = models.CharField(max_length=10)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING
+    )
+    # Number of records of the file consumed, imported or rejected
+    position = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    # JSON list of the first rejected records with their errors
+    errors = models.TextField(default='[]')
+    # Uploaded file waiting for a background import, removed once done
+    file = models.FileField(upload_to='imports', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return '%s (%s)' % (self.source, self.status)
+
+
+class BackgroundTask(models.Model):
+    """
+    Task queued in the database by core.taskqueue, kept with its result
+    once finished
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=255)
+    # JSON [args, kwargs] of the call
+    arguments = models.TextField()
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_retries = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    # JSON return value of the task
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'],
+                name='core_task_status_run_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return '%s (%s)' % (self.name, self.status)
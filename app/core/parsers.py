@@ -0,0 +1,42 @@
+import io
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSON parser decoding UTF-8 bodies with orjson. Bodies orjson rejects
+    are handed to DRF's JSONParser, which accepts the same documents
+    except integers beyond 64 bits and reports the errors.
+    """
+    renderer_class = ORJSONRenderer
+
+    def __init__(self):
+        if orjson is None:
+            raise ImproperlyConfigured(
+                'ORJSONParser requires the orjson package'
+            )
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """
+        Parses a JSON request body
+        :param stream: request body stream
+        :param media_type: media type of the body
+        :param parser_context: context of the view
+        :return: parsed data
+        """
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type,
+                                 parser_context)
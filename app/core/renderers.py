@@ -0,0 +1,67 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LINE_SEPARATOR = '\u2028'.encode('utf-8')
+PARAGRAPH_SEPARATOR = '\u2029'.encode('utf-8')
+
+# Types orjson formats differently from DRF's encoder go to the encoder
+PASSTHROUGH = 0 if orjson is None else \
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON renderer encoding with orjson. Output is byte for byte the output
+    of DRF's JSONRenderer with the default compact and unicode settings:
+    types orjson doesn't know go through DRF's encoder, and anything
+    orjson rejects (non string keys, integers beyond 64 bits) and every
+    indented or ASCII only response is rendered by JSONRenderer itself.
+    Two differences are left. Floats in exponent notation are formatted
+    as 1e16 instead of 1e+16. NaN and infinities are rendered as null,
+    where JSONRenderer raises ValueError with STRICT_JSON; finding them
+    would take a walk of the data that costs more than orjson saves, and
+    the API returns decimals as strings and only finite similarity
+    scores as floats.
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise ImproperlyConfigured(
+                'ORJSONRenderer requires the orjson package'
+            )
+        self.default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Renders data into JSON
+        :param data: data to render
+        :param accepted_media_type: media type accepted by the client
+        :param renderer_context: context of the view
+        :return: bytes
+        """
+        if data is None:
+            return bytes()
+        if self.ensure_ascii or not self.compact or self.get_indent(
+                accepted_media_type, renderer_context or {}
+        ) is not None:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.default,
+                               option=PASSTHROUGH)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        # Escaped like JSONRenderer so the output stays valid javascript
+        if LINE_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028')
+        if PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
@@ -0,0 +1,79 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_state = threading.local()
+
+
+def get_replicas():
+    """
+    Returns the database aliases of the read replicas
+    :return: list of aliases
+    """
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_replicas():
+    """
+    Sends the reads of the current thread to the read replicas
+    """
+    previous = getattr(_state, 'replica', None)
+    _state.replica = random.choice(get_replicas())
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+@contextmanager
+def use_primary():
+    """
+    Sends the reads of the current thread to the primary, inside
+    use_replicas() too
+    """
+    previous = getattr(_state, 'replica', None)
+    _state.replica = None
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def reading_from_replica():
+    """
+    Returns whether the reads of the current thread go to a replica
+    :return: bool
+    """
+    return getattr(_state, 'replica', None) is not None
+
+
+class ReplicaRouter:
+    """
+    Routes reads inside use_replicas() to the replica picked for the
+    request and leaves the others to the default routing. Writes of
+    objects read from a replica go to the primary. Replicas aren't
+    migrated, they copy the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'replica', None)
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in get_replicas():
+            return PRIMARY
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = [PRIMARY] + get_replicas()
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
@@ -0,0 +1,136 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, \
+    m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .authentication import get_token_cache
+from .counters import RECIPE_FIELDS, LINK_COUNT_FIELDS, linked_pairs, \
+    linked_counts, apply_deltas, get_link_columns
+from .models import Recipe, Tag, Ingredient, Tombstone, \
+    mark_user_deleted, is_user_deleted
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+    Drops a deleted token from the authentication cache
+    """
+    get_token_cache().delete(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """
+    Drops the cached tokens of a user whenever it is saved, so
+    deactivations and profile updates are seen on the next request
+    """
+    if created:
+        return
+    cache = get_token_cache()
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    for key in keys:
+        cache.delete(key)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_recipe_counts(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """
+    Keeps recipe_count of tags and ingredients, and the tag_count and
+    ingredient_count of recipes, in step with the recipe links. Removed
+    links are read before the delete, with their rows locked, and applied
+    as atomic increments after it.
+    """
+    model = Tag if sender is Recipe.tags.through else Ingredient
+
+    if action == 'post_add':
+        pairs = [
+            (pk, instance.pk) if reverse else (instance.pk, pk)
+            for pk in pk_set
+        ]
+        apply_link_deltas(model, pairs)
+    elif action in ('pre_remove', 'pre_clear'):
+        if reverse:
+            pairs = linked_pairs(model, recipe_ids=pk_set,
+                                 target_ids=[instance.pk])
+        else:
+            pairs = linked_pairs(model, recipe_ids=[instance.pk],
+                                 target_ids=pk_set)
+        instance._removed_recipe_links = pairs
+    elif action in ('post_remove', 'post_clear'):
+        pairs = getattr(instance, '_removed_recipe_links', [])
+        del instance._removed_recipe_links
+        apply_link_deltas(model, pairs, sign=-1)
+
+
+def apply_link_deltas(model, pairs, sign=1):
+    """
+    Counts added or removed links in the objects and the recipes they link
+    :param model: Tag or Ingredient
+    :param pairs: list of (recipe id, object id) tuples
+    :param sign: 1 to add links, -1 to remove them
+    :return: None
+    """
+    apply_deltas(model, Counter(target for _, target in pairs), sign)
+    apply_deltas(Recipe, Counter(recipe for recipe, _ in pairs), sign,
+                 field=LINK_COUNT_FIELDS[model])
+
+
+@receiver(pre_delete, sender=Recipe)
+def release_recipe_counts(sender, instance, **kwargs):
+    """
+    Decrements recipe_count of the tags and ingredients of a recipe about
+    to be deleted, its links are removed without m2m_changed
+    """
+    for model in RECIPE_FIELDS:
+        apply_deltas(
+            model, linked_counts(model, recipe_ids=[instance.pk]), sign=-1
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def release_link_counts(sender, instance, **kwargs):
+    """
+    Decrements the tag_count or ingredient_count of the recipes linked to
+    a tag or ingredient about to be deleted, in one UPDATE
+    """
+    through, recipe_column, target_column = get_link_columns(sender)
+    field = LINK_COUNT_FIELDS[sender]
+    Recipe.objects.filter(id__in=through.objects.filter(
+        **{target_column: instance.pk}
+    ).values(recipe_column)).update(
+        updated_at=timezone.now(), **{field: F(field) - 1}
+    )
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def start_user_delete(sender, instance, **kwargs):
+    """
+    Flags a user about to be deleted, a tombstone of its objects would
+    reference the deleted user. The flag lasts until User.delete() or
+    the queryset delete returns or raises.
+    """
+    mark_user_deleted(instance.pk)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Records the delete of a tag, ingredient or recipe for the sync of
+    offline clients
+    """
+    if is_user_deleted(instance.user_id):
+        return
+    Tombstone.objects.create(
+        user_id=instance.user_id, model=sender._meta.label_lower,
+        object_id=instance.pk
+    )
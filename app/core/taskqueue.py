@@ -0,0 +1,533 @@
+import itertools
+import json
+import logging
+import threading
+import time
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection, connections, close_old_connections, \
+    transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules, import_string
+
+from .models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BROKER': 'core.taskqueue.DatabaseBroker',
+    'LOCAL_WORKERS': 0,
+    'CONCURRENCY': 4,
+    'MAX_RETRIES': 3,
+    'RETRY_DELAY': 10,
+    'POLL_INTERVAL': 1,
+    'VISIBILITY_TIMEOUT': 3600,
+    'RESULT_TTL': 86400,
+    'HOUSEKEEPING_INTERVAL': 60,
+}
+
+QUEUED = BackgroundTask.STATUS_QUEUED
+RUNNING = BackgroundTask.STATUS_RUNNING
+SUCCEEDED = BackgroundTask.STATUS_SUCCEEDED
+FAILED = BackgroundTask.STATUS_FAILED
+
+# Queued tasks a worker tries to claim when another worker claims the
+# first one, on databases without SKIP LOCKED
+CLAIM_CANDIDATES = 10
+
+TaskMessage = namedtuple(
+    'TaskMessage', 'id name args kwargs attempts max_retries'
+)
+TaskState = namedtuple('TaskState', 'id name status attempts result error')
+
+_tasks = {}
+_broker = None
+_local_worker = None
+_lock = threading.RLock()
+
+
+def get_options():
+    """
+    Returns the TASK_QUEUE setting completed with the defaults
+    :return: dictionary
+    """
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'TASK_QUEUE', {}))
+    return options
+
+
+def get_broker():
+    """
+    Returns the process wide broker configured by the TASK_QUEUE setting
+    :return: broker
+    """
+    global _broker
+    with _lock:
+        if _broker is None:
+            _broker = import_string(get_options()['BROKER'])()
+        return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker, _local_worker
+    if setting == 'TASK_QUEUE':
+        if _local_worker is not None:
+            _local_worker.stop()
+            _local_worker = None
+        _broker = None
+
+
+def encode_arguments(args, kwargs):
+    """
+    Serializes the arguments of a call, which must be JSON values
+    :param args: positional arguments
+    :param kwargs: keyword arguments
+    :return: str
+    """
+    return json.dumps([list(args), kwargs])
+
+
+class MemoryBroker:
+    """
+    Broker keeping tasks and results in the process, for tests and for
+    local workers of a single process. Arguments and results still go
+    through JSON so tasks behave as with the database broker.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.ids = itertools.count(1)
+
+    def enqueue(self, name, args, kwargs, max_retries, run_at):
+        """
+        Queues a call of a task
+        :param name: name of the task
+        :param args: positional arguments
+        :param kwargs: keyword arguments
+        :param max_retries: number of retries after a failure
+        :param run_at: datetime the task is due
+        :return: id of the task
+        """
+        arguments = encode_arguments(args, kwargs)
+        with self.lock:
+            task_id = next(self.ids)
+            self.tasks[task_id] = {
+                'name': name, 'arguments': arguments, 'status': QUEUED,
+                'attempts': 0, 'max_retries': max_retries,
+                'run_at': run_at, 'locked_at': None, 'result': '',
+                'error': '', 'updated_at': timezone.now(),
+            }
+        return task_id
+
+    def reserve(self):
+        """
+        Claims the task due first
+        :return: TaskMessage or None
+        """
+        now = timezone.now()
+        with self.lock:
+            due = [
+                (task['run_at'], task_id)
+                for task_id, task in self.tasks.items()
+                if task['status'] == QUEUED and task['run_at'] <= now
+            ]
+            if not due:
+                return None
+            task_id = min(due)[1]
+            task = self.tasks[task_id]
+            task.update(status=RUNNING, locked_at=now, updated_at=now,
+                        attempts=task['attempts'] + 1)
+            args, kwargs = json.loads(task['arguments'])
+            return TaskMessage(task_id, task['name'], args, kwargs,
+                               task['attempts'], task['max_retries'])
+
+    def update(self, task_id, **fields):
+        with self.lock:
+            self.tasks[task_id].update(updated_at=timezone.now(), **fields)
+
+    def succeed(self, task_id, result):
+        self.update(task_id, status=SUCCEEDED, result=result)
+
+    def retry(self, task_id, error, run_at):
+        self.update(task_id, status=QUEUED, error=error, run_at=run_at)
+
+    def fail(self, task_id, error):
+        self.update(task_id, status=FAILED, error=error)
+
+    def get(self, task_id):
+        """
+        Returns the state of a task
+        :param task_id: id of the task
+        :return: TaskState or None
+        """
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            return TaskState(task_id, task['name'], task['status'],
+                             task['attempts'], task['result'],
+                             task['error'])
+
+    def requeue_stale(self, before):
+        """
+        Queues again the tasks of workers that stopped responding, or
+        fails them once they are out of retries
+        :param before: tasks claimed before this datetime are stale
+        :return: None
+        """
+        with self.lock:
+            for task in self.tasks.values():
+                if task['status'] == RUNNING and task['locked_at'] < before:
+                    if task['attempts'] > task['max_retries']:
+                        task.update(status=FAILED, error='Worker lost')
+                    else:
+                        task['status'] = QUEUED
+
+    def purge(self, before):
+        """
+        Deletes the tasks finished before a datetime
+        :param before: datetime
+        :return: None
+        """
+        with self.lock:
+            for task_id, task in list(self.tasks.items()):
+                if task['status'] in (SUCCEEDED, FAILED) and \
+                        task['updated_at'] < before:
+                    del self.tasks[task_id]
+
+
+class DatabaseBroker:
+    """
+    Broker queueing tasks in the BackgroundTask table, shared by every
+    web and worker process. Tasks queued inside a transaction become
+    visible to workers when it commits.
+    """
+
+    def enqueue(self, name, args, kwargs, max_retries, run_at):
+        return BackgroundTask.objects.create(
+            name=name, arguments=encode_arguments(args, kwargs),
+            max_retries=max_retries, run_at=run_at
+        ).pk
+
+    def reserve(self):
+        """
+        Claims the task due first. Workers skip the rows locked by other
+        workers where the database supports SKIP LOCKED and race on a
+        conditional update elsewhere.
+        :return: TaskMessage or None
+        """
+        now = timezone.now()
+        queued = BackgroundTask.objects.filter(
+            status=QUEUED, run_at__lte=now
+        ).order_by('run_at', 'id')
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                task = queued.select_for_update(skip_locked=True).first()
+                if task is None:
+                    return None
+                task.status = RUNNING
+                task.attempts += 1
+                task.locked_at = now
+                task.save(update_fields=[
+                    'status', 'attempts', 'locked_at', 'updated_at'
+                ])
+            return self.message(task)
+
+        for task in queued[:CLAIM_CANDIDATES]:
+            claimed = BackgroundTask.objects.filter(
+                pk=task.pk, status=QUEUED
+            ).update(status=RUNNING, attempts=F('attempts') + 1,
+                     locked_at=now, updated_at=now)
+            if claimed:
+                task.attempts += 1
+                return self.message(task)
+        return None
+
+    def message(self, task):
+        args, kwargs = json.loads(task.arguments)
+        return TaskMessage(task.pk, task.name, args, kwargs, task.attempts,
+                           task.max_retries)
+
+    def update(self, task_id, **fields):
+        BackgroundTask.objects.filter(pk=task_id).update(
+            updated_at=timezone.now(), **fields
+        )
+
+    def succeed(self, task_id, result):
+        self.update(task_id, status=SUCCEEDED, result=result)
+
+    def retry(self, task_id, error, run_at):
+        self.update(task_id, status=QUEUED, error=error, run_at=run_at)
+
+    def fail(self, task_id, error):
+        self.update(task_id, status=FAILED, error=error)
+
+    def get(self, task_id):
+        task = BackgroundTask.objects.filter(pk=task_id).first()
+        if task is None:
+            return None
+        return TaskState(task.pk, task.name, task.status, task.attempts,
+                         task.result, task.error)
+
+    def requeue_stale(self, before):
+        stale = BackgroundTask.objects.filter(
+            status=RUNNING, locked_at__lt=before
+        )
+        stale.filter(attempts__gt=F('max_retries')).update(
+            status=FAILED, error='Worker lost', updated_at=timezone.now()
+        )
+        stale.update(status=QUEUED, updated_at=timezone.now())
+
+    def purge(self, before):
+        BackgroundTask.objects.filter(
+            status__in=(SUCCEEDED, FAILED), updated_at__lt=before
+        ).delete()
+
+
+class Task:
+    """
+    Function that can be called in a worker with delay()
+    """
+
+    def __init__(self, func, name, max_retries, retry_delay):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """
+        Queues a call of the task
+        :return: id of the queued task
+        """
+        return self.apply_async(args, kwargs)
+
+    def apply_async(self, args=(), kwargs=None, countdown=0):
+        """
+        Queues a call of the task
+        :param args: positional arguments, JSON values
+        :param kwargs: keyword arguments, JSON values
+        :param countdown: seconds to wait before running it
+        :return: id of the queued task
+        """
+        options = get_options()
+        max_retries = self.max_retries
+        if max_retries is None:
+            max_retries = options['MAX_RETRIES']
+        task_id = get_broker().enqueue(
+            self.name, args, kwargs or {}, max_retries,
+            timezone.now() + timedelta(seconds=countdown)
+        )
+        start_local_worker()
+        return task_id
+
+
+def task(name=None, max_retries=None, retry_delay=None):
+    """
+    Registers a function as a task. Tasks live in the tasks module of an
+    app so workers find them.
+    :param name: name of the task, defaults to module.function
+    :param max_retries: retries after a failure, TASK_QUEUE MAX_RETRIES
+    by default
+    :param retry_delay: seconds before the first retry, doubled for every
+    later one, TASK_QUEUE RETRY_DELAY by default
+    :return: decorator
+    """
+    def decorator(func):
+        task_name = name or '%s.%s' % (func.__module__, func.__name__)
+        _tasks[task_name] = Task(func, task_name, max_retries, retry_delay)
+        return _tasks[task_name]
+    return decorator
+
+
+def get_task(name):
+    """
+    Returns a registered task, importing the tasks modules of the apps
+    the first time a name is missing
+    :param name: name of the task
+    :return: Task or None
+    """
+    if name not in _tasks:
+        autodiscover_modules('tasks')
+    return _tasks.get(name)
+
+
+def get_state(task_id):
+    """
+    Returns the state and result of a queued task
+    :param task_id: id returned by delay()
+    :return: TaskState, the result decoded, or None
+    """
+    state = get_broker().get(task_id)
+    if state is not None and state.result:
+        state = state._replace(result=json.loads(state.result))
+    return state
+
+
+class Worker:
+    """
+    Runs queued tasks in threads. Failed tasks are retried with an
+    exponential backoff up to their max_retries and results are stored
+    in the broker.
+    """
+
+    def __init__(self, broker=None, concurrency=None, poll_interval=None):
+        options = get_options()
+        self.broker = broker or get_broker()
+        self.concurrency = concurrency or options['CONCURRENCY']
+        self.poll_interval = poll_interval or options['POLL_INTERVAL']
+        self.retry_delay = options['RETRY_DELAY']
+        self.visibility_timeout = options['VISIBILITY_TIMEOUT']
+        self.result_ttl = options['RESULT_TTL']
+        self.housekeeping_interval = options['HOUSEKEEPING_INTERVAL']
+        self.next_housekeeping = 0
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def execute(self, message):
+        """
+        Runs a claimed task and stores its result or error
+        :param message: TaskMessage
+        :return: None
+        """
+        task = get_task(message.name)
+        if task is None:
+            self.broker.fail(message.id, 'Unknown task %s' % message.name)
+            return
+        try:
+            result = json.dumps(task(*message.args, **message.kwargs))
+        except Exception:
+            error = traceback.format_exc()
+            if message.attempts > message.max_retries:
+                logger.exception('Task %s %s failed', message.name,
+                                 message.id)
+                self.broker.fail(message.id, error)
+                return
+            delay = task.retry_delay
+            if delay is None:
+                delay = self.retry_delay
+            delay *= 2 ** (message.attempts - 1)
+            logger.warning('Task %s %s failed, retrying in %d s',
+                           message.name, message.id, delay)
+            self.broker.retry(message.id, error,
+                              timezone.now() + timedelta(seconds=delay))
+        else:
+            self.broker.succeed(message.id, result)
+
+    def run_once(self):
+        """
+        Claims and runs the task due first
+        :return: whether a task ran
+        """
+        message = self.broker.reserve()
+        if message is None:
+            return False
+        self.execute(message)
+        return True
+
+    def run_pending(self):
+        """
+        Runs tasks in the calling thread until none is due
+        :return: number of tasks run
+        """
+        count = 0
+        while self.run_once():
+            count += 1
+        return count
+
+    def housekeeping(self):
+        """
+        Requeues tasks of lost workers and deletes expired results, at
+        most once per housekeeping interval across the threads
+        :return: None
+        """
+        with self.lock:
+            if time.monotonic() < self.next_housekeeping:
+                return
+            self.next_housekeeping = \
+                time.monotonic() + self.housekeeping_interval
+        now = timezone.now()
+        self.broker.requeue_stale(
+            now - timedelta(seconds=self.visibility_timeout)
+        )
+        self.broker.purge(now - timedelta(seconds=self.result_ttl))
+
+    def loop(self):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                try:
+                    ran = self.run_once()
+                    if not ran:
+                        self.housekeeping()
+                except Exception:
+                    logger.exception('Task worker error')
+                    ran = False
+                if not ran:
+                    self.stopping.wait(self.poll_interval)
+        finally:
+            connections.close_all()
+
+    def start(self):
+        """
+        Starts the worker threads
+        :return: None
+        """
+        for i in range(self.concurrency):
+            thread = threading.Thread(
+                target=self.loop, name='task-worker-%d' % i, daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, wait=False):
+        """
+        Stops the worker threads after their current task
+        :param wait: wait for the threads to finish
+        :return: None
+        """
+        self.stopping.set()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+    def run(self):
+        """
+        Runs the worker threads until stopped
+        :return: None
+        """
+        self.start()
+        try:
+            while not self.stopping.wait(self.poll_interval):
+                pass
+        finally:
+            self.stop(wait=True)
+
+
+def start_local_worker():
+    """
+    Starts the worker threads of the web process when TASK_QUEUE
+    LOCAL_WORKERS is set
+    :return: None
+    """
+    global _local_worker
+    workers = get_options()['LOCAL_WORKERS']
+    if not workers:
+        return
+    with _lock:
+        if _local_worker is None:
+            _local_worker = Worker(concurrency=workers)
+            _local_worker.start()
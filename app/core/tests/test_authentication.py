@@ -0,0 +1,121 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ..authentication import DEFAULTS, TokenCache, get_token_cache
+
+TAGS_URL = reverse('recipe:tag-list')
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        get_token_cache().local.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@gmail.com',
+            password='test123',
+            name='Test Name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_warm_cache_skips_auth_query(self):
+        """
+        Test a request with a cached token runs no authentication query
+        :return: None
+        """
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token_rejected(self):
+        """
+        Test an unknown token is not authenticated
+        :return: None
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        """
+        Test deleting a token invalidates the cached entry
+        :return: None
+        """
+        self.client.get(TAGS_URL)
+        self.token.delete()
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """
+        Test deactivating a user invalidates the cached entry
+        :return: None
+        """
+        self.client.get(TAGS_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_update_invalidated(self):
+        """
+        Test updating the user through the API is seen on the next request
+        :return: None
+        """
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'New Name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+    def test_shared_cache_tier(self):
+        """
+        Test an entry cached by another process is read from the shared
+        tier without an authentication query
+        :return: None
+        """
+        self.client.get(ME_URL)
+        get_token_cache().local.clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        key = self.token.key
+        self.token.delete()
+        self.assertIsNone(cache.get('authtoken:' + key))
+
+    def test_revoked_token_seen_by_other_process(self):
+        """
+        Test a token revoked through one process's cache is not accepted
+        from the cache of another process sharing the same backend
+        :return: None
+        """
+        options = dict(DEFAULTS, SHARED_CACHE='default')
+        first, second = TokenCache(options), TokenCache(options)
+        entry = (self.user, self.token)
+        first.set(self.token.key, entry)
+        self.assertIsNotNone(second.get(self.token.key))
+
+        first.delete(self.token.key)
+
+        self.assertIsNone(second.get(self.token.key))
@@ -0,0 +1,82 @@
+from django.test import SimpleTestCase, override_settings
+
+from ..checks import check_list_cache, check_replica_pin_cache
+
+LOCAL = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}}
+SHARED = {'default': {
+    'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+    'LOCATION': 'memcached:11211',
+}}
+MEMORY_BROKER = {'BROKER': 'core.taskqueue.MemoryBroker'}
+DATABASE_BROKER = {'BROKER': 'core.taskqueue.DatabaseBroker'}
+
+
+class ChecksTests(SimpleTestCase):
+    @override_settings(CACHES=LOCAL, WEB_WORKERS=3, TASK_QUEUE=MEMORY_BROKER)
+    def test_local_list_cache_with_several_workers(self):
+        """
+        Test a process local list cache fails with several web workers
+        :return: None
+        """
+        errors = check_list_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(CACHES=LOCAL, WEB_WORKERS=1,
+                       TASK_QUEUE=DATABASE_BROKER)
+    def test_local_list_cache_with_task_workers(self):
+        """
+        Test a process local list cache fails when tasks run in worker
+        processes
+        :return: None
+        """
+        errors = check_list_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(CACHES=LOCAL, WEB_WORKERS=1, TASK_QUEUE=MEMORY_BROKER)
+    def test_local_list_cache_single_process(self):
+        """
+        Test a process local list cache passes in a single process
+        :return: None
+        """
+        self.assertEqual(check_list_cache(None), [])
+
+    @override_settings(CACHES=SHARED, WEB_WORKERS=3,
+                       TASK_QUEUE=DATABASE_BROKER)
+    def test_shared_list_cache(self):
+        """
+        Test a shared list cache passes with several processes
+        :return: None
+        """
+        self.assertEqual(check_list_cache(None), [])
+
+    @override_settings(CACHES=LOCAL, WEB_WORKERS=3,
+                       DATABASE_REPLICAS=['replica1'])
+    def test_local_pin_cache_with_replicas(self):
+        """
+        Test process local replica pins fail with several web workers
+        :return: None
+        """
+        errors = check_replica_pin_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E002'])
+
+    @override_settings(CACHES=LOCAL, WEB_WORKERS=3, DATABASE_REPLICAS=[])
+    def test_local_pin_cache_without_replicas(self):
+        """
+        Test process local replica pins pass without replicas
+        :return: None
+        """
+        self.assertEqual(check_replica_pin_cache(None), [])
+
+    @override_settings(CACHES=SHARED, WEB_WORKERS=3,
+                       DATABASE_REPLICAS=['replica1'])
+    def test_shared_pin_cache_with_replicas(self):
+        """
+        Test shared replica pins pass with several web workers
+        :return: None
+        """
+        self.assertEqual(check_replica_pin_cache(None), [])
@@ -1,8 +1,12 @@
 from unittest.mock import patch
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+ENSURE_CONNECTION = \
+    'django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection'
+
 
 class CommandsTests(TestCase):
     def test_wait_for_db_ready(self):
@@ -10,10 +14,9 @@ class CommandsTests(TestCase):
         Test waiting for db when db is available
         :return: None
         """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
+        with patch(ENSURE_CONNECTION) as ec:
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+            self.assertEqual(ec.call_count, 1)
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db(self, ts):
@@ -21,7 +24,35 @@ class CommandsTests(TestCase):
         Test waiting for db
         :return: None
         """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]
             call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            self.assertEqual(ec.call_count, 6)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_backoff(self, ts):
+        """
+        Test the wait between probes doubles up to the maximum delay
+        :return: None
+        """
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', initial_delay=1, max_delay=5)
+
+        delays = [c[0][0] for c in ts.call_args_list]
+        self.assertEqual(delays, [1, 2, 4, 5, 5])
+
+    @patch('time.sleep', return_value=True)
+    @patch('time.monotonic')
+    def test_wait_for_db_timeout(self, tm, ts):
+        """
+        Test the command fails once the timeout is reached
+        :return: None
+        """
+        tm.side_effect = [0, 0, 1, 3, 7]
+        with patch(ENSURE_CONNECTION) as ec:
+            ec.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=10, initial_delay=1)
+
+        self.assertEqual(ts.call_count, 3)
@@ -0,0 +1,220 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+
+from ..counters import rebuild_recipe_counts
+from ..models import Tag, Ingredient, Recipe
+from recipe.cache import get_version
+
+
+def sample_recipe(user, title='Sample recipe'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5
+    )
+
+
+def counts(model):
+    """
+    Returns the stored and the actual recipe counts of every object
+    :param model: Tag or Ingredient
+    :return: tuple of two dictionaries
+    """
+    stored = dict(model.objects.values_list('id', 'recipe_count'))
+    actual = {obj.id: obj.recipe_set.count() for obj in model.objects.all()}
+    return stored, actual
+
+
+class RecipeCountTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        self.tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        self.tag2 = Tag.objects.create(user=self.user, name='Dessert')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Kale'
+        )
+
+    def assertCountsConsistent(self):
+        for model in (Tag, Ingredient):
+            stored, actual = counts(model)
+            self.assertEqual(stored, actual)
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.tag_count, recipe.tags.count())
+            self.assertEqual(recipe.ingredient_count,
+                             recipe.ingredients.count())
+
+    def test_add_and_remove(self):
+        """
+        Test adding and removing tags keeps the counts correct
+        :return: None
+        """
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.tag1, self.tag2)
+        recipe.tags.add(self.tag1)
+        recipe.ingredients.add(self.ingredient)
+        self.assertCountsConsistent()
+
+        self.tag1.refresh_from_db()
+        self.assertEqual(self.tag1.recipe_count, 1)
+
+        recipe.tags.remove(self.tag1)
+        recipe.tags.remove(self.tag1)
+        self.assertCountsConsistent()
+
+    def test_set_and_clear(self):
+        """
+        Test replacing and clearing tags keeps the counts correct
+        :return: None
+        """
+        recipe = sample_recipe(self.user)
+        recipe.tags.set([self.tag1])
+        recipe.tags.set([self.tag2])
+        self.assertCountsConsistent()
+
+        recipe.tags.clear()
+        self.assertCountsConsistent()
+
+    def test_reverse_add_and_clear(self):
+        """
+        Test changing links from the tag side keeps the counts correct
+        :return: None
+        """
+        recipes = [sample_recipe(self.user, str(i)) for i in range(3)]
+        self.tag1.recipe_set.add(*recipes)
+        self.assertCountsConsistent()
+
+        self.tag1.recipe_set.remove(recipes[0])
+        self.assertCountsConsistent()
+
+        self.tag1.recipe_set.clear()
+        self.assertCountsConsistent()
+
+    def test_delete_recipe(self):
+        """
+        Test deleting a recipe releases its tags and ingredients
+        :return: None
+        """
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.tag1)
+        recipe.ingredients.add(self.ingredient)
+        sample_recipe(self.user, 'Other').tags.add(self.tag1)
+
+        recipe.delete()
+
+        self.assertCountsConsistent()
+        self.tag1.refresh_from_db()
+        self.assertEqual(self.tag1.recipe_count, 1)
+
+    def test_delete_tag(self):
+        """
+        Test deleting a tag releases the recipes linked to it
+        :return: None
+        """
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.tag1, self.tag2)
+        sample_recipe(self.user, 'Other').tags.add(self.tag1)
+
+        self.tag1.delete()
+
+        self.assertCountsConsistent()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_count, 1)
+
+    def test_rebuild_recipe_counts(self):
+        """
+        Test the rebuild command fixes drifted counts
+        :return: None
+        """
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.tag1)
+        Tag.objects.update(recipe_count=7)
+        Recipe.objects.update(tag_count=7)
+
+        call_command('rebuild_recipe_counts', stdout=StringIO())
+
+        self.assertCountsConsistent()
+
+    def test_rebuild_recipe_counts_subset(self):
+        """
+        Test rebuilding the counts of some objects only
+        :return: None
+        """
+        Tag.objects.update(recipe_count=7)
+
+        rebuild_recipe_counts(Tag, ids=[self.tag1.id])
+
+        self.tag1.refresh_from_db()
+        self.tag2.refresh_from_db()
+        self.assertEqual(self.tag1.recipe_count, 0)
+        self.assertEqual(self.tag2.recipe_count, 7)
+
+    def test_rebuild_recipe_counts_marks_changes(self):
+        """
+        Test rebuilt rows are marked as updated and the cached lists of
+        their users invalidated, unchanged rows are left alone
+        :return: None
+        """
+        past = timezone.now() - timedelta(hours=1)
+        Tag.objects.update(updated_at=past)
+        Tag.objects.filter(id=self.tag1.id).update(recipe_count=7)
+        version = get_version(Tag, self.user.id)
+
+        updated = rebuild_recipe_counts(Tag)
+
+        self.tag1.refresh_from_db()
+        self.tag2.refresh_from_db()
+        self.assertEqual(updated, 1)
+        self.assertGreater(self.tag1.updated_at, past)
+        self.assertEqual(self.tag2.updated_at, past)
+        self.assertNotEqual(get_version(Tag, self.user.id), version)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentRecipeCountTests(TransactionTestCase):
+    def test_concurrent_recipe_edits(self):
+        """
+        Test concurrent edits of recipes sharing tags keep the counts
+        consistent
+        :return: None
+        """
+        user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        tags = [Tag.objects.create(user=user, name=str(i)) for i in range(3)]
+        recipes = [sample_recipe(user, str(i)) for i in range(8)]
+        errors = []
+
+        def edit(recipe):
+            try:
+                for i in range(10):
+                    with transaction.atomic():
+                        recipe.tags.add(*tags)
+                    with transaction.atomic():
+                        recipe.tags.remove(tags[i % len(tags)])
+                    if i % 3 == 0:
+                        with transaction.atomic():
+                            recipe.tags.clear()
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=edit, args=(recipe,))
+            for recipe in recipes
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        stored, actual = counts(Tag)
+        self.assertEqual(stored, actual)
@@ -0,0 +1,254 @@
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..metrics import Histogram, MetricsRegistry, SnapshotFiles, \
+    bucket_index, bucket_upper_bound, get_registry, power_of_two_bounds, \
+    render_series
+from ..models import Tag
+
+TAGS_URL = reverse('recipe:tag-list')
+METRICS_URL = reverse('metrics')
+
+
+class HistogramTests(TestCase):
+    def test_buckets_cover_every_value(self):
+        """
+        Test every value falls in a bucket whose bounds contain it
+        :return: None
+        """
+        for value in range(10000):
+            index = bucket_index(value)
+            self.assertLessEqual(value, bucket_upper_bound(index))
+            if index:
+                self.assertGreater(value, bucket_upper_bound(index - 1))
+
+    def test_relative_error(self):
+        """
+        Test the upper bound of a bucket stays within 1/8 of its values
+        :return: None
+        """
+        for value in (100, 1234, 99999, 10 ** 7):
+            upper = bucket_upper_bound(bucket_index(value))
+            self.assertLessEqual((upper - value) / value, 1 / 8)
+
+    def test_percentile(self):
+        """
+        Test percentiles of recorded values
+        :return: None
+        """
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.record(value)
+
+        self.assertEqual(histogram.percentile(0.01), 1)
+        self.assertIn(histogram.percentile(0.5), range(50, 57))
+        self.assertEqual(histogram.percentile(1), 100)
+
+    def test_cumulative_counts(self):
+        """
+        Test cumulative counts at power of two boundaries
+        :return: None
+        """
+        histogram = Histogram()
+        for value in (0, 3, 17, 100):
+            histogram.record(value)
+
+        self.assertEqual(histogram.cumulative_counts(
+            power_of_two_bounds(0, 8)
+        ), [
+            (0, 1), (1, 1), (3, 2), (7, 2), (15, 2), (31, 3), (63, 3),
+            (127, 4), (255, 4),
+        ])
+
+    def test_every_series_has_the_same_buckets(self):
+        """
+        Test series export the fixed buckets of their metric whatever
+        values they recorded
+        :return: None
+        """
+        registry = MetricsRegistry()
+        registry.record(('a', 'GET'), (10, 0, 0, 0))
+        registry.record(('b', 'GET'), (10 ** 7, 500, 10 ** 6, 10 ** 5))
+
+        lines = registry.render().splitlines()
+
+        for name, _, _, bounds in registry.metrics:
+            buckets = {}
+            for line in lines:
+                if line.startswith(name + '_bucket'):
+                    view = line.split('view="')[1].split('"')[0]
+                    le = line.split('le="')[1].split('"')[0]
+                    buckets.setdefault(view, []).append(le)
+            self.assertEqual(buckets['a'], buckets['b'])
+            self.assertEqual(len(buckets['a']), len(bounds) + 1)
+            self.assertEqual(buckets['a'][-1], '+Inf')
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        get_registry().clear()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_records_view_metrics(self):
+        """
+        Test requests are recorded under their resolved view name
+        :return: None
+        """
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+
+        registry = get_registry()
+        labels = ('recipe:tag-list', 'GET')
+        total = registry.get(labels, 'http_request_duration_seconds')
+        queries = registry.get(labels, 'http_request_db_queries')
+        render = registry.get(
+            labels, 'http_request_serialize_duration_seconds'
+        )
+        self.assertEqual(total.count, 2)
+        self.assertEqual(queries.count, 2)
+        self.assertGreaterEqual(queries.max, 1)
+        self.assertGreater(render.total, 0)
+        self.assertLessEqual(render.total, total.total)
+
+    def test_unmatched_requests(self):
+        """
+        Test requests that resolve to no view share a single series
+        :return: None
+        """
+        self.client.get('/does-not-exist/')
+
+        histogram = get_registry().get(
+            ('<unmatched>', 'GET'), 'http_request_duration_seconds'
+        )
+        self.assertEqual(histogram.count, 1)
+
+    @override_settings(METRICS={'TOKEN': 'secret'})
+    def test_metrics_endpoint(self):
+        """
+        Test the metrics endpoint exposes histograms in Prometheus format
+        :return: None
+        """
+        self.client.get(reverse('user:me'))
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+
+        body = res.content.decode('utf-8')
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn('# TYPE http_request_db_queries histogram', body)
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{view="user:me",method="GET"} 1', body
+        )
+        self.assertIn(
+            'http_request_db_queries_bucket'
+            '{view="user:me",method="GET",le="+Inf"} 1', body
+        )
+
+    @override_settings(METRICS={'TOKEN': 'secret'})
+    def test_metrics_endpoint_requires_token(self):
+        """
+        Test users and wrong tokens can't read the metrics
+        :return: None
+        """
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(res.status_code, 403)
+
+    def test_metrics_endpoint_staff(self):
+        """
+        Test staff users logged in to the admin can read the metrics
+        :return: None
+        """
+        get_user_model().objects.create_superuser('admin@gmail.com', 'pw123')
+        client = APIClient()
+        client.login(email='admin@gmail.com', password='pw123')
+
+        res = client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_metrics_endpoint_adds_up_processes(self):
+        """
+        Test the endpoint adds up the snapshots of every process
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            other = MetricsRegistry()
+            other.record(('user:me', 'GET'), (1000, 1, 100, 10))
+            other.record(('user:me', 'GET'), (2000, 1, 100, 10))
+            SnapshotFiles(directory, 1).flush(other)
+
+            with mock.patch.object(SnapshotFiles, 'start'), \
+                    self.settings(METRICS={'TOKEN': 'secret',
+                                           'DIR': directory}):
+                self.client.get(reverse('user:me'))
+                res = self.client.get(
+                    METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+                )
+
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{view="user:me",method="GET"} 3', res.content.decode('utf-8')
+        )
+
+
+class SnapshotFilesTests(TestCase):
+    def test_collect_merges_processes(self):
+        """
+        Test the histograms of each process are added up
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            first, second = MetricsRegistry(), MetricsRegistry()
+            first.record(('a', 'GET'), (10, 1, 5, 1))
+            second.record(('a', 'GET'), (30, 2, 5, 1))
+            second.record(('b', 'POST'), (20, 0, 0, 1))
+            SnapshotFiles(directory, 1).flush(first)
+            SnapshotFiles(directory, 1).flush(second)
+
+            series = SnapshotFiles(directory, 1).collect()
+
+        total = series[('a', 'GET')][0]
+        self.assertEqual(total.count, 2)
+        self.assertEqual(total.total, 40)
+        self.assertEqual(total.max, 30)
+        self.assertEqual(series[('b', 'POST')][0].count, 1)
+        self.assertIn('view="b",method="POST"',
+                      render_series(first.metrics, series))
+
+    def test_snapshot_thread(self):
+        """
+        Test a thread of the process writes its snapshot every interval
+        :return: None
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            registry = MetricsRegistry()
+            files = SnapshotFiles(directory, 0.01)
+            registry.record(('a', 'GET'), (10, 1, 5, 1))
+            files.start(registry)
+            try:
+                for _ in range(500):
+                    series = files.collect()
+                    if series:
+                        break
+                    time.sleep(0.01)
+            finally:
+                files.stop()
+
+        self.assertEqual(series[('a', 'GET')][0].count, 1)
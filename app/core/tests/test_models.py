@@ -1,5 +1,9 @@
-from django.test import TestCase
+import threading
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth import get_user_model
+from ..hashers import HashPoolBusy, run_hasher
 from ..models import Tag, Ingredient, Recipe
 
 
@@ -95,3 +99,69 @@ class ModelTests(TestCase):
         )
 
         self.assertEqual(str(recipe), recipe.title)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_password_hash_iterations_setting(self):
+        """
+        Test new passwords are hashed with the configured iteration count
+        :return: None
+        """
+        user = sample_user()
+
+        algorithm, iterations, salt, hash = user.password.split('$')
+        self.assertEqual(algorithm, 'pbkdf2_sha256')
+        self.assertEqual(int(iterations), 1000)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_password_hash_upgraded_on_check(self):
+        """
+        Test a password hashed with other settings is rehashed once it is
+        verified
+        :return: None
+        """
+        user = sample_user()
+        with override_settings(PASSWORD_HASH_ITERATIONS=500):
+            user.password = make_password('test123')
+        user.save()
+
+        self.assertTrue(user.check_password('test123'))
+
+        user.refresh_from_db()
+        self.assertEqual(user.password.split('$')[1], '1000')
+        self.assertTrue(user.check_password('test123'))
+
+    @override_settings(PASSWORD_HASH_WORKERS=0, PASSWORD_HASH_ITERATIONS=1000)
+    def test_password_hashed_without_pool(self):
+        """
+        Test passwords are hashed in the calling thread when the hash pool
+        is disabled
+        :return: None
+        """
+        user = sample_user()
+
+        self.assertTrue(user.check_password('test123'))
+        self.assertFalse(user.check_password('wrong'))
+
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0)
+    def test_password_hash_pool_saturated(self):
+        """
+        Test a hash is refused once every slot of the hash pool is taken
+        :return: None
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=run_hasher, args=(block,))
+        thread.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(HashPoolBusy):
+                run_hasher(make_password, 'test123')
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertTrue(run_hasher(make_password, 'test123'))
@@ -0,0 +1,124 @@
+import datetime
+import io
+import unittest
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnList
+
+from ..models import Tag, Recipe
+from ..renderers import orjson
+from recipe.serializers import TagSerializer, RecipeDetailSerializer
+from user.serializers import UserSerializer
+
+if orjson is not None:
+    from ..parsers import ORJSONParser
+    from ..renderers import ORJSONRenderer
+
+
+@unittest.skipIf(orjson is None, 'orjson is not installed')
+class ORJSONRendererTests(TestCase):
+    def assertSameRender(self, data, accepted_media_type=None):
+        expected = JSONRenderer().render(data, accepted_media_type)
+        rendered = ORJSONRenderer().render(data, accepted_media_type)
+        self.assertEqual(rendered, expected)
+
+    def test_render_same_bytes(self):
+        """
+        Test the output matches DRF's renderer byte for byte
+        :return: None
+        """
+        data = ReturnList([
+            OrderedDict([('id', 1), ('name', 'Crème brûlée "ü" \\ 🍰')]),
+            OrderedDict([('id', 2), ('name', 'line\u2028para\u2029\x00\x1f')]),
+            {'price': Decimal('5.50'), 'ok': True, 'none': None},
+            {'when': datetime.datetime(2020, 1, 2, 3, 4, 5, 678901,
+                                       tzinfo=datetime.timezone.utc)},
+            {'date': datetime.date(2020, 1, 2), 'uuid': uuid.UUID(int=1)},
+            {'lazy': gettext_lazy('Invalid cursor'), 'tuple': (1, 2.5)},
+            {1: 'non string key', 'big': 2 ** 70},
+        ], serializer=None)
+
+        for item in data:
+            self.assertSameRender(item)
+        self.assertSameRender(data)
+        self.assertSameRender(data, 'application/json; indent=4')
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_render_non_finite_floats(self):
+        """
+        Test NaN and infinities render as null, where DRF's renderer
+        raises
+        :return: None
+        """
+        for value in (float('nan'), float('inf'), float('-inf')):
+            data = {'score': value}
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+            self.assertEqual(ORJSONRenderer().render(data),
+                             b'{"score":null}')
+
+    def test_render_api_data(self):
+        """
+        Test the data of the tag, recipe and user endpoints renders the
+        same
+        :return: None
+        """
+        user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123', name='Zoë'
+        )
+        tag = Tag.objects.create(user=user, name='Végan')
+        recipe = Recipe.objects.create(
+            user=user, title='Tarte', time_minutes=5, price=Decimal('12.30')
+        )
+        recipe.tags.add(tag)
+
+        self.assertSameRender(TagSerializer([tag], many=True).data)
+        self.assertSameRender(RecipeDetailSerializer(recipe).data)
+        self.assertSameRender(UserSerializer(user).data)
+
+
+@unittest.skipIf(orjson is None, 'orjson is not installed')
+class ORJSONParserTests(TestCase):
+    def parse(self, body, encoding='utf-8'):
+        return ORJSONParser().parse(
+            io.BytesIO(body), 'application/json', {'encoding': encoding}
+        )
+
+    def test_parse_same_data(self):
+        """
+        Test parsing gives the data of DRF's parser
+        :return: None
+        """
+        for body in ('{"title":"Crème","price":"5.00","tags":[1,2]}',
+                     '[1.5, 1e400, 12345678901234567890123]', '"\\u2028"'):
+            body = body.encode('utf-8')
+            expected = JSONParser().parse(
+                io.BytesIO(body), 'application/json', {}
+            )
+            self.assertEqual(self.parse(body), expected)
+
+    def test_parse_other_encoding(self):
+        """
+        Test bodies in other charsets are decoded
+        :return: None
+        """
+        body = '{"name":"Crème"}'.encode('latin-1')
+
+        self.assertEqual(self.parse(body, 'latin-1'), {'name': 'Crème'})
+
+    def test_parse_invalid(self):
+        """
+        Test invalid documents raise a parse error
+        :return: None
+        """
+        for body in (b'', b'{"a":', b'[NaN]'):
+            with self.assertRaises(ParseError):
+                self.parse(body)
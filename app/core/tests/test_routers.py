@@ -0,0 +1,167 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Tag, Recipe
+from core.routers import ReplicaRouter, use_replicas, use_primary
+from recipe.similar import similar_recipes
+
+TAGS_URL = reverse('recipe:tag-list')
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA],
+                   DATABASE_ROUTERS=['core.routers.ReplicaRouter'])
+class ReplicaRoutingTests(TestCase):
+    """
+    Routing with a second SQLite database standing in for a replica,
+    whose rows differ from the primary's as if replication lagged
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+        with override_settings(DATABASE_REPLICAS=[]):
+            call_command('migrate', database=REPLICA, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        replica_user = get_user_model().objects.using(REPLICA).create(
+            id=self.user.id, email=self.user.email
+        )
+        self.addCleanup(
+            get_user_model().objects.using(REPLICA).all().delete
+        )
+        Tag.objects.create(user=self.user, name='Primary')
+        Tag.objects.using(REPLICA).create(user=replica_user, name='Replica')
+
+        self.client = self.token_client(self.user)
+
+    def token_client(self, user):
+        """
+        Returns a client authenticated with a token of a user
+        :param user: user object
+        :return: APIClient
+        """
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        return client
+
+    def tag_names(self, **extra):
+        res = self.client.get(TAGS_URL, **extra)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [tag['name'] for tag in res.data]
+
+    def test_safe_requests_read_from_replica(self):
+        """
+        Test GET requests read from the replica
+        :return: None
+        """
+        self.assertEqual(self.tag_names(), ['Replica'])
+
+    def test_reads_stick_to_primary_after_write(self):
+        """
+        Test a client reads its writes from the primary after a write
+        :return: None
+        """
+        res = self.client.post(TAGS_URL, {'name': 'Created'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.tag_names(), ['Primary', 'Created'])
+        self.assertFalse(
+            Tag.objects.using(REPLICA).filter(name='Created').exists()
+        )
+
+        cache.clear()
+        self.assertEqual(self.tag_names(), ['Replica'])
+
+    def test_pin_is_per_user(self):
+        """
+        Test a write only pins the user that sent it, from any address
+        :return: None
+        """
+        other_user = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        replica_other = get_user_model().objects.using(REPLICA).create(
+            id=other_user.id, email=other_user.email
+        )
+        Tag.objects.using(REPLICA).create(user=replica_other, name='Other')
+        other = self.token_client(other_user)
+
+        self.client.post(TAGS_URL, {'name': 'Created'})
+
+        res = other.get(TAGS_URL)
+        self.assertEqual([tag['name'] for tag in res.data], ['Other'])
+        self.assertEqual(self.tag_names(REMOTE_ADDR='10.0.0.9'),
+                         ['Primary', 'Created'])
+
+    def test_new_token_authenticates_on_replica(self):
+        """
+        Test a token missing from the replica is found on the primary
+        :return: None
+        """
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in res.data], ['Replica'])
+
+    def test_similar_recipes_read_from_replica(self):
+        """
+        Test the similar recipes query runs on the replica
+        :return: None
+        """
+        recipe = Recipe.objects.using(REPLICA).create(
+            user_id=self.user.id, title='Curry', time_minutes=5, price=5
+        )
+        Recipe.tags.through.objects.using(REPLICA).create(
+            recipe_id=recipe.id,
+            tag=Tag.objects.using(REPLICA).get(name='Replica')
+        )
+
+        with use_replicas(), \
+                CaptureQueriesContext(connections[REPLICA]) as queries:
+            similar_recipes(recipe)
+
+        self.assertTrue(any('candidates' in query['sql']
+                            for query in queries))
+
+    def test_router(self):
+        """
+        Test the router only sends reads in use_replicas() to replicas
+        :return: None
+        """
+        router = ReplicaRouter()
+        tag = Tag.objects.using(REPLICA).get()
+
+        self.assertIsNone(router.db_for_read(Tag))
+        with use_replicas():
+            self.assertEqual(router.db_for_read(Tag), REPLICA)
+            self.assertIsNone(router.db_for_write(Tag))
+            with use_primary():
+                self.assertIsNone(router.db_for_read(Tag))
+        self.assertEqual(router.db_for_write(Tag, instance=tag), 'default')
+        self.assertTrue(router.allow_migrate('default', 'core'))
+        self.assertFalse(router.allow_migrate(REPLICA, 'core'))
@@ -0,0 +1,218 @@
+import io
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.utils import timezone
+
+from core import taskqueue
+from core.taskqueue import Worker, task, get_broker, get_state
+
+MEMORY_BROKER = 'core.taskqueue.MemoryBroker'
+DATABASE_BROKER = 'core.taskqueue.DatabaseBroker'
+
+calls = []
+
+
+@task(name='tests.add')
+def add(a, b):
+    return a + b
+
+
+@task(name='tests.flaky', max_retries=2, retry_delay=0)
+def flaky(failures):
+    calls.append(failures)
+    if len(calls) <= failures:
+        raise RuntimeError('Attempt %d failed' % len(calls))
+    return len(calls)
+
+
+@task(name='tests.record_thread', max_retries=0)
+def record_thread(seconds):
+    time.sleep(seconds)
+    return threading.current_thread().name
+
+
+def wait_for(task_ids, timeout=5):
+    """
+    Waits for tasks run by worker threads
+    :param task_ids: ids of the tasks
+    :param timeout: seconds to wait at most
+    :return: list of TaskState
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        states = [get_state(task_id) for task_id in task_ids]
+        if all(state.status == taskqueue.SUCCEEDED for state in states) or \
+                time.monotonic() > deadline:
+            return states
+        time.sleep(0.01)
+
+
+class BrokerTestsMixin:
+    broker = None
+
+    def setUp(self) -> None:
+        calls.clear()
+        settings = override_settings(TASK_QUEUE={'BROKER': self.broker})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_run_task(self):
+        """
+        Test a queued task runs in the worker and stores its result
+        :return: None
+        """
+        task_id = add.delay(2, b=3)
+
+        self.assertEqual(get_state(task_id).status, taskqueue.QUEUED)
+        self.assertEqual(Worker().run_pending(), 1)
+
+        state = get_state(task_id)
+        self.assertEqual(state.status, taskqueue.SUCCEEDED)
+        self.assertEqual(state.result, 5)
+        self.assertEqual(state.attempts, 1)
+
+    def test_retry_task(self):
+        """
+        Test a failed task is retried until it succeeds
+        :return: None
+        """
+        task_id = flaky.delay(2)
+
+        with self.assertLogs('core.taskqueue', 'WARNING') as logs:
+            Worker().run_pending()
+
+        self.assertEqual(len(logs.output), 2)
+        state = get_state(task_id)
+        self.assertEqual(state.status, taskqueue.SUCCEEDED)
+        self.assertEqual(state.result, 3)
+        self.assertEqual(state.attempts, 3)
+
+    def test_retries_exhausted(self):
+        """
+        Test a task failing more than its retries is marked failed
+        :return: None
+        """
+        task_id = flaky.delay(3)
+
+        with self.assertLogs('core.taskqueue', 'WARNING') as logs:
+            Worker().run_pending()
+
+        self.assertIn('tests.flaky %d failed\n' % task_id, logs.output[-1])
+        state = get_state(task_id)
+        self.assertEqual(state.status, taskqueue.FAILED)
+        self.assertIn('Attempt 3 failed', state.error)
+        self.assertEqual(len(calls), 3)
+
+    def test_retry_backoff(self):
+        """
+        Test retries wait for the retry delay
+        :return: None
+        """
+        with override_settings(TASK_QUEUE={'BROKER': self.broker,
+                                           'RETRY_DELAY': 60}):
+            task_id = add.delay(1, None)
+
+            with self.assertLogs('core.taskqueue', 'WARNING'):
+                self.assertEqual(Worker().run_pending(), 1)
+
+            state = get_state(task_id)
+        self.assertEqual(state.status, taskqueue.QUEUED)
+        self.assertIn('TypeError', state.error)
+
+    def test_countdown(self):
+        """
+        Test a task isn't run before its countdown
+        :return: None
+        """
+        task_id = add.apply_async((1, 2), countdown=60)
+
+        self.assertEqual(Worker().run_pending(), 0)
+        self.assertEqual(get_state(task_id).status, taskqueue.QUEUED)
+
+    def test_unknown_task(self):
+        """
+        Test a task missing from the registry fails
+        :return: None
+        """
+        broker = get_broker()
+        task_id = broker.enqueue('tests.missing', [], {}, 3,
+                                 timezone.now())
+
+        Worker().run_pending()
+
+        self.assertEqual(get_state(task_id).status, taskqueue.FAILED)
+
+    def test_requeue_stale_and_purge(self):
+        """
+        Test tasks of lost workers run again and old results are deleted
+        :return: None
+        """
+        broker = get_broker()
+        task_id = add.delay(1, 1)
+        self.assertEqual(broker.reserve().id, task_id)
+
+        broker.requeue_stale(timezone.now() + timedelta(seconds=1))
+        Worker().run_pending()
+        self.assertEqual(get_state(task_id).result, 2)
+
+        broker.purge(timezone.now() + timedelta(seconds=1))
+        self.assertIsNone(get_state(task_id))
+
+    def test_run_worker_burst(self):
+        """
+        Test the run_worker command runs the due tasks
+        :return: None
+        """
+        task_id = add.delay(1, 2)
+        out = io.StringIO()
+
+        call_command('run_worker', burst=True, stdout=out)
+
+        self.assertIn('Ran 1 tasks', out.getvalue())
+        self.assertEqual(get_state(task_id).result, 3)
+
+
+class DatabaseBrokerTests(BrokerTestsMixin, TestCase):
+    broker = DATABASE_BROKER
+
+
+class MemoryBrokerTests(BrokerTestsMixin, TestCase):
+    broker = MEMORY_BROKER
+
+
+class WorkerThreadsTests(SimpleTestCase):
+    def test_concurrency(self):
+        """
+        Test worker threads run tasks concurrently
+        :return: None
+        """
+        with override_settings(TASK_QUEUE={'BROKER': MEMORY_BROKER}):
+            task_ids = [record_thread.delay(0.05) for _ in range(8)]
+            worker = Worker(concurrency=4, poll_interval=0.01)
+            worker.start()
+            try:
+                states = wait_for(task_ids)
+            finally:
+                worker.stop(wait=True)
+
+        self.assertTrue(all(
+            state.status == taskqueue.SUCCEEDED for state in states
+        ))
+        self.assertGreater(len({state.result for state in states}), 1)
+
+    def test_local_workers(self):
+        """
+        Test the web process runs tasks with LOCAL_WORKERS threads
+        :return: None
+        """
+        with override_settings(TASK_QUEUE={'BROKER': MEMORY_BROKER,
+                                           'LOCAL_WORKERS': 2,
+                                           'POLL_INTERVAL': 0.01}):
+            states = wait_for([add.delay(2, 2)])
+
+        self.assertEqual(states[0].status, taskqueue.SUCCEEDED)
+        self.assertEqual(states[0].result, 4)
@@ -0,0 +1,195 @@
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.throttling import LocalBucketStore, parse_rate
+
+TOKEN_URL = reverse('user:token')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK=dict(
+        settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates
+    ))
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_parse_rate(self):
+        """
+        Test rates are parsed to a capacity and a refill rate
+        :return: None
+        """
+        self.assertEqual(parse_rate('120/min'), (120, 2))
+        self.assertEqual(parse_rate('10/s'), (10, 10))
+        self.assertIsNone(parse_rate(''))
+
+    @patch('time.monotonic')
+    def test_bucket_refills(self, monotonic):
+        """
+        Test a bucket allows a burst then refills over time
+        :return: None
+        """
+        monotonic.return_value = 100.0
+        store = LocalBucketStore(10)
+
+        allowed = [store.take('a', 3, 0.5)[0] for _ in range(4)]
+        self.assertEqual(allowed, [True, True, True, False])
+
+        monotonic.return_value = 102.0
+        self.assertEqual(store.take('a', 3, 0.5), (True, 0))
+        self.assertFalse(store.take('a', 3, 0.5)[0])
+
+        monotonic.return_value = 1000.0
+        self.assertEqual(store.take('a', 3, 0.5), (True, 2))
+
+    def test_least_recently_used_bucket_dropped(self):
+        """
+        Test the store keeps at most max_keys buckets
+        :return: None
+        """
+        store = LocalBucketStore(2)
+        for key in ('a', 'b', 'a', 'c'):
+            store.take(key, 1, 0.001)
+
+        self.assertEqual(list(store.buckets), ['a', 'c'])
+
+
+class ThrottleApiTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        self.client = APIClient()
+
+    def test_auth_throttled_per_address(self):
+        """
+        Test token requests are throttled per client address
+        :return: None
+        """
+        payload = {'email': 'test@gmail.com', 'password': 'wrong'}
+        with throttle_rates(auth='2/min'):
+            codes = [
+                self.client.post(TOKEN_URL, payload).status_code
+                for _ in range(3)
+            ]
+            res = self.client.post(TOKEN_URL, payload,
+                                   REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(codes, [400, 400, 429])
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_auth_throttled_ignores_forwarded_for(self):
+        """
+        Test rotating X-Forwarded-For doesn't give a client new buckets
+        :return: None
+        """
+        payload = {'email': 'test@gmail.com', 'password': 'wrong'}
+        with throttle_rates(auth='2/min'):
+            codes = [
+                self.client.post(
+                    TOKEN_URL, payload,
+                    HTTP_X_FORWARDED_FOR='203.0.113.%d' % i
+                ).status_code
+                for i in range(3)
+            ]
+
+        self.assertEqual(codes, [400, 400, 429])
+
+    def test_auth_throttled_behind_proxy(self):
+        """
+        Test behind a proxy the address it appends is used, not the ones
+        sent by the client
+        :return: None
+        """
+        payload = {'email': 'test@gmail.com', 'password': 'wrong'}
+        with override_settings(REST_FRAMEWORK=dict(
+                settings.REST_FRAMEWORK, NUM_PROXIES=1,
+                DEFAULT_THROTTLE_RATES={'auth': '1/min'}
+        )):
+            first = self.client.post(
+                TOKEN_URL, payload, HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.0.5'
+            )
+            second = self.client.post(
+                TOKEN_URL, payload, HTTP_X_FORWARDED_FOR='5.6.7.8, 10.0.0.5'
+            )
+            other = self.client.post(
+                TOKEN_URL, payload, HTTP_X_FORWARDED_FOR='10.0.0.6'
+            )
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(second.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_throttled_response_has_retry_after(self):
+        """
+        Test a throttled request says when to retry
+        :return: None
+        """
+        with throttle_rates(auth='1/min'):
+            self.client.post(TOKEN_URL, {})
+            res = self.client.post(TOKEN_URL, {})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '60')
+
+    def test_recipes_throttled_per_token(self):
+        """
+        Test recipe endpoints are throttled per token, not per address
+        :return: None
+        """
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        token = Token.objects.create(user=self.user)
+        other_token = Token.objects.create(user=other)
+
+        with throttle_rates(recipes='1/min'):
+            self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+            first = self.client.get(TAGS_URL)
+            second = self.client.get(TAGS_URL)
+            self.client.credentials(
+                HTTP_AUTHORIZATION='Token ' + other_token.key
+            )
+            other_res = self.client.get(TAGS_URL)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other_res.status_code, status.HTTP_200_OK)
+
+    def test_scope_disabled(self):
+        """
+        Test an empty rate disables the throttle of a scope
+        :return: None
+        """
+        with throttle_rates(auth=''):
+            codes = {
+                self.client.post(TOKEN_URL, {}).status_code
+                for _ in range(5)
+            }
+
+        self.assertEqual(codes, {status.HTTP_400_BAD_REQUEST})
+
+    def test_shared_cache_buckets(self):
+        """
+        Test buckets can be kept in a shared cache
+        :return: None
+        """
+        with throttle_rates(auth='1/min'), \
+                override_settings(THROTTLE_BUCKETS={
+                    'SHARED_CACHE': 'default'
+                }):
+            self.client.post(TOKEN_URL, {})
+            res = self.client.post(TOKEN_URL, {})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
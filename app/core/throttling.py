@@ -0,0 +1,174 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'MAX_KEYS': 100000,
+    'SHARED_CACHE': None,
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_bucket_store = None
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Parses a DRF style rate, the number of requests allowed per period
+    :param rate: '<requests>/<s, m, h or d>' or None
+    :return: (capacity, tokens added per second) or None
+    """
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    return int(num), int(num) / PERIODS[period[0]]
+
+
+class LocalBucketStore:
+    """
+    Token buckets of this process in a bounded mapping, the least
+    recently used bucket is dropped when full as it would have refilled
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate):
+        """
+        Refills a bucket for the time elapsed since its last request and
+        takes a token from it
+        :param key: bucket key
+        :param capacity: maximum number of tokens
+        :param refill_rate: tokens added per second
+        :return: tuple of whether a token was taken and the tokens left
+        """
+        now = time.monotonic()
+        with self.lock:
+            tokens, stamp = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class CacheBucketStore:
+    """
+    Token buckets in a Django cache shared by all processes. Buckets
+    expire once they would be full again. The read and write of a bucket
+    aren't atomic, so concurrent requests on different processes may
+    both take the last token.
+    """
+    key_prefix = 'throttle:'
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def take(self, key, capacity, refill_rate):
+        now = time.time()
+        key = self.key_prefix + key
+        tokens, stamp = self.cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + max(now - stamp, 0) * refill_rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.cache.set(key, (tokens, now),
+                       math.ceil((capacity - tokens) / refill_rate) or 1)
+        return allowed, tokens
+
+
+def get_bucket_store():
+    """
+    Returns the process wide bucket store configured by the
+    THROTTLE_BUCKETS setting
+    :return: LocalBucketStore or CacheBucketStore
+    """
+    global _bucket_store
+    store = _bucket_store
+    if store is not None:
+        return store
+    with _lock:
+        if _bucket_store is None:
+            options = dict(DEFAULTS)
+            options.update(getattr(settings, 'THROTTLE_BUCKETS', {}))
+            if options['SHARED_CACHE']:
+                _bucket_store = CacheBucketStore(
+                    caches[options['SHARED_CACHE']]
+                )
+            else:
+                _bucket_store = LocalBucketStore(options['MAX_KEYS'])
+        return _bucket_store
+
+
+@receiver(setting_changed)
+def reset_bucket_store(setting, **kwargs):
+    global _bucket_store
+    if setting in ('THROTTLE_BUCKETS', 'REST_FRAMEWORK'):
+        _bucket_store = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttles the requests of each token, or of each client address
+    without one, with a token bucket per view scope. The bucket holds the
+    requests of a period of the scope's DEFAULT_THROTTLE_RATES rate and
+    refills continuously, so bursts up to that size pass and sustained
+    traffic is held to the rate. A check is a dictionary update, far
+    cheaper than the password hash or query it protects.
+    """
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        """
+        Takes a token from the bucket of the request
+        :param request: request object
+        :param view: view with a throttle_scope
+        :return: bool
+        """
+        scope = getattr(view, 'throttle_scope', None)
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+        if rate is None:
+            return True
+        capacity, refill_rate = rate
+
+        allowed, tokens = get_bucket_store().take(
+            '%s:%s' % (scope, self.get_key(request)), capacity, refill_rate
+        )
+        if not allowed:
+            self.wait_seconds = (1 - tokens) / refill_rate
+        return allowed
+
+    def get_key(self, request):
+        """
+        Returns the token key of the request, the user for session or
+        forced authentication, or the client address
+        :param request: request object
+        :return: str
+        """
+        key = getattr(request.auth, 'key', None)
+        if key:
+            return 'token:' + key
+        if request.user and request.user.is_authenticated:
+            return 'user:%s' % request.user.pk
+        return 'ip:' + self.get_ident(request)
+
+    def wait(self):
+        return self.wait_seconds
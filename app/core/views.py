@@ -0,0 +1,44 @@
+import hmac
+
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import get_options, get_registry, get_snapshot_files, \
+    render_series
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def can_read_metrics(request):
+    """
+    Checks the request carries the METRICS TOKEN setting as a bearer
+    token or comes from a staff user logged in to the admin
+    :param request: request object
+    :return: bool
+    """
+    token = get_options()['TOKEN']
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if hmac.compare_digest(header.encode(), ('Bearer ' + token).encode()):
+            return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_active and user.is_staff
+
+
+def metrics(request):
+    """
+    Exposes the request histograms to Prometheus, added up across the
+    processes sharing the METRICS DIR setting or of this process without
+    :param request: request object
+    :return: HttpResponse
+    """
+    if not can_read_metrics(request):
+        return HttpResponseForbidden()
+
+    registry = get_registry()
+    files = get_snapshot_files()
+    if files is None:
+        body = registry.render()
+    else:
+        files.flush(registry)
+        body = render_series(registry.metrics, files.collect())
+    return HttpResponse(body, content_type=PROMETHEUS_CONTENT_TYPE)
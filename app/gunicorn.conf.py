@@ -0,0 +1,54 @@
+"""
+Gunicorn configuration for serving app.wsgi in production.
+
+Every value can be overridden through the environment, the defaults size
+the server from the number of cores. Send SIGHUP to the master process to
+reload the code gracefully: new workers are started before the old ones
+finish their in flight requests.
+"""
+import multiprocessing
+import os
+
+cores = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = int(os.environ.get('GUNICORN_WORKERS', cores * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers periodically so leaks can't grow without bound, the
+# jitter keeps them from restarting all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+
+
+def on_starting(server):
+    """
+    Removes the metrics snapshots of the previous run of the server, they
+    are kept across reloads so the counters don't go backwards
+    """
+    directory = os.environ.get('METRICS_DIR')
+    if directory:
+        from core.metrics import clear_snapshots
+        clear_snapshots(directory)
+
+
+def worker_exit(server, worker):
+    """
+    Writes the last metrics snapshot of an exiting worker, the snapshot
+    thread only writes every METRICS FLUSH_SECONDS
+    """
+    if os.environ.get('METRICS_DIR'):
+        from core.metrics import get_registry, get_snapshot_files
+        files = get_snapshot_files()
+        if files is not None:
+            files.stop()
+            files.flush(get_registry())
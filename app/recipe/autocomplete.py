@@ -0,0 +1,92 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import cache
+
+# Sorts after any character a name continues a prefix with
+LAST_CHAR = chr(0x10ffff)
+
+_indexes = OrderedDict()
+_size = 0
+_lock = threading.Lock()
+
+
+def get_max_rows():
+    return getattr(settings, 'RECIPE_AUTOCOMPLETE_MAX_ROWS', 1000000)
+
+
+def get_ttl():
+    return getattr(settings, 'RECIPE_AUTOCOMPLETE_TTL', 60)
+
+
+class PrefixIndex:
+    """
+    Tags or ingredients of a user sorted by case folded name, so the ones
+    starting with a prefix are a slice found by binary search
+    """
+
+    def __init__(self, rows):
+        self.rows = sorted(
+            rows, key=lambda row: (row['name'].casefold(), row['id'])
+        )
+        self.keys = [row['name'].casefold() for row in self.rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def search(self, prefix, limit):
+        """
+        Returns the objects whose name starts with a prefix, ignoring
+        case, the ones used by most recipes first
+        :param prefix: typed prefix
+        :param limit: maximum number of objects
+        :return: list of dictionaries
+        """
+        prefix = prefix.casefold()
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + LAST_CHAR, start)
+        return heapq.nsmallest(
+            limit, self.rows[start:end],
+            key=lambda row: (-row['recipe_count'], row['name'], row['id'])
+        )
+
+
+def get_index(model, user_id, load):
+    """
+    Returns the prefix index of a user's objects kept by this process,
+    rebuilt once the list version of the user changed or after
+    RECIPE_AUTOCOMPLETE_TTL seconds, which bounds how stale it gets when
+    the version is evicted from the cache or a write doesn't bump it. The
+    least recently used indexes are dropped beyond
+    RECIPE_AUTOCOMPLETE_MAX_ROWS objects.
+    :param model: Tag or Ingredient
+    :param user_id: id of the owner
+    :param load: function returning the rows of the user's objects
+    :return: PrefixIndex
+    """
+    global _size
+    key = (model._meta.label_lower, user_id)
+    version = cache.get_version(model, user_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _indexes.get(key)
+        if entry is not None and entry[0] == version and \
+                now < entry[1] + get_ttl():
+            _indexes.move_to_end(key)
+            return entry[2]
+
+    index = PrefixIndex(load())
+    with _lock:
+        previous = _indexes.pop(key, None)
+        if previous is not None:
+            _size -= len(previous[2])
+        _indexes[key] = (version, now, index)
+        _size += len(index)
+        while _size > get_max_rows() and len(_indexes) > 1:
+            _size -= len(_indexes.popitem(last=False)[1][2])
+    return index
@@ -0,0 +1,82 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import quote_etag
+
+
+def get_cache():
+    return caches[getattr(settings, 'RECIPE_LIST_CACHE', 'default')]
+
+
+def version_key(model, user_id):
+    return 'recipe:list-version:%s:%s' % (model._meta.label_lower, user_id)
+
+
+def new_version():
+    """
+    Returns a fresh version number. Versions start from the current time,
+    so a version key that was evicted never restarts at a number that
+    cached entries were stored under.
+    :return: int
+    """
+    return int(time.time() * 1000)
+
+
+def get_version(model, user_id):
+    """
+    Returns the current list version of a user's objects
+    :param model: Tag or Ingredient
+    :param user_id: id of the owner
+    :return: int
+    """
+    cache = get_cache()
+    key = version_key(model, user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(model, user_id):
+    """
+    Invalidates every cached list of a user's objects
+    :param model: Tag or Ingredient
+    :param user_id: id of the owner
+    :return: None
+    """
+    cache = get_cache()
+    key = version_key(model, user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), None)
+
+
+def get_list_key(model, request, action='list'):
+    """
+    Returns the cache key and ETag of a list request. The key covers the
+    user, the list version, the view action, the response format, the
+    query string, and the scheme and host the absolute pagination links
+    are built from, and is computed without touching the database.
+    :param model: Tag or Ingredient
+    :param request: request object
+    :param action: view action listing the objects
+    :return: (key, etag) tuple
+    """
+    version = get_version(model, request.user.pk)
+    query = request.query_params.urlencode()
+    digest = hashlib.md5(
+        ('%s:%s:%s:%s:%s:%s:%s:%s' % (
+            model._meta.label_lower, request.user.pk, version, action,
+            request.accepted_renderer.format, query, request.scheme,
+            request.get_host(),
+        )).encode('utf-8')
+    ).hexdigest()
+    return 'recipe:list:%s' % digest, quote_etag(digest)
+
+
+def get_list_timeout():
+    return getattr(settings, 'RECIPE_LIST_CACHE_TIMEOUT', 300)
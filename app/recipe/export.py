@@ -0,0 +1,150 @@
+import csv
+import io
+
+from core.models import Recipe
+from . import images
+from .importer import LIST_DELIMITER
+from .serializers import RecipeSerializer
+
+CHUNK_SIZE = 500
+# The first chunks are smaller so the response starts right away
+FIRST_CHUNK_SIZE = 20
+
+RECIPE_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+CSV_HEADER = RECIPE_FIELDS + ('tags', 'ingredients')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def fetch_related(field_name, recipe_ids):
+    """
+    Reads the tags or ingredients of a batch of recipes in one query
+    :param field_name: tags or ingredients
+    :param recipe_ids: ids of the recipes
+    :return: dictionary of recipe id to list of (id, name, recipe_count)
+    """
+    field = Recipe._meta.get_field(field_name)
+    target = field.m2m_reverse_field_name()
+    rows = field.remote_field.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by(target + '__name').values_list(
+        'recipe_id', target + '_id', target + '__name',
+        target + '__recipe_count'
+    )
+    related = {}
+    for recipe_id, pk, name, recipe_count in rows:
+        related.setdefault(recipe_id, []).append((pk, name, recipe_count))
+    return related
+
+
+def iter_recipe_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Reads recipes a chunk at a time in id order, each chunk a query for
+    the ids after the last one read, and attaches their tags and
+    ingredients with one query per chunk, so memory use doesn't depend on
+    the number of recipes. Unlike a server side cursor this holds no
+    transaction open between chunks, which works behind pgbouncer in
+    transaction mode. Chunks start small and double up to chunk_size.
+    :param queryset: recipes queryset
+    :param chunk_size: number of recipes per chunk
+    :return: iterator of lists of (values dictionary, tags, ingredients)
+    """
+    price = RecipeSerializer().fields['price']
+    rows = queryset.order_by('id').values_list(
+        *RECIPE_FIELDS, 'image', 'image_variants'
+    )
+    size = min(FIRST_CHUNK_SIZE, chunk_size)
+    last_id = None
+    while True:
+        if last_id is not None:
+            chunk = list(rows.filter(id__gt=last_id)[:size])
+        else:
+            chunk = list(rows[:size])
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+        size = min(size * 2, chunk_size)
+        ids = [row[0] for row in chunk]
+        tags = fetch_related('tags', ids)
+        ingredients = fetch_related('ingredients', ids)
+        records = []
+        for row in chunk:
+            values = dict(zip(RECIPE_FIELDS, row))
+            values['price'] = price.to_representation(values['price'])
+            values['image'] = images.build_urls(row[0], row[-2], row[-1])
+            records.append((
+                values, tags.get(row[0], []), ingredients.get(row[0], [])
+            ))
+        yield records
+
+
+def related_dicts(related):
+    return [
+        {'id': pk, 'name': name, 'recipe_count': recipe_count}
+        for pk, name, recipe_count in related
+    ]
+
+
+def stream_ndjson(queryset, renderer, chunk_size=CHUNK_SIZE):
+    """
+    Streams recipes as newline delimited JSON objects with the schema of
+    the recipe detail endpoint
+    :param queryset: recipes queryset
+    :param renderer: JSON renderer
+    :param chunk_size: number of recipes per chunk
+    :return: iterator of bytes
+    """
+    for records in iter_recipe_chunks(queryset, chunk_size):
+        lines = []
+        for values, tags, ingredients in records:
+            data = {
+                'id': values['id'],
+                'title': values['title'],
+                'ingredients': related_dicts(ingredients),
+                'tags': related_dicts(tags),
+                'time_minutes': values['time_minutes'],
+                'price': values['price'],
+                'link': values['link'],
+                'image': values['image'],
+            }
+            lines.append(renderer.render(data))
+        yield b'\n'.join(lines) + b'\n'
+
+
+def join_names(related):
+    """
+    Encodes names as a single CSV cell
+    :param related: list of (id, name, recipe_count)
+    :return: str
+    """
+    output = io.StringIO()
+    csv.writer(
+        output, delimiter=LIST_DELIMITER, lineterminator=''
+    ).writerow([name for _, name, _ in related])
+    return output.getvalue()
+
+
+def stream_csv(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Streams recipes as CSV rows, the header first
+    :param queryset: recipes queryset
+    :param chunk_size: number of recipes per chunk
+    :return: iterator of bytes
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+    yield output.getvalue().encode('utf-8')
+
+    for records in iter_recipe_chunks(queryset, chunk_size):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        for values, tags, ingredients in records:
+            writer.writerow(
+                [values[name] for name in RECIPE_FIELDS] +
+                [join_names(tags), join_names(ingredients)]
+            )
+        yield output.getvalue().encode('utf-8')
@@ -0,0 +1,146 @@
+import io
+import json
+import mimetypes
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.urls import reverse
+from PIL import Image
+
+DEFAULTS = {
+    'MAX_UPLOAD_SIZE': 50 * 1024 * 1024,
+    'MAX_PIXELS': 50000000,
+    # Variant name to the box its copy of the image is resized to fit in
+    'VARIANTS': {'thumbnail': (150, 150), 'medium': (800, 800)},
+    'QUALITY': 85,
+    'CACHE_SECONDS': 365 * 24 * 3600,
+}
+
+# Formats accepted for uploads
+FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP', 'BMP')
+
+
+def get_options():
+    """
+    Returns the RECIPE_IMAGES setting merged over the defaults
+    :return: dictionary
+    """
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'RECIPE_IMAGES', {}))
+    return options
+
+
+def read_header(f):
+    """
+    Reads the format and size of an image from its header, without
+    decoding the pixels
+    :param f: file object
+    :return: tuple of the format and (width, height), or None
+    """
+    try:
+        with Image.open(f) as image:
+            return image.format, image.size
+    except (IOError, SyntaxError, Image.DecompressionBombError):
+        return None
+    finally:
+        f.seek(0)
+
+
+def get_version(name):
+    """
+    Returns the version of a stored image, its unique file name
+    :param name: storage name of the image
+    :return: str
+    """
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def get_variants(recipe):
+    """
+    Returns the generated variants of the image of a recipe
+    :param recipe: Recipe
+    :return: dictionary of variant name to storage name
+    """
+    return json.loads(recipe.image_variants)
+
+
+def get_urls(recipe):
+    """
+    Returns the URLs of the image of a recipe and of its generated
+    variants, versioned so they can be cached for good
+    :param recipe: Recipe
+    :return: dictionary of variant name to URL, or None without an image
+    """
+    return build_urls(recipe.pk, recipe.image.name, recipe.image_variants)
+
+
+def build_urls(recipe_id, name, variants):
+    """
+    Returns the image URLs of a recipe from its column values
+    :param recipe_id: id of the recipe
+    :param name: storage name of the image, empty without one
+    :param variants: image_variants JSON
+    :return: dictionary of variant name to URL, or None without an image
+    """
+    if not name:
+        return None
+    url = reverse('recipe:recipe-image', args=[recipe_id])
+    version = get_version(name)
+    urls = {'original': '%s?v=%s' % (url, version)}
+    for variant in json.loads(variants):
+        urls[variant] = '%s?variant=%s&v=%s' % (url, variant, version)
+    return urls
+
+
+def get_content_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def make_variants(storage, name):
+    """
+    Saves resized copies of a stored image next to it. Each variant is
+    resized from the previous larger one rather than from the original,
+    and JPEG images are decoded at the smallest scale the largest
+    variant allows.
+    :param storage: storage holding the image
+    :param name: storage name of the image
+    :return: dictionary of variant name to storage name
+    """
+    options = get_options()
+    boxes = sorted(options['VARIANTS'].items(),
+                   key=lambda item: item[1], reverse=True)
+    stem = os.path.join(os.path.dirname(name), 'variants', get_version(name))
+
+    variants = {}
+    with storage.open(name, 'rb') as f, Image.open(f) as image:
+        if image.width * image.height > options['MAX_PIXELS']:
+            raise ValueError('Image %s is too large to resize' % name)
+        image.draft('RGB', boxes[0][1])
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or \
+            'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        image_format, ext = ('PNG', '.png') if has_alpha else ('JPEG', '.jpg')
+
+        for variant, box in boxes:
+            image.thumbnail(box, Image.LANCZOS)
+            content = io.BytesIO()
+            image.save(content, image_format, quality=options['QUALITY'],
+                       optimize=True)
+            variants[variant] = storage.save(
+                '%s_%s%s' % (stem, variant, ext),
+                ContentFile(content.getvalue())
+            )
+    return variants
+
+
+def delete_files(storage, name, variants):
+    """
+    Deletes a stored image and its variants
+    :param storage: storage holding the image
+    :param name: storage name of the image
+    :param variants: dictionary of variant name to storage name
+    :return: None
+    """
+    for file_name in [name] + list(variants.values()):
+        storage.delete(file_name)
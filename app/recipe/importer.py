@@ -0,0 +1,296 @@
+import csv
+import json
+import os
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.bulk import insert_rows, next_ids
+from core.counters import apply_deltas
+from core.models import Tag, Ingredient, Recipe, ImportJob
+from . import cache
+
+BATCH_SIZE = 5000
+MAX_ERRORS = 100
+MAX_LENGTH = 255
+MAX_INTEGER = 2 ** 31 - 1
+MAX_PRICE = Decimal('1000')
+CENTS = Decimal('0.01')
+
+FORMATS = ('csv', 'ndjson')
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+# Names inside the tags and ingredients cells of CSV files are themselves
+# a CSV row with this delimiter, so names containing it are quoted
+LIST_DELIMITER = ';'
+
+RECIPE_FIELDS = ('id', 'user', 'title', 'time_minutes', 'price', 'link',
+                 'tag_count', 'ingredient_count', 'image', 'image_variants',
+                 'updated_at')
+
+
+class RecordError(ValueError):
+    """
+    A record of the imported file is invalid and is skipped
+    """
+
+
+class ImportConflict(Exception):
+    """
+    Another process moved the import job forward
+    """
+
+
+def guess_format(filename):
+    """
+    Returns the import format matching a file name extension
+    :param filename: name of the file
+    :return: csv, ndjson or None
+    """
+    return EXTENSIONS.get(os.path.splitext(filename or '')[1].lower())
+
+
+def iter_records(stream, import_format):
+    """
+    Reads the raw records of a file, one per CSV row or NDJSON line
+    :param stream: text stream
+    :param import_format: csv or ndjson
+    :return: iterator of dictionaries (CSV) or strings (NDJSON)
+    """
+    if import_format == 'csv':
+        return csv.DictReader(stream)
+    return (line for line in stream if line.strip())
+
+
+def clean_names(value):
+    """
+    Returns the distinct names of a tags or ingredients value, a ';'
+    delimited CSV cell or a list of names or of objects with a name
+    :param value: cell string or list
+    :return: list of names
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = next(csv.reader([value], delimiter=LIST_DELIMITER), [])
+    elif not isinstance(value, list):
+        raise RecordError('Expected a list of names.')
+    names = []
+    for name in value:
+        if isinstance(name, dict):
+            name = name.get('name')
+        if not isinstance(name, str):
+            raise RecordError('Expected a list of names.')
+        name = name.strip()
+        if len(name) > MAX_LENGTH:
+            raise RecordError('Name longer than %d characters.' % MAX_LENGTH)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def clean_record(raw):
+    """
+    Validates a raw record
+    :param raw: dictionary (CSV) or JSON string (NDJSON)
+    :return: (title, time_minutes, price, link, tags, ingredients) tuple
+    """
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raise RecordError('Invalid JSON.')
+        if not isinstance(raw, dict):
+            raise RecordError('Expected a JSON object.')
+
+    title = raw.get('title')
+    if not isinstance(title, str) or not title.strip():
+        raise RecordError('A title is required.')
+    title = title.strip()
+    if len(title) > MAX_LENGTH:
+        raise RecordError('Title longer than %d characters.' % MAX_LENGTH)
+
+    time_minutes = raw.get('time_minutes')
+    if isinstance(time_minutes, bool) or \
+            not isinstance(time_minutes, (int, str)):
+        raise RecordError('time_minutes must be an integer.')
+    try:
+        time_minutes = int(time_minutes)
+    except ValueError:
+        raise RecordError('time_minutes must be an integer.')
+    if abs(time_minutes) > MAX_INTEGER:
+        raise RecordError('time_minutes is out of range.')
+
+    price = raw.get('price')
+    if isinstance(price, bool) or not isinstance(price, (int, float, str)):
+        raise RecordError('price must be a decimal number.')
+    try:
+        price = Decimal(str(price).strip())
+    except InvalidOperation:
+        raise RecordError('price must be a decimal number.')
+    if not price.is_finite() or abs(price) >= MAX_PRICE or \
+            price != price.quantize(CENTS):
+        raise RecordError(
+            'price must have at most 3 digits before and 2 after the '
+            'decimal point.'
+        )
+
+    link = raw.get('link') or ''
+    if not isinstance(link, str) or len(link) > MAX_LENGTH:
+        raise RecordError('link must be at most %d characters.' % MAX_LENGTH)
+
+    return (
+        title, time_minutes, price.quantize(CENTS), link.strip(),
+        clean_names(raw.get('tags')), clean_names(raw.get('ingredients')),
+    )
+
+
+class RecipeImporter:
+    """
+    Imports recipes in batches. Each batch validates its records,
+    resolves or creates the named tags and ingredients with a few
+    queries, bulk inserts the recipes and their M2M rows (COPY on
+    PostgreSQL) and advances the job in the same transaction, so a
+    failed import resumes after the last committed batch.
+    """
+
+    def __init__(self, job, batch_size=BATCH_SIZE, use_copy=True):
+        """
+        :param job: ImportJob to run or resume
+        :param batch_size: number of records per transaction
+        :param use_copy: insert with COPY on PostgreSQL
+        """
+        self.job = job
+        self.user = job.user
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.errors = json.loads(job.errors)
+        self.ids = {Tag: {}, Ingredient: {}}
+
+    def run(self, stream, progress=None):
+        """
+        Imports the records of a stream after the job position
+        :param stream: text stream of the file
+        :param progress: callable receiving the job after every batch
+        :return: ImportJob
+        """
+        records = iter_records(stream, self.job.format)
+        try:
+            # Records before the position were imported by an earlier run
+            for _ in islice(records, self.job.position):
+                pass
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                if progress is not None:
+                    progress(self.job)
+        except ImportConflict:
+            raise
+        except Exception:
+            ImportJob.objects.filter(pk=self.job.pk).update(
+                status=ImportJob.STATUS_FAILED
+            )
+            self.job.status = ImportJob.STATUS_FAILED
+            raise
+        self.job.status = ImportJob.STATUS_COMPLETED
+        self.job.save(update_fields=['status', 'updated_at'])
+        return self.job
+
+    def import_batch(self, batch):
+        """
+        Imports a batch of raw records in one transaction
+        :param batch: list of raw records
+        :return: None
+        """
+        records = []
+        for offset, raw in enumerate(batch, self.job.position + 1):
+            try:
+                records.append(clean_record(raw))
+            except RecordError as exc:
+                if len(self.errors) < MAX_ERRORS:
+                    self.errors.append({'record': offset, 'error': str(exc)})
+
+        with transaction.atomic():
+            job = ImportJob.objects.select_for_update().get(pk=self.job.pk)
+            if job.position != self.job.position:
+                raise ImportConflict(
+                    'Import job %d was resumed by another process' % job.pk
+                )
+            if records:
+                self.insert(records)
+            job.position += len(batch)
+            job.imported += len(records)
+            job.rejected += len(batch) - len(records)
+            job.errors = json.dumps(self.errors)
+            job.status = ImportJob.STATUS_RUNNING
+            job.save(update_fields=[
+                'position', 'imported', 'rejected', 'errors', 'status',
+                'updated_at'
+            ])
+        self.job = job
+
+        if records:
+            for model in (Tag, Ingredient):
+                cache.bump_version(model, job.user_id)
+
+    def resolve(self, model, names):
+        """
+        Returns the ids of the user's objects with the given names,
+        creating the missing ones
+        :param model: Tag or Ingredient
+        :param names: set of names
+        :return: dictionary of name to id
+        """
+        ids = self.ids[model]
+        missing = [name for name in names if name not in ids]
+        if missing:
+            created, existing = model.objects.bulk_get_or_create(
+                self.user, missing
+            )
+            ids.update((obj.name, obj.id) for obj in created + existing)
+        return ids
+
+    def insert(self, records):
+        """
+        Inserts recipes with their tag and ingredient links and updates
+        the recipe counts of the linked objects
+        :param records: list of cleaned records
+        :return: None
+        """
+        user_id = self.job.user_id
+        recipe_ids = next_ids(Recipe, len(records))
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        insert_rows(Recipe, RECIPE_FIELDS, [
+            (pk, user_id, title, time_minutes, price, link, len(tags),
+             len(ingredients), '', '{}', now)
+            for pk, (title, time_minutes, price, link, tags, ingredients)
+            in zip(recipe_ids, records)
+        ], self.use_copy)
+
+        for model, field_name, position in ((Tag, 'tags', 4),
+                                            (Ingredient, 'ingredients', 5)):
+            ids = self.resolve(model, {
+                name for record in records for name in record[position]
+            })
+            field = Recipe._meta.get_field(field_name)
+            links = [
+                (pk, ids[name])
+                for pk, record in zip(recipe_ids, records)
+                for name in record[position]
+            ]
+            if links:
+                insert_rows(
+                    field.remote_field.through,
+                    ('recipe', field.m2m_reverse_field_name()),
+                    links, self.use_copy
+                )
+                apply_deltas(model, Counter(pk for _, pk in links))
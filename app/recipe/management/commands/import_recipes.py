@@ -0,0 +1,92 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ImportJob
+from recipe.importer import BATCH_SIZE, FORMATS, RecipeImporter, \
+    guess_format
+
+
+class Command(BaseCommand):
+    """
+    Django command to bulk import recipes from a CSV or NDJSON file
+    """
+    help = 'Imports recipes with tag and ingredient names for a user. ' \
+           'Pass --job to resume an interrupted import of the same file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file')
+        parser.add_argument('--email', help='Owner of the recipes')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Defaults to the file extension')
+        parser.add_argument('--job', type=int,
+                            help='Id of an import job to resume')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--no-copy', action='store_false',
+                            dest='use_copy',
+                            help='Insert with bulk_create on PostgreSQL')
+
+    def handle(self, *args, **options):
+        job = self.get_job(options)
+        self.stdout.write('Import job %d, starting at record %d' % (
+            job.pk, job.position
+        ))
+
+        start = time.perf_counter()
+        first = job.position
+
+        def progress(job):
+            elapsed = time.perf_counter() - start
+            self.stdout.write('%d records, %.0f records/s' % (
+                job.position, (job.position - first) / elapsed
+            ))
+
+        importer = RecipeImporter(job, options['batch_size'],
+                                  options['use_copy'])
+        with open(options['path'], encoding='utf-8-sig', newline='') as f:
+            try:
+                job = importer.run(f, progress)
+            except Exception as exc:
+                raise CommandError(
+                    'Import failed at record %d, resume with --job %d: %s'
+                    % (importer.job.position, job.pk, exc)
+                )
+
+        for error in importer.errors:
+            self.stdout.write('Record %(record)d rejected: %(error)s' % error)
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %d recipes, rejected %d' % (job.imported, job.rejected)
+        ))
+
+    def get_job(self, options):
+        """
+        Returns the job to resume or a new one
+        :param options: command options
+        :return: ImportJob
+        """
+        if options['job'] is not None:
+            try:
+                job = ImportJob.objects.select_related('user').get(
+                    pk=options['job']
+                )
+            except ImportJob.DoesNotExist:
+                raise CommandError('Import job %d not found' % options['job'])
+            if job.status == ImportJob.STATUS_COMPLETED:
+                raise CommandError('Import job %d is completed' % job.pk)
+            return job
+
+        if not options['email']:
+            raise CommandError('--email is required for a new import')
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('User %s not found' % options['email'])
+        import_format = options['format'] or guess_format(options['path'])
+        if import_format is None:
+            raise CommandError('Pass --format for this file extension')
+        return ImportJob.objects.create(
+            user=user, source=os.path.basename(options['path']),
+            format=import_format
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipe.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    """
+    Django command to delete the tombstones past the sync retention
+    """
+    help = 'Deletes the records of deleted tags, ingredients and recipes ' \
+           'older than RECIPE_SYNC RETENTION_DAYS. Clients with an older ' \
+           'sync cursor get a full sync.'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            'Deleted %d tombstones' % deleted
+        ))
@@ -0,0 +1,159 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Cursor pagination on the (name, id) key of per user recipe attributes.
+    Every page is an index range scan on (user_id, name, id), so fetching
+    a deep page costs the same as fetching the first one.
+    Pagination is opt in: it is only applied when the client sends a
+    cursor or a page size, otherwise the full list is returned.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    ordering = ('-name', '-id')
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Returns a single page of the queryset, or None if the request
+        did not ask for pagination
+        :param queryset: queryset of the current user's objects
+        :param request: request object
+        :param view: view object
+        :return: List of objects or None
+        """
+        params = request.query_params
+        if self.cursor_query_param not in params and \
+                self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        page = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(page) > self.page_size_value
+        self.page = page[:self.page_size_value]
+        return self.page
+
+    def get_keyset_filter(self, position):
+        """
+        Builds the filter selecting rows after the given position.
+        The name__lte bound lets the database use it as the start of the
+        index scan, the OR only breaks ties between equal names.
+        :param position: (name, id) of the last row of the previous page
+        :return: Q object
+        """
+        name, pk = position
+        return Q(name__lte=name) & (Q(name__lt=name) | Q(id__lt=pk))
+
+    def get_page_size(self, request):
+        """
+        Returns the page size requested by the client, capped by
+        max_page_size
+        :param request: request object
+        :return: int
+        """
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_position(self, item):
+        """
+        Returns the keyset position of an item
+        :param item: model instance or dictionary of its values
+        :return: (name, id) tuple
+        """
+        if isinstance(item, dict):
+            return item['name'], item['id']
+        return item.name, item.id
+
+    def parse_position(self, values):
+        """
+        Validates the values decoded from a cursor
+        :param values: decoded list
+        :return: (name, id) tuple
+        """
+        name, pk = values
+        if not isinstance(name, str):
+            raise ValueError
+        return name, int(pk)
+
+    def encode_cursor(self, position):
+        """
+        Encodes a position as an opaque url safe cursor
+        :param position: position tuple
+        :return: str
+        """
+        data = json.dumps(list(position), separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        """
+        Decodes the cursor sent by the client
+        :param request: request object
+        :return: position tuple or None
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(encoded.encode('ascii'))
+            return self.parse_position(json.loads(data.decode('utf-8')))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        """
+        Returns the url of the next page or None on the last page
+        :return: str or None
+        """
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(self.get_position(self.page[-1]))
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+class IdCursorPagination(KeysetCursorPagination):
+    """
+    Cursor pagination on the id of per user objects, newest first
+    """
+    ordering = ('-id',)
+
+    def get_keyset_filter(self, position):
+        return Q(id__lt=position[0])
+
+    def get_position(self, item):
+        return item.id,
+
+    def parse_position(self, values):
+        pk, = values
+        return int(pk),
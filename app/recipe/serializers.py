@@ -1,24 +1,179 @@
+import json
+
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
-from core.models import Tag, Ingredient
+from core.models import Tag, Ingredient, Recipe, ImportJob
+from . import images
+from .importer import FORMATS
+
+
+class ValuesReadMixin:
+    """
+    Fast read path for serializers whose fields are all plain model
+    columns: rows are fetched as dicts with the serializer's keys, in the
+    same order, skipping the field objects and OrderedDict built per row
+    by to_representation. Writes still go through the serializer.
+    """
 
+    @classmethod
+    def read_values(cls, queryset):
+        """
+        Returns a queryset of the serialized representation of the rows
+        :param queryset: objects queryset
+        :return: queryset of dictionaries
+        """
+        return queryset.values(*cls.Meta.fields)
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(ValuesReadMixin, serializers.ModelSerializer):
     """
     Serializer for tags model
     """
 
     class Meta:
         model = Tag
-        fields = ['id', 'name']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'recipe_count']
+        read_only_fields = ['id', 'recipe_count']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(ValuesReadMixin, serializers.ModelSerializer):
     """
     Serializer for ingredient model
     """
 
     class Meta:
         model = Ingredient
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'recipe_count']
+        read_only_fields = ['id', 'recipe_count']
+
+
+class RecipeSerializer(serializers.ModelSerializer):
+    """
+    Serializer for creating and updating recipes
+    """
+    ingredients = serializers.PrimaryKeyRelatedField(
+        many=True,
+        queryset=Ingredient.objects.all()
+    )
+    tags = serializers.PrimaryKeyRelatedField(
+        many=True,
+        queryset=Tag.objects.all()
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ['id', 'title', 'ingredients', 'tags', 'time_minutes',
+                  'price', 'link']
         read_only_fields = ['id']
+
+    def get_fields(self):
+        """
+        Limits the selectable tags and ingredients to the ones owned by
+        the requesting user
+        :return: Dictionary of fields
+        """
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is not None:
+            for name in ('ingredients', 'tags'):
+                field = fields[name]
+                if isinstance(field, serializers.ManyRelatedField):
+                    related = field.child_relation
+                    related.queryset = related.queryset.filter(
+                        user=request.user
+                    )
+        return fields
+
+
+class RecipeDetailSerializer(RecipeSerializer):
+    """
+    Serializer for reading recipes with nested tags and ingredients
+    """
+    ingredients = IngredientSerializer(many=True, read_only=True)
+    tags = TagSerializer(many=True, read_only=True)
+    image = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['image']
+
+    def get_image(self, obj):
+        """
+        Returns the URLs of the image and of its variants generated so far
+        :param obj: Recipe
+        :return: dictionary of variant name to URL, or None
+        """
+        return images.get_urls(obj)
+
+
+class BulkNamesSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of tag or ingredient names
+    """
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=10000
+    )
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the progress of a recipe import
+    """
+    errors = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'source', 'format', 'status', 'position',
+                  'imported', 'rejected', 'errors', 'created_at',
+                  'updated_at']
+        read_only_fields = fields
+
+    def get_errors(self, obj):
+        """
+        Returns the rejected records with their errors
+        :param obj: ImportJob
+        :return: list of dictionaries
+        """
+        return json.loads(obj.errors)
+
+
+class RecipeImportSerializer(serializers.Serializer):
+    """
+    Serializer for an uploaded recipe file, optionally resuming a job,
+    whose file was kept if it isn't uploaded again
+    """
+    file = serializers.FileField(required=False)
+    type = serializers.ChoiceField(choices=FORMATS, required=False)
+    job = serializers.IntegerField(required=False)
+
+
+class RecipeImageSerializer(serializers.Serializer):
+    """
+    Serializer for an uploaded recipe image, checked from its header only
+    """
+    image = serializers.FileField()
+
+    def validate_image(self, value):
+        """
+        Checks the upload is an image of an accepted format and size
+        :param value: uploaded file
+        :return: uploaded file
+        """
+        options = images.get_options()
+        if value.size > options['MAX_UPLOAD_SIZE']:
+            raise serializers.ValidationError(
+                _('Images are limited to %d bytes.') %
+                options['MAX_UPLOAD_SIZE']
+            )
+        header = images.read_header(value)
+        if header is None or header[0] not in images.FORMATS:
+            raise serializers.ValidationError(
+                _('Expected a %s image.') % ', '.join(images.FORMATS)
+            )
+        width, height = header[1]
+        if width * height > options['MAX_PIXELS']:
+            raise serializers.ValidationError(
+                _('Images are limited to %d pixels.') % options['MAX_PIXELS']
+            )
+        return value
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from core.counters import recipe_counts_rebuilt
+from core.models import Tag, Ingredient, Recipe
+from . import images
+from .cache import bump_version
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_attr_lists(sender, instance, **kwargs):
+    """
+    Invalidates the cached lists of the owner of a saved or deleted tag
+    or ingredient
+    """
+    bump_version(sender, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_assigned_lists(sender, instance, action, **kwargs):
+    """
+    Invalidates the cached lists of tags or ingredients when recipes are
+    linked to or unlinked from them, as assigned_only lists depend on it
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        model = Tag if sender is Recipe.tags.through else Ingredient
+        bump_version(model, instance.user_id)
+
+
+@receiver(recipe_counts_rebuilt, sender=Tag)
+@receiver(recipe_counts_rebuilt, sender=Ingredient)
+def invalidate_rebuilt_lists(sender, user_ids, **kwargs):
+    """
+    Invalidates the cached lists of the users whose tag or ingredient
+    recipe counts were rebuilt
+    """
+    for user_id in user_ids:
+        bump_version(sender, user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_deleted_recipe_lists(sender, instance, **kwargs):
+    """
+    Invalidates the cached lists of tags and ingredients of the owner of
+    a deleted recipe, its M2M rows are removed without m2m_changed
+    """
+    bump_version(Tag, instance.user_id)
+    bump_version(Ingredient, instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image(sender, instance, **kwargs):
+    """
+    Deletes the image files of a deleted recipe
+    """
+    if instance.image:
+        images.delete_files(instance.image.storage, instance.image.name,
+                            images.get_variants(instance))
@@ -0,0 +1,88 @@
+from django.db import connections, router
+
+from core.counters import RECIPE_FIELDS, LINK_COUNT_FIELDS, \
+    get_link_columns
+from core.models import Recipe
+
+# Weight of a shared tag and of a shared ingredient in the score
+WEIGHTS = {
+    'tags': 1.0,
+    'ingredients': 1.0,
+}
+
+# Links of a recipe M2M field to some objects, flagged with the field
+LINKS_SQL = 'SELECT {recipe_column} AS recipe_id, {flags} FROM {table} ' \
+            'WHERE {target_column} IN ({ids})'
+
+SIMILAR_SQL = '''
+SELECT id, title, CASE WHEN total > 0 THEN shared / total ELSE 0 END AS score
+FROM (
+    SELECT recipe.id, recipe.title,
+           {shared} AS shared,
+           {total} AS total
+    FROM (
+        SELECT recipe_id, {sums}
+        FROM ({links}) links
+        GROUP BY recipe_id
+    ) overlap
+    JOIN {recipe_table} recipe ON recipe.id = overlap.recipe_id
+    WHERE recipe.user_id = %s AND recipe.id <> %s
+) candidates
+ORDER BY score DESC, id DESC
+LIMIT %s
+'''
+
+
+def similar_recipes(recipe, limit=10):
+    """
+    Ranks the other recipes of the owner of a recipe by weighted Jaccard
+    similarity of their tags and ingredients: the weight of the shared
+    ones over the weight of all the ones of either recipe. The recipe
+    through tables, indexed by tag and ingredient, serve as an inverted
+    index. One query reads the links of the recipe's tags and ingredients
+    only and counts them per recipe. The sizes of the candidate recipes
+    come from their tag_count and ingredient_count columns, so no
+    recipe is compared pairwise.
+    :param recipe: Recipe
+    :param limit: number of recipes returned
+    :return: list of (id, title, score) tuples, best first
+    """
+    # The database the router reads recipes from, a replica inside
+    # use_replicas()
+    connection = connections[router.db_for_read(Recipe, instance=recipe)]
+    quote_name = connection.ops.quote_name
+    links, params = [], []
+    shared, total, sums = [], [], []
+    for model, field_name in RECIPE_FIELDS.items():
+        through, recipe_column, target_column = get_link_columns(model)
+        ids = list(getattr(recipe, field_name).values_list('id', flat=True))
+        if ids:
+            links.append(LINKS_SQL.format(
+                recipe_column=quote_name(recipe_column),
+                flags=', '.join('%d AS %s' % (name == field_name, name)
+                                for name in WEIGHTS),
+                table=quote_name(through._meta.db_table),
+                target_column=quote_name(target_column),
+                ids=', '.join(['%s'] * len(ids)),
+            ))
+            params.extend(ids)
+        weight = WEIGHTS[field_name]
+        sums.append('SUM(%s) AS %s' % (field_name, field_name))
+        shared.append('%r * overlap.%s' % (weight, field_name))
+        total.append('%r * (%d + recipe.%s - overlap.%s)' % (
+            weight, len(ids), quote_name(LINK_COUNT_FIELDS[model]),
+            field_name
+        ))
+    if not links:
+        return []
+
+    sql = SIMILAR_SQL.format(
+        shared=' + '.join(shared),
+        total=' + '.join(total),
+        sums=', '.join(sums),
+        links=' UNION ALL '.join(links),
+        recipe_table=quote_name(Recipe._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [recipe.user_id, recipe.pk, limit])
+        return cursor.fetchall()
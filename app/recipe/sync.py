@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from core.models import Tag, Ingredient, Recipe, Tombstone
+from . import export
+from .serializers import TagSerializer, IngredientSerializer
+
+DEFAULTS = {
+    # Cursors are issued this far in the past, so rows saved by a
+    # transaction that commits after the sync, rows not yet copied to the
+    # read replica and rows saved by a server whose clock is behind are
+    # still returned by the next one
+    'SETTLE_SECONDS': 5,
+    # Tombstones are kept this long, older cursors get a full sync
+    'RETENTION_DAYS': 90,
+}
+
+# Key of the changed and deleted objects of each model in the response
+MODEL_KEYS = {
+    Tag: 'tags',
+    Ingredient: 'ingredients',
+    Recipe: 'recipes',
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def get_options():
+    """
+    Returns the RECIPE_SYNC setting merged over the defaults
+    :return: dictionary
+    """
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'RECIPE_SYNC', {}))
+    return options
+
+
+def encode_cursor(moment):
+    """
+    Encodes a point in time as a cursor, in microseconds since the epoch
+    :param moment: aware datetime
+    :return: str
+    """
+    delta = moment - EPOCH
+    return str((delta.days * 86400 + delta.seconds) * 1000000 +
+               delta.microseconds)
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor sent by a client
+    :param cursor: str
+    :return: aware datetime
+    """
+    try:
+        return EPOCH + timedelta(microseconds=int(cursor))
+    except (ValueError, OverflowError):
+        raise ValidationError({'since': [_('Invalid cursor')]})
+
+
+def read_rows(model, queryset):
+    """
+    Serializes the rows of a sync response, recipes with the ids of
+    their tags and ingredients, which are synced on their own
+    :param model: Tag, Ingredient or Recipe
+    :param queryset: rows of the model
+    :return: list of dictionaries
+    """
+    if model is not Recipe:
+        serializer_class = {
+            Tag: TagSerializer,
+            Ingredient: IngredientSerializer,
+        }[model]
+        return list(serializer_class.read_values(queryset))
+
+    recipes = []
+    for records in export.iter_recipe_chunks(queryset):
+        for values, tags, ingredients in records:
+            recipes.append({
+                'id': values['id'],
+                'title': values['title'],
+                'ingredients': [pk for pk, _, _ in ingredients],
+                'tags': [pk for pk, _, _ in tags],
+                'time_minutes': values['time_minutes'],
+                'price': values['price'],
+                'link': values['link'],
+                'image': values['image'],
+            })
+    return recipes
+
+
+def get_changes(user, since=None):
+    """
+    Returns the tags, ingredients and recipes of a user saved since a
+    cursor, and the ids of the ones deleted since. Every lookup is a
+    range scan of a (user, timestamp) index, so the cost follows the
+    number of changes rather than the number of objects. Without a
+    cursor, or with one older than the tombstones kept, every object is
+    returned and reset tells the client to drop its copy first.
+    :param user: owner of the objects
+    :param since: cursor returned by the previous sync
+    :return: dictionary
+    """
+    options = get_options()
+    now = timezone.now()
+    reset = since is None
+    if not reset:
+        since = decode_cursor(since)
+        reset = since < now - timedelta(days=options['RETENTION_DAYS'])
+
+    data = {
+        'cursor': encode_cursor(
+            now - timedelta(seconds=options['SETTLE_SECONDS'])
+        ),
+        'reset': reset,
+    }
+    deleted = {key: [] for key in MODEL_KEYS.values()}
+    for model, key in MODEL_KEYS.items():
+        queryset = model.objects.filter(user=user)
+        if not reset:
+            queryset = queryset.filter(updated_at__gte=since)
+        data[key] = read_rows(model, queryset)
+
+    if not reset:
+        keys = {
+            model._meta.label_lower: key for model, key in MODEL_KEYS.items()
+        }
+        tombstones = Tombstone.objects.filter(
+            user=user, deleted_at__gte=since
+        ).values_list('model', 'object_id')
+        for label, pk in tombstones:
+            if label in keys:
+                deleted[keys[label]].append(pk)
+    data['deleted'] = deleted
+    return data
+
+
+def prune_tombstones():
+    """
+    Deletes the tombstones older than the retention period
+    :return: number of deleted tombstones
+    """
+    days = get_options()['RETENTION_DAYS']
+    return Tombstone.objects.filter(
+        deleted_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()[0]
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+
+from django.utils import timezone
+
+from core.models import ImportJob, Recipe
+from core.taskqueue import task
+from . import images
+from .importer import RecipeImporter
+
+
+@task()
+def import_recipes(job_id):
+    """
+    Imports the uploaded file of an import job. A retry resumes after the
+    last committed batch and the file is deleted once imported.
+    :param job_id: id of the ImportJob
+    :return: dictionary with the imported and rejected counts
+    """
+    job = ImportJob.objects.select_related('user').get(pk=job_id)
+    if job.status != ImportJob.STATUS_COMPLETED:
+        importer = RecipeImporter(job)
+        with job.file.open('rb') as f:
+            stream = io.TextIOWrapper(f.file, encoding='utf-8-sig',
+                                      newline='')
+            try:
+                job = importer.run(stream)
+            except (UnicodeDecodeError, csv.Error) as exc:
+                # Retrying doesn't fix an unreadable file
+                job = importer.job
+                errors = json.loads(job.errors)
+                errors.append({'record': job.position + 1,
+                               'error': str(exc)})
+                job.errors = json.dumps(errors)
+                job.save(update_fields=['errors', 'updated_at'])
+            finally:
+                stream.detach()
+
+    if job.status == ImportJob.STATUS_COMPLETED and job.file:
+        job.file.delete(save=False)
+        job.save(update_fields=['file', 'updated_at'])
+    return {'imported': job.imported, 'rejected': job.rejected}
+
+
+@task()
+def make_image_variants(recipe_id, name):
+    """
+    Generates the resized variants of an uploaded recipe image. They are
+    discarded if the image was replaced or the recipe deleted meanwhile.
+    :param recipe_id: id of the Recipe
+    :param name: storage name of the uploaded image
+    :return: dictionary of variant name to storage name
+    """
+    storage = Recipe._meta.get_field('image').storage
+    if not Recipe.objects.filter(pk=recipe_id, image=name).exists():
+        return {}
+    variants = images.make_variants(storage, name)
+    updated = Recipe.objects.filter(pk=recipe_id, image=name).update(
+        image_variants=json.dumps(variants), updated_at=timezone.now()
+    )
+    if not updated:
+        images.delete_files(storage, name, variants)
+        return {}
+    return variants
@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .. import autocomplete
+from ..cache import bump_version
+from core.models import Ingredient
+
+
+class PrefixIndexCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return [{'id': 1, 'name': 'Salt', 'recipe_count': 0}]
+
+    @override_settings(RECIPE_AUTOCOMPLETE_TTL=60)
+    @mock.patch('recipe.autocomplete.time.monotonic')
+    def test_index_rebuilt_after_ttl(self, monotonic):
+        """
+        Test an index is reused until its TTL passes
+        :return: None
+        """
+        monotonic.return_value = 1000.0
+        autocomplete.get_index(Ingredient, 1001, self.load)
+        monotonic.return_value = 1059.0
+        autocomplete.get_index(Ingredient, 1001, self.load)
+
+        self.assertEqual(self.loads, 1)
+
+        monotonic.return_value = 1060.0
+        autocomplete.get_index(Ingredient, 1001, self.load)
+
+        self.assertEqual(self.loads, 2)
+
+    def test_index_rebuilt_on_version_change(self):
+        """
+        Test an index is rebuilt once the user's list version changed
+        :return: None
+        """
+        autocomplete.get_index(Ingredient, 1002, self.load)
+        bump_version(Ingredient, 1002)
+        autocomplete.get_index(Ingredient, 1002, self.load)
+
+        self.assertEqual(self.loads, 2)
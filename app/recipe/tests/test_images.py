@@ -0,0 +1,259 @@
+import io
+import json
+import os
+import struct
+import tempfile
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.taskqueue import Worker
+
+
+def image_url(recipe_id):
+    return reverse('recipe:recipe-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_image(size=(1200, 900), image_format='JPEG', mode='RGB'):
+    content = io.BytesIO()
+    Image.new(mode, size, 'red').save(content, image_format)
+    return SimpleUploadedFile('photo.' + image_format.lower(),
+                              content.getvalue())
+
+
+def write_multipart_bmp(f, width, height):
+    """
+    Writes a multipart body holding an uncompressed BMP image of the given
+    size, a row at a time
+    """
+    row_size = (width * 3 + 3) // 4 * 4
+    f.write((
+        '--%s\r\nContent-Disposition: form-data; name="image"; '
+        'filename="large.bmp"\r\nContent-Type: image/bmp\r\n\r\n' % BOUNDARY
+    ).encode())
+    f.write(b'BM' + struct.pack('<IHHI', 54 + row_size * height, 0, 0, 54))
+    f.write(struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0,
+                        row_size * height, 2835, 2835, 0, 0))
+    row = b'\x80' * row_size
+    for _ in range(height):
+        f.write(row)
+    f.write(('\r\n--%s--\r\n' % BOUNDARY).encode())
+
+
+class RecipeImageTests(TestCase):
+    def setUp(self) -> None:
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.media_root = media.name
+
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Cheesecake', time_minutes=60, price=8
+        )
+
+    def upload(self, upload):
+        return self.client.post(image_url(self.recipe.id), {'image': upload},
+                                format='multipart')
+
+    def media_files(self, directory):
+        path = os.path.join(self.media_root, directory)
+        return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+    def test_upload_image_generates_variants(self):
+        """
+        Test uploading an image stores it and queues its variants
+        :return: None
+        """
+        res = self.upload(sample_image())
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(list(res.data['image']), ['original'])
+        self.recipe.refresh_from_db()
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+
+        self.assertEqual(Worker().run_pending(), 1)
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(sorted(res.data['image']),
+                         ['medium', 'original', 'thumbnail'])
+        res = self.client.get(res.data['image']['thumbnail'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        with Image.open(io.BytesIO(b''.join(res.streaming_content))) as img:
+            self.assertEqual(img.size, (150, 113))
+
+    def test_transparent_variants_kept_as_png(self):
+        """
+        Test variants of images with transparency are saved as PNG
+        :return: None
+        """
+        self.upload(sample_image(image_format='PNG', mode='RGBA'))
+        Worker().run_pending()
+
+        self.recipe.refresh_from_db()
+        res = self.client.get(image_url(self.recipe.id),
+                              {'variant': 'thumbnail'})
+        self.assertEqual(res['Content-Type'], 'image/png')
+
+    def test_upload_invalid_image(self):
+        """
+        Test uploading a file that isn't an image fails
+        :return: None
+        """
+        upload = SimpleUploadedFile('photo.jpg', b'not an image')
+
+        res = self.upload(upload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.media_files('recipes'), [])
+
+    @override_settings(RECIPE_IMAGES={'MAX_UPLOAD_SIZE': 100})
+    def test_upload_too_large(self):
+        """
+        Test uploading an image over the size limit fails
+        :return: None
+        """
+        res = self.upload(sample_image())
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_replace_image_deletes_previous(self):
+        """
+        Test a new image replaces the previous one and its variants
+        :return: None
+        """
+        self.upload(sample_image())
+        Worker().run_pending()
+
+        self.upload(sample_image(size=(300, 300)))
+        Worker().run_pending()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.media_files('recipes'),
+                         [os.path.basename(self.recipe.image.name),
+                          'variants'])
+        self.assertEqual(len(self.media_files('recipes/variants')), 2)
+
+    def test_replaced_image_variants_skipped(self):
+        """
+        Test variants of an image replaced before they were generated are
+        skipped
+        :return: None
+        """
+        self.upload(sample_image())
+        self.upload(sample_image())
+
+        self.assertEqual(Worker().run_pending(), 2)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(len(self.media_files('recipes/variants')), 2)
+        self.assertEqual(sorted(json.loads(self.recipe.image_variants)),
+                         ['medium', 'thumbnail'])
+
+    def test_delete_recipe_deletes_images(self):
+        """
+        Test deleting a recipe deletes its image files
+        :return: None
+        """
+        self.upload(sample_image())
+        Worker().run_pending()
+
+        self.client.delete(detail_url(self.recipe.id))
+
+        self.assertEqual(self.media_files('recipes'), ['variants'])
+        self.assertEqual(self.media_files('recipes/variants'), [])
+
+    def test_image_cache_headers(self):
+        """
+        Test versioned image URLs are cached for good and others are
+        revalidated with their ETag
+        :return: None
+        """
+        res = self.upload(sample_image())
+        url = res.data['image']['original']
+
+        res = self.client.get(url)
+        self.assertEqual(res['Cache-Control'],
+                         'private, max-age=31536000, immutable')
+
+        res = self.client.get(image_url(self.recipe.id))
+        self.assertEqual(res['Cache-Control'], 'private, no-cache')
+        res = self.client.get(image_url(self.recipe.id),
+                              HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_missing_variant(self):
+        """
+        Test a variant that isn't generated yet isn't found
+        :return: None
+        """
+        self.upload(sample_image())
+
+        res = self.client.get(image_url(self.recipe.id),
+                              {'variant': 'thumbnail'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_recipe_image(self):
+        """
+        Test images can't be uploaded to other users' recipes
+        :return: None
+        """
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        recipe = Recipe.objects.create(
+            user=other, title='Steak', time_minutes=20, price=10
+        )
+
+        res = self.client.post(image_url(recipe.id),
+                               {'image': sample_image()},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_large_upload_memory_flat(self):
+        """
+        Test a 50MB upload is streamed to disk, not held in memory
+        :return: None
+        """
+        with tempfile.TemporaryFile() as body:
+            write_multipart_bmp(body, 4096, 4096)
+            size = body.tell()
+            body.seek(0)
+            self.assertGreater(size, 48 * 1024 * 1024)
+
+            tracemalloc.start()
+            try:
+                res = self.client.generic(
+                    'POST', image_url(self.recipe.id),
+                    content_type=MULTIPART_CONTENT,
+                    CONTENT_LENGTH=str(size), **{'wsgi.input': body}
+                )
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.image.size, 48 * 1024 * 1024)
+        self.assertLess(peak, 4 * 1024 * 1024)
@@ -0,0 +1,339 @@
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe, ImportJob
+from core.taskqueue import Worker
+from ..importer import RecipeImporter
+
+IMPORT_URL = reverse('recipe:recipe-import')
+
+
+def job_url(job_id):
+    return reverse('recipe:importjob-detail', args=[job_id])
+
+
+CSV_DATA = (
+    'title,time_minutes,price,link,tags,ingredients\n'
+    'Thai curry,30,12.50,,Dinner;Spicy,Chicken;Coconut milk\n'
+    'Cheesecake,60,8,,"Dessert;""Sweet; rich""",Cheese\n'
+    ',10,5.00,,,\n'
+    'Pancakes,abc,5.00,,,\n'
+    'Steak,20,1000.00,,,\n'
+)
+
+
+def ndjson(*records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+class RecipeImporterTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+
+    def run_import(self, data, import_format='csv', **kwargs):
+        job = ImportJob.objects.create(user=self.user, format=import_format)
+        importer = RecipeImporter(job, **kwargs)
+        importer.run(io.StringIO(data))
+        return importer
+
+    def test_import_csv(self):
+        """
+        Test importing recipes from CSV, skipping invalid rows
+        :return: None
+        """
+        importer = self.run_import(CSV_DATA)
+
+        job = importer.job
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual((job.position, job.imported, job.rejected),
+                         (5, 2, 3))
+        self.assertEqual([error['record'] for error in importer.errors],
+                         [3, 4, 5])
+        curry = Recipe.objects.get(title='Thai curry')
+        self.assertEqual(curry.price, Decimal('12.50'))
+        self.assertEqual(sorted(t.name for t in curry.tags.all()),
+                         ['Dinner', 'Spicy'])
+        cheesecake = Recipe.objects.get(title='Cheesecake')
+        self.assertEqual(sorted(t.name for t in cheesecake.tags.all()),
+                         ['Dessert', 'Sweet; rich'])
+
+    def test_import_reuses_existing_names(self):
+        """
+        Test existing tags are linked and their recipe counts updated
+        :return: None
+        """
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        Tag.objects.create(user=other, name='Spicy')
+
+        self.run_import(ndjson(
+            {'title': 'Curry', 'time_minutes': 30, 'price': 5.5,
+             'tags': ['Dinner', 'Spicy', 'Dinner']},
+            {'title': 'Stew', 'time_minutes': 90, 'price': '7.00',
+             'tags': [{'name': 'Dinner'}], 'ingredients': ['Beef']},
+        ), 'ndjson')
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 2)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            Tag.objects.get(user=self.user, name='Spicy').recipe_count, 1
+        )
+        self.assertEqual(Ingredient.objects.get(name='Beef').recipe_count, 1)
+
+    def test_import_exported_recipes(self):
+        """
+        Test an export can be imported back
+        :return: None
+        """
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=5, price=5
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+        # Each import doubles the recipes: 1 + 1 (CSV) + 2 (NDJSON)
+        for export_type in ('csv', 'ndjson'):
+            res = client.get(reverse('recipe:recipe-export'),
+                             {'type': export_type})
+            data = b''.join(res.streaming_content).decode('utf-8')
+
+            self.run_import(data, export_type)
+
+        self.assertEqual(
+            Recipe.objects.filter(title='Curry', tags__name='Dinner').count(),
+            4
+        )
+        self.assertEqual(Tag.objects.get(name='Dinner').recipe_count, 4)
+
+    def test_import_resume(self):
+        """
+        Test a failed import resumes after its last committed batch
+        :return: None
+        """
+        data = ndjson(*[
+            {'title': 'Recipe %d' % i, 'time_minutes': i, 'price': 1}
+            for i in range(5)
+        ])
+        job = ImportJob.objects.create(user=self.user, format='ndjson')
+        importer = RecipeImporter(job, batch_size=2)
+        original = RecipeImporter.insert
+        calls = []
+
+        def failing_insert(self, records):
+            calls.append(records)
+            if len(calls) == 2:
+                raise RuntimeError('Connection lost')
+            original(self, records)
+
+        with mock.patch.object(RecipeImporter, 'insert', failing_insert):
+            with self.assertRaises(RuntimeError):
+                importer.run(io.StringIO(data))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertEqual(job.position, 2)
+
+        RecipeImporter(job, batch_size=2).run(io.StringIO(data))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual(job.imported, 5)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('time_minutes', flat=True)),
+            [0, 1, 2, 3, 4]
+        )
+
+
+class ImportCommandTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write(CSV_DATA)
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def test_import_recipes_command(self):
+        """
+        Test the command imports a file for a user
+        :return: None
+        """
+        out = io.StringIO()
+        call_command('import_recipes', self.path, email='test@gmail.com',
+                     stdout=out)
+
+        self.assertIn('Imported 2 recipes, rejected 3', out.getvalue())
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_import_recipes_completed_job(self):
+        """
+        Test a completed job can't be resumed
+        :return: None
+        """
+        job = ImportJob.objects.create(
+            user=self.user, format='csv', status=ImportJob.STATUS_COMPLETED
+        )
+
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', self.path, job=job.pk,
+                         stdout=io.StringIO())
+
+
+class ImportApiTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.media_root = media.name
+
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, data=CSV_DATA, **extra):
+        upload = SimpleUploadedFile('recipes.csv', data.encode('utf-8'))
+        return self.client.post(IMPORT_URL, dict(file=upload, **extra),
+                                format='multipart')
+
+    def test_upload_recipes(self):
+        """
+        Test uploading a CSV file queues its import
+        :return: None
+        """
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], ImportJob.STATUS_QUEUED)
+        self.assertFalse(Recipe.objects.exists())
+
+        self.assertEqual(Worker().run_pending(), 1)
+
+        res = self.client.get(job_url(res.data['id']))
+        self.assertEqual(res.data['status'], ImportJob.STATUS_COMPLETED)
+        self.assertEqual(res.data['imported'], 2)
+        self.assertEqual(res.data['rejected'], 3)
+        self.assertEqual(len(res.data['errors']), 3)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(ImportJob.objects.get().file)
+        self.assertEqual(os.listdir(os.path.join(self.media_root,
+                                                 'imports')), [])
+
+    def test_upload_invalidates_tag_list(self):
+        """
+        Test imported tags show up in the cached tag list
+        :return: None
+        """
+        tags_url = reverse('recipe:tag-list')
+        self.client.get(tags_url)
+
+        self.upload()
+        Worker().run_pending()
+
+        res = self.client.get(tags_url)
+        self.assertEqual(len(res.data), 4)
+
+    def test_upload_unknown_format(self):
+        """
+        Test uploading a file without a known format fails
+        :return: None
+        """
+        upload = SimpleUploadedFile('recipes.txt', b'title\n')
+
+        res = self.client.post(IMPORT_URL, {'file': upload},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_resume_failed_import(self):
+        """
+        Test a failed import resumes with its kept file
+        :return: None
+        """
+        with override_settings(TASK_QUEUE={'MAX_RETRIES': 0}):
+            res = self.upload()
+        job = ImportJob.objects.get(pk=res.data['id'])
+        with mock.patch.object(RecipeImporter, 'insert',
+                               side_effect=RuntimeError('Connection lost')):
+            with self.assertLogs('core.taskqueue', 'ERROR'):
+                Worker().run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertTrue(job.file)
+
+        res = self.client.post(IMPORT_URL, {'job': job.pk},
+                               format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        Worker().run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_COMPLETED)
+        self.assertEqual(job.imported, 2)
+
+    def test_resume_queued_import(self):
+        """
+        Test a queued import can't be queued again
+        :return: None
+        """
+        res = self.upload()
+
+        res = self.client.post(IMPORT_URL, {'job': res.data['id']},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_resume_other_users_job(self):
+        """
+        Test jobs of other users can't be resumed
+        :return: None
+        """
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        job = ImportJob.objects.create(user=other, format='csv')
+
+        res = self.upload(job=job.pk)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_imports_limited_to_user(self):
+        """
+        Test only the user's import jobs are listed
+        :return: None
+        """
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        ImportJob.objects.create(user=other, format='csv')
+        job = ImportJob.objects.create(user=self.user, format='csv')
+
+        res = self.client.get(reverse('recipe:importjob-list'))
+
+        self.assertEqual([item['id'] for item in res.data], [job.pk])
@@ -1,14 +1,17 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.core.cache import cache
 from django.test import TestCase
 
 from ..serializers import IngredientSerializer
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+INGREDIENTS_BULK_URL = reverse('recipe:ingredient-bulk')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
 
 
 class PublicIngredientsApiTests(TestCase):
@@ -33,6 +36,7 @@ class PrivateIngredientsApiTests(TestCase):
     Tests ingredient APIS with authenticated user
     """
     def setUp(self) -> None:
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             email='test@gmail.com',
             password='test123'
@@ -99,3 +103,165 @@ class PrivateIngredientsApiTests(TestCase):
         res = self.client.post(INGREDIENTS_URL, {'name': ''})
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_ingredients_paginated(self):
+        """
+        Test the first page of ingredients links to the next one
+        :return: None
+        """
+        Ingredient.objects.create(user=self.user, name='Kale')
+        Ingredient.objects.create(user=self.user, name='Spinach')
+
+        res = self.client.get(INGREDIENTS_URL, {'page_size': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], 'Spinach')
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.data['results'][0]['name'], 'Kale')
+        self.assertIsNone(res.data['next'])
+
+    def test_bulk_create_ingredients_query_count(self):
+        """
+        Test a batch of ingredients is inserted with a fixed number of
+        queries regardless of its size
+        :return: None
+        """
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        for count in (10, 300):
+            names = ['Salt'] + ['Ingredient %d-%d' % (count, i)
+                                for i in range(count)]
+            with self.assertNumQueries(5):
+                res = self.client.post(
+                    INGREDIENTS_BULK_URL, {'names': names}, format='json'
+                )
+
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['created']), count)
+            self.assertEqual(len(res.data['existing']), 1)
+
+    def test_retrieve_ingredients_assigned_to_recipes(self):
+        """
+        Test filtering ingredients by those assigned to recipes
+        :return: None
+        """
+        ingredient1 = Ingredient.objects.create(user=self.user, name='Apples')
+        ingredient2 = Ingredient.objects.create(user=self.user, name='Turkey')
+        for title in ('Eggs on toast', 'Porridge'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=10,
+                user=self.user
+            )
+            recipe.ingredients.add(ingredient1)
+
+        res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(
+            res.data,
+            [{
+                'id': ingredient1.id,
+                'name': ingredient1.name,
+                'recipe_count': 2,
+            }]
+        )
+        self.assertNotIn(ingredient2.id, [item['id'] for item in res.data])
+
+    def test_retrieve_ingredients_assigned_invalidated(self):
+        """
+        Test the assigned_only list changes when a recipe is linked
+        :return: None
+        """
+        ingredient = Ingredient.objects.create(user=self.user, name='Apples')
+        self.assertEqual(
+            self.client.get(INGREDIENTS_URL, {'assigned_only': 1}).data, []
+        )
+        recipe = Recipe.objects.create(
+            title='Porridge', time_minutes=5, price=10, user=self.user
+        )
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_retrieve_ingredients_assigned_invalid(self):
+        """
+        Test an invalid assigned_only value is rejected
+        :return: None
+        """
+        res = self.client.get(INGREDIENTS_URL, {'assigned_only': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_ingredients(self):
+        """
+        Test ingredients starting with a prefix are returned ignoring
+        case, the most used first
+        :return: None
+        """
+        chicken = Ingredient.objects.create(user=self.user, name='Chicken')
+        chickpeas = Ingredient.objects.create(user=self.user,
+                                              name='chickpeas')
+        chili = Ingredient.objects.create(user=self.user, name='Chili')
+        Ingredient.objects.create(user=self.user, name='Rice')
+        Ingredient.objects.create(
+            user=get_user_model().objects.create_user(
+                'other@gmail.com', 'test123'
+            ),
+            name='Chives'
+        )
+        recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=30, price=10
+        )
+        recipe.ingredients.add(chili)
+
+        res = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL, {'q': 'CHI'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data],
+                         [chili.id, chicken.id, chickpeas.id])
+
+        res = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL,
+                              {'q': 'chi', 'limit': 1})
+        self.assertEqual([item['name'] for item in res.data], ['Chili'])
+
+    def test_autocomplete_invalidated_on_create(self):
+        """
+        Test a created ingredient shows up in cached autocomplete answers
+        :return: None
+        """
+        Ingredient.objects.create(user=self.user, name='Salt')
+        self.client.get(INGREDIENTS_AUTOCOMPLETE_URL, {'q': 's'})
+
+        self.client.post(INGREDIENTS_URL, {'name': 'Sugar'})
+
+        res = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL, {'q': 's'})
+        self.assertEqual([item['name'] for item in res.data],
+                         ['Salt', 'Sugar'])
+
+    def test_autocomplete_escapes_wildcards(self):
+        """
+        Test LIKE wildcards in the prefix are matched literally
+        :return: None
+        """
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL, {'q': '%a'})
+
+        self.assertEqual(res.data, [])
+
+    def test_autocomplete_invalid_limit(self):
+        """
+        Test the number of autocomplete matches is bounded
+        :return: None
+        """
+        for limit in ('0', 'a', '51'):
+            res = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL,
+                                  {'q': 's', 'limit': limit})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
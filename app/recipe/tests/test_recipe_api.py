@@ -0,0 +1,522 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from ..serializers import RecipeDetailSerializer
+from ..views import RecipeViewSet
+from core.models import Recipe, Tag, Ingredient
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """
+    Returns the recipe detail url
+    :param recipe_id: id of the recipe
+    :return: url
+    """
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_tag(user, name='Main course'):
+    return Tag.objects.create(user=user, name=name)
+
+
+def sample_ingredient(user, name='Cinnamon'):
+    return Ingredient.objects.create(user=user, name=name)
+
+
+def sample_recipe(user, **params):
+    """
+    Creates a sample recipe
+    :param user: owner of the recipe
+    :param params: fields overriding the defaults
+    :return: Recipe object
+    """
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicRecipeApiTests(TestCase):
+    """
+    Tests for unauthenticated recipe API access
+    """
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """
+        Test that authentication is required
+        :return: None
+        """
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeApiTests(TestCase):
+    """
+    Tests for authenticated recipe API access
+    """
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_retrieve_recipes(self):
+        """
+        Test retrieving a list of recipes
+        :return: None
+        """
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        recipe.ingredients.add(sample_ingredient(user=self.user))
+        sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL)
+
+        recipes = Recipe.objects.all().order_by('-id')
+        serializer = RecipeDetailSerializer(recipes, many=True)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, serializer.data)
+
+    def test_recipes_limited_to_user(self):
+        """
+        Test retrieving recipes for the authenticated user only
+        :return: None
+        """
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        sample_recipe(user=other)
+        sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_view_recipe_detail(self):
+        """
+        Test viewing a recipe detail with nested tags and ingredients
+        :return: None
+        """
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        recipe.ingredients.add(sample_ingredient(user=self.user))
+
+        res = self.client.get(detail_url(recipe.id))
+
+        serializer = RecipeDetailSerializer(recipe)
+        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['tags'][0]['name'], 'Main course')
+
+    def test_list_query_count_constant(self):
+        """
+        Test listing recipes runs the same number of queries for any
+        number of recipes
+        :return: None
+        """
+        tags = [sample_tag(self.user, 'Tag %d' % i) for i in range(3)]
+        ingredients = [
+            sample_ingredient(self.user, 'Ingredient %d' % i)
+            for i in range(3)
+        ]
+
+        for count in (1, 5, 20):
+            while Recipe.objects.filter(user=self.user).count() < count:
+                recipe = sample_recipe(user=self.user)
+                recipe.tags.add(*tags)
+                recipe.ingredients.add(*ingredients)
+
+            with self.assertNumQueries(3):
+                res = self.client.get(RECIPES_URL)
+
+            self.assertEqual(len(res.data), count)
+
+    def test_create_basic_recipe(self):
+        """
+        Test creating a recipe
+        :return: None
+        """
+        payload = {
+            'title': 'Chocolate cheesecake',
+            'time_minutes': 30,
+            'price': '5.00',
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.title, payload['title'])
+        self.assertEqual(recipe.time_minutes, payload['time_minutes'])
+        self.assertEqual(recipe.price, Decimal(payload['price']))
+
+    def test_create_recipe_with_tags_and_ingredients(self):
+        """
+        Test creating a recipe with tags and ingredients
+        :return: None
+        """
+        tag = sample_tag(user=self.user, name='Dessert')
+        ingredient = sample_ingredient(user=self.user, name='Ginger')
+        payload = {
+            'title': 'Ginger cheesecake',
+            'tags': [tag.id],
+            'ingredients': [ingredient.id],
+            'time_minutes': 60,
+            'price': '20.00',
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(list(recipe.tags.all()), [tag])
+        self.assertEqual(list(recipe.ingredients.all()), [ingredient])
+
+    def test_create_recipe_with_other_users_tag(self):
+        """
+        Test a recipe can't reference tags of another user
+        :return: None
+        """
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        tag = sample_tag(user=other)
+        payload = {
+            'title': 'Thai curry',
+            'tags': [tag.id],
+            'time_minutes': 20,
+            'price': '7.00',
+        }
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_partial_update_recipe(self):
+        """
+        Test updating a recipe with patch
+        :return: None
+        """
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        new_tag = sample_tag(user=self.user, name='Curry')
+
+        payload = {'title': 'Chicken tikka', 'tags': [new_tag.id]}
+        self.client.patch(detail_url(recipe.id), payload)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, payload['title'])
+        self.assertEqual(list(recipe.tags.all()), [new_tag])
+
+    def test_delete_recipe(self):
+        """
+        Test deleting a recipe
+        :return: None
+        """
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.delete(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_filter_recipes_by_tags(self):
+        """
+        Test returning recipes with any of the given tags
+        :return: None
+        """
+        recipe1 = sample_recipe(user=self.user, title='Thai curry')
+        recipe2 = sample_recipe(user=self.user, title='Aubergine tahini')
+        recipe3 = sample_recipe(user=self.user, title='Fish and chips')
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Vegetarian')
+        recipe1.tags.add(tag1)
+        recipe2.tags.add(tag1, tag2)
+
+        res = self.client.get(
+            RECIPES_URL, {'tags': '%d,%d' % (tag1.id, tag2.id)}
+        )
+
+        ids = [recipe['id'] for recipe in res.data]
+        self.assertEqual(ids, [recipe2.id, recipe1.id])
+        self.assertNotIn(recipe3.id, ids)
+
+    def test_filter_recipes_by_tags_and_ingredients(self):
+        """
+        Test tag and ingredient filters are combined
+        :return: None
+        """
+        recipe1 = sample_recipe(user=self.user, title='Posh beans on toast')
+        recipe2 = sample_recipe(user=self.user, title='Chicken cacciatore')
+        tag = sample_tag(user=self.user, name='Dinner')
+        ingredient = sample_ingredient(user=self.user, name='Chicken')
+        recipe1.tags.add(tag)
+        recipe2.tags.add(tag)
+        recipe2.ingredients.add(ingredient)
+
+        res = self.client.get(RECIPES_URL, {
+            'tags': str(tag.id),
+            'ingredients': str(ingredient.id),
+        })
+
+        self.assertEqual([recipe['id'] for recipe in res.data], [recipe2.id])
+
+    def test_filter_recipes_invalid_ids(self):
+        """
+        Test filtering with ids that are not numbers fails
+        :return: None
+        """
+        res = self.client.get(RECIPES_URL, {'tags': '1,abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes_by_title(self):
+        """
+        Test searching recipes by a case insensitive part of the title
+        :return: None
+        """
+        recipe = sample_recipe(user=self.user, title='Chicken Tikka')
+        sample_recipe(user=self.user, title='Beef stew')
+
+        res = self.client.get(RECIPES_URL, {'search': 'tikk'})
+
+        self.assertEqual([r['id'] for r in res.data], [recipe.id])
+
+    def test_retrieve_recipes_paginated(self):
+        """
+        Test walking the recipes list with cursor pagination
+        :return: None
+        """
+        recipes = [sample_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        ids = [recipe['id'] for recipe in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids.extend(recipe['id'] for recipe in res.data['results'])
+
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_export_recipes_ndjson(self):
+        """
+        Test exporting recipes as one JSON object per line
+        :return: None
+        """
+        recipe = sample_recipe(user=self.user, price=Decimal('5.5'))
+        recipe.tags.add(sample_tag(user=self.user),
+                        sample_tag(user=self.user, name='Dessert'))
+        recipe.ingredients.add(sample_ingredient(user=self.user))
+        sample_recipe(user=self.user, title='Plain')
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        sample_recipe(user=other)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode('utf-8').splitlines()
+        listed = self.client.get(RECIPES_URL, {'format': 'json'})
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            list(reversed(json.loads(listed.content.decode('utf-8'))))
+        )
+
+    def test_export_recipes_csv(self):
+        """
+        Test exporting recipes as CSV with name lists in single cells
+        :return: None
+        """
+        recipe = sample_recipe(user=self.user, title='Curry, hot')
+        recipe.tags.add(sample_tag(user=self.user, name='Spicy; hot'),
+                        sample_tag(user=self.user, name='Dinner'))
+
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        content = b''.join(res.streaming_content).decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Curry, hot')
+        self.assertEqual(rows[0]['price'], '5.00')
+        self.assertEqual(
+            next(csv.reader([rows[0]['tags']], delimiter=';')),
+            ['Dinner', 'Spicy; hot']
+        )
+        self.assertEqual(rows[0]['ingredients'], '')
+
+    def test_export_recipes_query_per_chunk(self):
+        """
+        Test the export reads each chunk of recipes after the last id of
+        the previous one, and their tags and ingredients, in one query each
+        :return: None
+        """
+        tag = sample_tag(user=self.user)
+        recipes = []
+        for _ in range(5):
+            recipes.append(sample_recipe(user=self.user))
+            recipes[-1].tags.add(tag)
+
+        with mock.patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            res = self.client.get(EXPORT_URL)
+            with self.assertNumQueries(3 * 3 + 1):
+                lines = b''.join(res.streaming_content).splitlines()
+
+        self.assertEqual([json.loads(line)['id'] for line in lines],
+                         [recipe.id for recipe in recipes])
+
+    def test_export_recipes_invalid_type(self):
+        """
+        Test exporting in an unknown format fails
+        :return: None
+        """
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_shopping_list(self):
+        """
+        Test the ingredients of the selected recipes are merged with the
+        number of recipes using each, in one query
+        :return: None
+        """
+        flour = sample_ingredient(self.user, 'Flour')
+        eggs = sample_ingredient(self.user, 'Eggs')
+        salt = sample_ingredient(self.user, 'Salt')
+        pancakes = sample_recipe(user=self.user, title='Pancakes')
+        pancakes.ingredients.add(flour, eggs)
+        bread = sample_recipe(user=self.user, title='Bread')
+        bread.ingredients.add(flour, salt)
+        sample_recipe(user=self.user, title='Omelette').ingredients.add(eggs)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SHOPPING_LIST_URL, {
+                'recipes': '%d,%d,%d' % (pancakes.id, bread.id, bread.id)
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': eggs.id, 'name': 'Eggs', 'count': 1},
+            {'id': flour.id, 'name': 'Flour', 'count': 2},
+            {'id': salt.id, 'name': 'Salt', 'count': 1},
+        ])
+
+    def test_shopping_list_other_users_recipes(self):
+        """
+        Test recipes of other users are left out of the shopping list
+        :return: None
+        """
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        recipe = sample_recipe(user=other)
+        recipe.ingredients.add(sample_ingredient(other))
+
+        res = self.client.get(SHOPPING_LIST_URL, {'recipes': recipe.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_shopping_list_invalid_recipes(self):
+        """
+        Test the shopping list requires a bounded list of recipe ids
+        :return: None
+        """
+        too_many = ','.join(str(pk) for pk in range(1, 502))
+        for recipes in ('', 'a,b', too_many):
+            res = self.client.get(SHOPPING_LIST_URL, {'recipes': recipes})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_similar_recipes(self):
+        """
+        Test recipes are ranked by the Jaccard similarity of their tags
+        and ingredients
+        :return: None
+        """
+        dinner, spicy = sample_tag(self.user, 'Dinner'), \
+            sample_tag(self.user, 'Spicy')
+        rice, chicken, egg = [
+            sample_ingredient(self.user, name)
+            for name in ('Rice', 'Chicken', 'Egg')
+        ]
+        curry = sample_recipe(user=self.user, title='Curry')
+        curry.tags.add(dinner, spicy)
+        curry.ingredients.add(rice, chicken)
+        stir_fry = sample_recipe(user=self.user, title='Stir fry')
+        stir_fry.tags.add(dinner, spicy)
+        stir_fry.ingredients.add(rice, egg)
+        omelette = sample_recipe(user=self.user, title='Omelette')
+        omelette.ingredients.add(egg)
+        risotto = sample_recipe(user=self.user, title='Risotto')
+        risotto.tags.add(dinner)
+        risotto.ingredients.add(rice)
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        sample_recipe(user=other)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(similar_url(curry.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': stir_fry.id, 'title': 'Stir fry', 'score': 0.6},
+            {'id': risotto.id, 'title': 'Risotto', 'score': 0.5},
+        ])
+
+    def test_similar_recipes_follow_changes(self):
+        """
+        Test the ranking follows changed tags and ingredients
+        :return: None
+        """
+        tag = sample_tag(self.user)
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag)
+        other = sample_recipe(user=self.user, title='Other')
+
+        self.assertEqual(self.client.get(similar_url(recipe.id)).data, [])
+
+        other.tags.add(tag)
+        other.ingredients.add(sample_ingredient(self.user))
+        res = self.client.get(similar_url(recipe.id), {'limit': 1})
+        self.assertEqual(res.data[0]['score'], 0.5)
+
+        other.ingredients.clear()
+        res = self.client.get(similar_url(recipe.id))
+        self.assertEqual(res.data[0]['score'], 1)
+
+    def test_similar_recipes_invalid_limit(self):
+        """
+        Test the number of similar recipes is bounded
+        :return: None
+        """
+        recipe = sample_recipe(user=self.user)
+
+        for limit in ('0', 'a', '101'):
+            res = self.client.get(similar_url(recipe.id), {'limit': limit})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,264 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.urls import reverse
+from django.test import TestCase
+from django.utils import timezone
+
+from ..sync import encode_cursor
+from core.models import Recipe, Tag, Ingredient, Tombstone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SYNC_URL = reverse('recipe:sync-list')
+
+
+def sample_recipe(user, **params):
+    """
+    Creates a sample recipe
+    :param user: owner of the recipe
+    :param params: fields overriding the defaults
+    :return: Recipe object
+    """
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def backdate(user):
+    """
+    Marks the objects of a user as saved an hour ago
+    :param user: owner of the objects
+    :return: None
+    """
+    for model in (Tag, Ingredient, Recipe):
+        model.objects.filter(user=user).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+
+class PublicSyncApiTests(TestCase):
+    """
+    Tests for unauthenticated sync API access
+    """
+    def setUp(self) -> None:
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        """
+        Test that authentication is required
+        :return: None
+        """
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSyncApiTests(TestCase):
+    """
+    Tests for authenticated sync API access
+    """
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com', 'test123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_cursor(self):
+        """
+        Syncs everything once with the objects backdated
+        :return: cursor of the next sync
+        """
+        backdate(self.user)
+        return self.client.get(SYNC_URL).data['cursor']
+
+    def test_full_sync(self):
+        """
+        Test syncing without a cursor returns every object of the user
+        :return: None
+        """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        other = get_user_model().objects.create_user(
+            'other@gmail.com', 'test123'
+        )
+        Tag.objects.create(user=other, name='Dessert')
+        sample_recipe(user=other)
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['reset'])
+        self.assertEqual(
+            res.data['tags'],
+            [{'id': tag.id, 'name': 'Vegan', 'recipe_count': 1}]
+        )
+        self.assertEqual([row['id'] for row in res.data['ingredients']],
+                         [ingredient.id])
+        self.assertEqual(len(res.data['recipes']), 1)
+        self.assertEqual(res.data['recipes'][0]['tags'], [tag.id])
+        self.assertEqual(res.data['recipes'][0]['ingredients'],
+                         [ingredient.id])
+        self.assertEqual(
+            res.data['deleted'],
+            {'tags': [], 'ingredients': [], 'recipes': []}
+        )
+
+    def test_sync_returns_changes_only(self):
+        """
+        Test syncing with a cursor returns the objects saved since
+        :return: None
+        """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+        sample_recipe(user=self.user)
+        cursor = self.get_cursor()
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.get(SYNC_URL, {'since': cursor})
+
+        self.assertFalse(res.data['reset'])
+        self.assertEqual([row['name'] for row in res.data['tags']],
+                         ['Vegetarian'])
+        self.assertEqual([row['id'] for row in res.data['ingredients']],
+                         [ingredient.id])
+        self.assertEqual(res.data['recipes'], [])
+
+    def test_sync_returns_link_changes(self):
+        """
+        Test linking a tag marks the recipe and the tag as changed
+        :return: None
+        """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = sample_recipe(user=self.user)
+        sample_recipe(user=self.user, title='Other')
+        cursor = self.get_cursor()
+
+        recipe.tags.add(tag)
+
+        res = self.client.get(SYNC_URL, {'since': cursor})
+
+        self.assertEqual([row['id'] for row in res.data['recipes']],
+                         [recipe.id])
+        self.assertEqual(res.data['recipes'][0]['tags'], [tag.id])
+        self.assertEqual(res.data['tags'][0]['recipe_count'], 1)
+
+    def test_sync_returns_deletes(self):
+        """
+        Test syncing returns the ids of the objects deleted since
+        :return: None
+        """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(tag)
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        cursor = self.get_cursor()
+
+        self.client.delete(reverse('recipe:recipe-detail', args=[recipe.id]))
+        ingredient_id = ingredient.id
+        ingredient.delete()
+
+        res = self.client.get(SYNC_URL, {'since': cursor})
+
+        self.assertEqual(
+            res.data['deleted'],
+            {'tags': [], 'ingredients': [ingredient_id],
+             'recipes': [recipe.id]}
+        )
+        self.assertEqual(
+            res.data['tags'],
+            [{'id': tag.id, 'name': 'Vegan', 'recipe_count': 0}]
+        )
+        self.assertEqual(res.data['recipes'], [])
+
+    def test_sync_expired_cursor_resets(self):
+        """
+        Test a cursor older than the tombstones kept gets a full sync
+        :return: None
+        """
+        Tag.objects.create(user=self.user, name='Vegan')
+        cursor = encode_cursor(timezone.now() - timedelta(days=365))
+
+        res = self.client.get(SYNC_URL, {'since': cursor})
+
+        self.assertTrue(res.data['reset'])
+        self.assertEqual(len(res.data['tags']), 1)
+
+    def test_sync_invalid_cursor(self):
+        """
+        Test an invalid cursor is rejected
+        :return: None
+        """
+        res = self.client.get(SYNC_URL, {'since': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_delete_leaves_no_tombstones(self):
+        """
+        Test deleting a user doesn't record the deletes of its objects
+        :return: None
+        """
+        Tag.objects.create(user=self.user, name='Vegan')
+        sample_recipe(user=self.user)
+
+        self.user.delete()
+
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_failed_user_delete_keeps_tombstones(self):
+        """
+        Test deletes after a rolled back user delete still get tombstones
+        :return: None
+        """
+        recipe = sample_recipe(user=self.user)
+
+        def fail(**kwargs):
+            raise RuntimeError('delete failed')
+
+        post_delete.connect(fail, sender=Recipe)
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.user.delete()
+        finally:
+            post_delete.disconnect(fail, sender=Recipe)
+        recipe_id = recipe.id
+        recipe.delete()
+
+        self.assertTrue(Tombstone.objects.filter(
+            user=self.user, model='core.recipe', object_id=recipe_id
+        ).exists())
+
+    def test_prune_tombstones(self):
+        """
+        Test the tombstones past the retention period are deleted
+        :return: None
+        """
+        Tombstone.objects.create(
+            user=self.user, model='core.tag', object_id=1,
+            deleted_at=timezone.now() - timedelta(days=365)
+        )
+        recent = Tombstone.objects.create(
+            user=self.user, model='core.tag', object_id=2
+        )
+
+        call_command('prune_tombstones', stdout=StringIO())
+
+        self.assertEqual(list(Tombstone.objects.all()), [recent])
@@ -1,14 +1,17 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
 from ..serializers import TagSerializer
-from core.models import Tag
+from core.models import Tag, Recipe
 
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
 
 
 class PublicTagsApiTests(TestCase):
@@ -33,6 +36,7 @@ class PrivateTagsApiTests(TestCase):
     Tests for authorized tags API
     """
     def setUp(self) -> None:
+        cache.clear()
         self.user = get_user_model().objects.create_user(
             'test@gmail.com', 'test123'
         )
@@ -100,3 +104,255 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.post(TAGS_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_tags_paginated(self):
+        """
+        Test walking the tags list with cursor pagination
+        :return: None
+        """
+        for name in ['Vegan', 'Dessert', 'Breakfast', 'Dinner', 'Asian']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        names = [tag['name'] for tag in res.data['results']]
+        pages = 1
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            names.extend(tag['name'] for tag in res.data['results'])
+            pages += 1
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(pages, 3)
+        self.assertEqual(
+            names,
+            ['Vegan', 'Dinner', 'Dessert', 'Breakfast', 'Asian']
+        )
+
+    def test_retrieve_tags_invalid_cursor(self):
+        """
+        Test an invalid cursor is rejected
+        :return: None
+        """
+        res = self.client.get(TAGS_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_creating_duplicate_tag_invalid(self):
+        """
+        Test creating a tag with a name the user already has fails
+        :return: None
+        """
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_tags(self):
+        """
+        Test creating a batch of tags dedupes against existing ones
+        :return: None
+        """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        payload = {'names': ['Vegan', 'Dessert', 'Breakfast', 'Dessert']}
+
+        res = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(t['name'] for t in res.data['created']),
+            ['Breakfast', 'Dessert']
+        )
+        self.assertEqual(
+            res.data['existing'],
+            [{'id': tag.id, 'name': tag.name, 'recipe_count': 0}]
+        )
+        created_ids = Tag.objects.filter(
+            user=self.user, name__in=['Breakfast', 'Dessert']
+        ).values_list('id', flat=True)
+        self.assertEqual(
+            sorted(t['id'] for t in res.data['created']),
+            sorted(created_ids)
+        )
+
+    def test_bulk_create_tags_existing_only(self):
+        """
+        Test a batch of names that all exist creates nothing
+        :return: None
+        """
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(
+            TAGS_BULK_URL, {'names': ['Vegan']}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], [])
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_bulk_create_tags_invalid(self):
+        """
+        Test a batch with an invalid name creates nothing
+        :return: None
+        """
+        res = self.client.post(
+            TAGS_BULK_URL, {'names': ['Vegan', '']}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_tags_list_cached(self):
+        """
+        Test an unchanged tags list is served from the cache
+        :return: None
+        """
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(TAGS_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, res.data)
+        self.assertEqual(cached['ETag'], res['ETag'])
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_tags_list_cached_per_host(self):
+        """
+        Test cached pages keep the links of the host and scheme requested
+        :return: None
+        """
+        for name in ['Vegan', 'Dessert', 'Breakfast']:
+            Tag.objects.create(user=self.user, name=name)
+
+        links = [
+            self.client.get(
+                TAGS_URL, {'page_size': 2}, HTTP_HOST=host, secure=secure
+            ).data['next']
+            for host, secure in [('a.example.com', False),
+                                 ('b.example.com', False),
+                                 ('a.example.com', True)]
+        ]
+
+        self.assertTrue(links[0].startswith('http://a.example.com/'))
+        self.assertTrue(links[1].startswith('http://b.example.com/'))
+        self.assertTrue(links[2].startswith('https://a.example.com/'))
+
+    def test_tags_list_not_modified(self):
+        """
+        Test a request with the current ETag gets a 304 without any
+        database work
+        :return: None
+        """
+        Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_tags_list_invalidated_on_create(self):
+        """
+        Test creating tags invalidates the cached list and its ETag
+        :return: None
+        """
+        etag = self.client.get(TAGS_URL)['ETag']
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in res.data], ['Vegan'])
+
+        etag = res['ETag']
+        self.client.post(TAGS_BULK_URL, {'names': ['Dessert']}, format='json')
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
+
+    def test_tags_list_invalidated_on_delete(self):
+        """
+        Test deleting a tag invalidates the cached list
+        :return: None
+        """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+        tag.delete()
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_retrieve_tags_assigned_to_recipes(self):
+        """
+        Test filtering tags by those assigned to recipes
+        :return: None
+        """
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Eggs on toast', 'Porridge'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=10,
+                user=self.user
+            )
+            recipe.tags.add(tag1)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(
+            res.data,
+            [{'id': tag1.id, 'name': tag1.name, 'recipe_count': 2}]
+        )
+        self.assertNotIn(tag2.id, [item['id'] for item in res.data])
+
+    def test_retrieve_tags_assigned_invalidated(self):
+        """
+        Test the assigned_only list changes when a recipe is linked
+        :return: None
+        """
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        self.assertEqual(
+            self.client.get(TAGS_URL, {'assigned_only': 1}).data, []
+        )
+        recipe = Recipe.objects.create(
+            title='Porridge', time_minutes=5, price=10, user=self.user
+        )
+        recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_retrieve_tags_assigned_invalid(self):
+        """
+        Test an invalid assigned_only value is rejected
+        :return: None
+        """
+        res = self.client.get(TAGS_URL, {'assigned_only': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_tags_same_schema(self):
+        """
+        Test the list response is byte for byte the serializer's output
+        :return: None
+        """
+        recipe = Recipe.objects.create(
+            user=self.user, title='Tarte', time_minutes=5, price=5
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Végan'))
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.client.get(TAGS_URL, {'format': 'json'})
+
+        tags = Tag.objects.all().order_by('-name')
+        expected = JSONRenderer().render(TagSerializer(tags, many=True).data)
+        self.assertEqual(res.content, expected)
@@ -1,10 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TagViewSet, IngredientViewSet
+from .views import TagViewSet, IngredientViewSet, RecipeViewSet, \
+    ImportJobViewSet, SyncViewSet
 
 router = DefaultRouter()
 router.register('tags', TagViewSet)
 router.register('ingredients', IngredientViewSet)
+router.register('recipes', RecipeViewSet)
+router.register('imports', ImportJobViewSet)
+router.register('sync', SyncViewSet, base_name='sync')
 
 app_name = 'recipe'
 
@@ -1,8 +1,24 @@
-from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+import os
+
+from django.db import transaction, IntegrityError
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from django.http import StreamingHttpResponse, FileResponse, Http404
+from django.utils.http import parse_etags, quote_etag
+from django.utils.translation import gettext_lazy as _
+from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
-from core.models import Tag, Ingredient
-from .serializers import TagSerializer, IngredientSerializer
+from rest_framework.response import Response
+from core.authentication import CachedTokenAuthentication
+from core.models import Tag, Ingredient, Recipe, ImportJob
+from core.throttling import TokenBucketThrottle
+from . import autocomplete, cache, export, images, similar, sync, tasks
+from .importer import guess_format
+from .pagination import KeysetCursorPagination, IdCursorPagination
+from .serializers import TagSerializer, IngredientSerializer, \
+    RecipeSerializer, RecipeDetailSerializer, BulkNamesSerializer, \
+    ImportJobSerializer, RecipeImportSerializer, RecipeImageSerializer
 
 
 class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
@@ -11,15 +27,131 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
     """
     Base class for recipe attributes view set
     """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scope = 'recipes'
+    pagination_class = KeysetCursorPagination
+    autocomplete_max_limit = 50
 
     def get_queryset(self):
         """
-        Returns objects for the current authenticated user only
+        Returns objects for the current authenticated user only. With
+        assigned_only=1 only the objects used by a recipe are returned.
         :return: List of objects
         """
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        queryset = self.queryset.filter(user=self.request.user)
+        assigned_only = self.request.query_params.get('assigned_only', '0')
+        if assigned_only not in ('0', '1'):
+            raise ValidationError(
+                {'assigned_only': [_('Expected 0 or 1.')]}
+            )
+        if assigned_only == '1':
+            queryset = self.filter_assigned(queryset)
+        return queryset.order_by('-name', '-id')
+
+    def filter_assigned(self, queryset):
+        """
+        Keeps the objects linked to at least one recipe. The EXISTS
+        semi-join stops at the first row found through the index on the
+        *_id column of the recipe M2M through table, so its cost doesn't
+        grow with the number of recipes using an object.
+        :param queryset: objects queryset
+        :return: filtered queryset
+        """
+        field = Recipe._meta.get_field(self.recipe_field)
+        used = field.remote_field.through.objects.filter(
+            **{field.m2m_reverse_name(): OuterRef('pk')}
+        )
+        return queryset.annotate(assigned=Exists(used)).filter(assigned=True)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the user's objects
+        :param request: request object
+        :return: Response
+        """
+        return self.cached_response(request, self.list_values)
+
+    def cached_response(self, request, build):
+        """
+        Answers from a per user cache that is invalidated on every write,
+        with 304 when the client's ETag is current
+        :param request: request object
+        :param build: function returning the response data on a miss
+        :return: Response
+        """
+        model = self.queryset.model
+        key, etag = cache.get_list_key(model, request, self.action)
+        headers = {'ETag': etag}
+
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+
+        list_cache = cache.get_cache()
+        data = list_cache.get(key)
+        if data is None:
+            data = build()
+            list_cache.set(key, data, cache.get_list_timeout())
+        return Response(data, headers=headers)
+
+    def list_values(self):
+        """
+        Builds the list response data from plain dictionaries read with
+        the serializer's fast read path
+        :return: list or paginated dictionary
+        """
+        queryset = self.serializer_class.read_values(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(page).data
+        return list(queryset)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Returns the user's objects whose name starts with the q parameter,
+        ignoring case, the ones used by most recipes first. Prefixes are
+        looked up in a sorted index of the names kept by each process
+        until the user's objects change, at most RECIPE_AUTOCOMPLETE_TTL
+        seconds.
+        :param request: request object
+        :return: Response
+        """
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= self.autocomplete_max_limit:
+            raise ValidationError({'limit': [
+                _('Expected a number from 1 to %d.') %
+                self.autocomplete_max_limit
+            ]})
+        prefix = request.query_params.get('q', '').strip()
+
+        def search():
+            index = autocomplete.get_index(
+                self.queryset.model, request.user.pk,
+                lambda: list(self.serializer_class.read_values(
+                    self.queryset.filter(user=request.user)
+                ))
+            )
+            return index.search(prefix, limit)
+
+        return self.cached_response(request, search)
+
+    def get_serializer_class(self):
+        """
+        Returns the serializer class for the current action
+        :return: Serializer class
+        """
+        if self.action == 'bulk':
+            return BulkNamesSerializer
+        return self.serializer_class
 
     def perform_create(self, serializer):
         """
@@ -27,7 +159,39 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         :param serializer: object serializer
         :return: None
         """
-        serializer.save(user=self.request.user)
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError(
+                {'name': [_('An object with this name already exists.')]}
+            )
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Creates a batch of objects from a list of names in one request,
+        returning the created objects and the ones that already existed
+        :param request: request object
+        :return: Response
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        model = self.queryset.model
+        created, existing = model.objects.bulk_get_or_create(
+            request.user, serializer.validated_data['names']
+        )
+        if created:
+            # bulk_create sends no post_save signals
+            cache.bump_version(model, request.user.pk)
+        return Response(
+            {
+                'created': self.serializer_class(created, many=True).data,
+                'existing': self.serializer_class(existing, many=True).data,
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -36,6 +200,7 @@ class TagViewSet(BaseRecipeAttrViewSet):
     """
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -44,3 +209,361 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     """
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    recipe_field = 'ingredients'
+
+
+class RecipeViewSet(viewsets.ModelViewSet):
+    """
+    Manage recipes in the database
+    """
+    queryset = Recipe.objects.all()
+    serializer_class = RecipeSerializer
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scope = 'recipes'
+    pagination_class = IdCursorPagination
+    export_chunk_size = export.CHUNK_SIZE
+    shopping_list_max_recipes = 500
+    similar_max_limit = 100
+
+    def _params_to_ints(self, name):
+        """
+        Converts a comma separated query parameter to a list of ints
+        :param name: name of the query parameter
+        :return: List of ints
+        """
+        value = self.request.query_params.get(name)
+        if not value:
+            return []
+        try:
+            return [int(pk) for pk in value.split(',')]
+        except ValueError:
+            raise ValidationError(
+                {name: [_('Expected a comma separated list of ids.')]}
+            )
+
+    def filter_related(self, queryset, field_name, ids):
+        """
+        Keeps the recipes linked to any of the ids through an M2M field.
+        The EXISTS semi-join probes the (recipe_id, *_id) unique index of
+        the through table once per recipe and needs no distinct().
+        :param queryset: recipes queryset
+        :param field_name: tags or ingredients
+        :param ids: ids of the related objects
+        :return: filtered queryset
+        """
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        related = through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            **{field.m2m_reverse_name() + '__in': ids}
+        )
+        annotation = 'has_%s' % field_name
+        return queryset.annotate(**{annotation: Exists(related)}).filter(
+            **{annotation: True}
+        )
+
+    def get_queryset(self):
+        """
+        Returns recipes of the current authenticated user with their tags
+        and ingredients prefetched, so reading any number of recipes
+        runs a fixed number of queries. The list can be filtered with
+        comma separated tags and ingredients ids and searched by title.
+        :return: List of recipes
+        """
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action in ('list', 'export'):
+            for field_name in ('tags', 'ingredients'):
+                ids = self._params_to_ints(field_name)
+                if ids:
+                    queryset = self.filter_related(queryset, field_name, ids)
+            search = self.request.query_params.get('search')
+            if search:
+                queryset = queryset.filter(title__icontains=search)
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.order_by('name')),
+                Prefetch(
+                    'ingredients',
+                    queryset=Ingredient.objects.order_by('name')
+                ),
+            )
+        return queryset.order_by('-id')
+
+    def get_serializer_class(self):
+        """
+        Returns the nested serializer for reads
+        :return: Serializer class
+        """
+        if self.action in ('list', 'retrieve'):
+            return RecipeDetailSerializer
+        if self.action == 'import_recipes':
+            return RecipeImportSerializer
+        if self.action == 'image':
+            return RecipeImageSerializer
+        return self.serializer_class
+
+    def perform_create(self, serializer):
+        """
+        Create a new recipe
+        :param serializer: object serializer
+        :return: None
+        """
+        serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Streams all the user's recipes with their tags and ingredients as
+        NDJSON (type=ndjson, the default) or CSV (type=csv). Accepts the
+        filters of the list.
+        :param request: request object
+        :return: StreamingHttpResponse
+        """
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in export.CONTENT_TYPES:
+            raise ValidationError(
+                {'type': [_('Expected ndjson or csv.')]}
+            )
+
+        queryset = self.get_queryset()
+        if export_type == 'csv':
+            content = export.stream_csv(queryset, self.export_chunk_size)
+        else:
+            renderer = next(
+                renderer() for renderer in self.renderer_classes
+                if renderer.format == 'json'
+            )
+            content = export.stream_ndjson(
+                queryset, renderer, self.export_chunk_size
+            )
+        response = StreamingHttpResponse(
+            content, content_type=export.CONTENT_TYPES[export_type]
+        )
+        response['Content-Disposition'] = \
+            'attachment; filename="recipes.%s"' % export_type
+        return response
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Lists the user's recipes sharing the most tags and ingredients
+        with the recipe, scored by weighted Jaccard similarity
+        :param request: request object
+        :param pk: id of the recipe
+        :return: Response
+        """
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= self.similar_max_limit:
+            raise ValidationError({'limit': [
+                _('Expected a number from 1 to %d.') % self.similar_max_limit
+            ]})
+
+        recipes = similar.similar_recipes(self.get_object(), limit)
+        return Response([
+            {'id': recipe_id, 'title': title, 'score': score}
+            for recipe_id, title, score in recipes
+        ])
+
+    @action(detail=False, methods=['get'], url_path='shopping-list',
+            url_name='shopping-list')
+    def shopping_list(self, request):
+        """
+        Merges the ingredients of the user's recipes given as comma
+        separated ids in one GROUP BY query over the recipe ingredient
+        links, counting the selected recipes using each ingredient
+        :param request: request object
+        :return: Response
+        """
+        ids = self._params_to_ints('recipes')
+        if not ids:
+            raise ValidationError(
+                {'recipes': [_('Expected a comma separated list of ids.')]}
+            )
+        if len(ids) > self.shopping_list_max_recipes:
+            raise ValidationError({'recipes': [
+                _('Expected at most %d recipes.') %
+                self.shopping_list_max_recipes
+            ]})
+
+        links = Recipe.ingredients.through.objects.filter(
+            recipe_id__in=set(ids), recipe__user=request.user
+        )
+        rows = links.values_list(
+            'ingredient_id', 'ingredient__name'
+        ).annotate(count=Count('recipe_id')).order_by(
+            'ingredient__name', 'ingredient_id'
+        )
+        return Response([
+            {'id': pk, 'name': name, 'count': count}
+            for pk, name, count in rows
+        ])
+
+    @action(detail=False, methods=['post'], url_path='import',
+            url_name='import')
+    def import_recipes(self, request):
+        """
+        Queues the import of recipes from an uploaded CSV or NDJSON file.
+        Passing the id of a failed job resumes it after the last imported
+        record, with its kept file or the same file uploaded again.
+        Progress is read from the imports endpoint.
+        :param request: request object
+        :return: Response
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data.get('file')
+
+        if 'job' in serializer.validated_data:
+            try:
+                job = ImportJob.objects.get(
+                    pk=serializer.validated_data['job'], user=request.user
+                )
+            except ImportJob.DoesNotExist:
+                raise ValidationError({'job': [_('Import job not found.')]})
+            if job.status in (ImportJob.STATUS_QUEUED,
+                              ImportJob.STATUS_COMPLETED):
+                raise ValidationError(
+                    {'job': [_('Import job is already %s.') % job.status]}
+                )
+            if upload is None and not job.file:
+                raise ValidationError(
+                    {'file': [_('The file of this job must be uploaded.')]}
+                )
+        else:
+            if upload is None:
+                raise ValidationError({'file': [_('No file was submitted.')]})
+            import_format = serializer.validated_data.get('type') or \
+                guess_format(upload.name)
+            if import_format is None:
+                raise ValidationError(
+                    {'type': [_('Expected csv or ndjson.')]}
+                )
+            job = ImportJob(user=request.user, source=upload.name[:255],
+                            format=import_format)
+
+        if upload is not None:
+            if job.file:
+                job.file.delete(save=False)
+            job.file.save(upload.name, upload, save=False)
+        job.status = ImportJob.STATUS_QUEUED
+        job.save()
+        tasks.import_recipes.delay(job.pk)
+
+        return Response(ImportJobSerializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get', 'post'], url_path='image',
+            url_name='image')
+    def image(self, request, pk=None):
+        """
+        Uploads an image of the recipe, replacing the previous one, and
+        queues the generation of its variants, or serves the image or the
+        variant named by the variant parameter
+        :param request: request object
+        :param pk: id of the recipe
+        :return: Response or FileResponse
+        """
+        if request.method == 'GET':
+            return self.serve_image(request, self.get_object())
+
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        storage = recipe.image.storage
+        previous, variants = recipe.image.name, images.get_variants(recipe)
+        recipe.image.save(serializer.validated_data['image'].name,
+                          serializer.validated_data['image'], save=False)
+        recipe.image_variants = '{}'
+        recipe.save(
+            update_fields=['image', 'image_variants', 'updated_at']
+        )
+        if previous:
+            images.delete_files(storage, previous, variants)
+        tasks.make_image_variants.delay(recipe.pk, recipe.image.name)
+
+        return Response({'image': images.get_urls(recipe)},
+                        status=status.HTTP_202_ACCEPTED)
+
+    def serve_image(self, request, recipe):
+        """
+        Streams an image from the storage. Image names change with every
+        upload, so a request for the current version is cached for good
+        and others are revalidated with the ETag.
+        :param request: request object
+        :param recipe: Recipe
+        :return: FileResponse
+        """
+        variant = request.query_params.get('variant')
+        if not recipe.image:
+            raise Http404
+        if variant is None:
+            name = recipe.image.name
+        else:
+            name = images.get_variants(recipe).get(variant)
+            if name is None:
+                raise Http404
+
+        version = images.get_version(recipe.image.name)
+        if request.query_params.get('v') == version:
+            cache_control = 'private, max-age=%d, immutable' % \
+                images.get_options()['CACHE_SECONDS']
+        else:
+            cache_control = 'private, no-cache'
+        etag = quote_etag(os.path.basename(name))
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = FileResponse(
+                recipe.image.storage.open(name, 'rb'),
+                content_type=images.get_content_type(name)
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Progress of the user's recipe imports
+    """
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scope = 'recipes'
+
+    def get_queryset(self):
+        """
+        Returns the imports of the authenticated user, latest first
+        :return: QuerySet
+        """
+        return self.queryset.filter(user=self.request.user).order_by('-id')
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Changes of the user's tags, ingredients and recipes for offline clients
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scope = 'recipes'
+
+    def list(self, request):
+        """
+        Returns the objects saved and the ids of the ones deleted since
+        the cursor of the since parameter, with the cursor of the next
+        sync. Everything is returned when since is omitted.
+        :param request: request object
+        :return: Response
+        """
+        return Response(sync.get_changes(
+            request.user, request.query_params.get('since') or None
+        ))
@@ -1,6 +1,8 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from core.authentication import CachedTokenAuthentication
+from core.throttling import TokenBucketThrottle
 from .serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -9,6 +11,8 @@ class CreateUserView(generics.CreateAPIView):
     Create a user in the system
     """
     serializer_class = UserSerializer
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scope = 'auth'
 
 
 class CreateTokenView(ObtainAuthToken):
@@ -17,6 +21,8 @@ class CreateTokenView(ObtainAuthToken):
     """
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (TokenBucketThrottle,)
+    throttle_scope = 'auth'
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
@@ -24,7 +30,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     Manage the authenticated user
     """
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):